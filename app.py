@@ -1,11 +1,27 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, abort
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
+import io
 import json
 import os
-from elgamal_crypto import ElGamalCrypto
+import random
+import time
+from functools import partial
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError, OperationalError
+from elgamal_crypto import ElGamalCrypto, ModularGroup, CURVES
+from discrete_log import DiscreteLogSolver
+from key_pool import KeyPool
+from coupon_pool import CouponPool
+from group_commit import GroupCommitter, BEGIN_IMMEDIATE
+from election_scheduler import ElectionScheduler
+from election_cache import ElectionContext, ElectionContextCache
+from tally import TallyEngine
+from ballot_codec import encode_ballot
 from config import config
 
 app = Flask(__name__)
@@ -22,12 +38,77 @@ if not app.config['SQLALCHEMY_DATABASE_URI']:
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
 
 db = SQLAlchemy(app)
+
+with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        # pysqlite no abre la transacción hasta el primer INSERT/UPDATE, así
+        # que un SAVEPOINT inicial se confirmaría al liberarlo. El group
+        # committer pide BEGIN IMMEDIATE para sus lotes; las peticiones
+        # siguen con el comportamiento de pysqlite (las lecturas no toman el
+        # bloqueo de lectura que impediría después escribir)
+        @event.listens_for(db.engine, 'begin')
+        def _sqlite_begin(conn):
+            if conn.get_execution_options().get(BEGIN_IMMEDIATE):
+                conn.exec_driver_sql('BEGIN IMMEDIATE')
+
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+# Ballot encodings: per-candidate exponential ciphertexts or legacy JSON
+BALLOT_MODE_EXPONENTIAL = 'exponential'
+BALLOT_MODE_JSON = 'json'
+
+# Election key groups: the configured modular group or an elliptic curve
+KEY_GROUP_DEFAULT = 'default'
+
 # Initialize ElGamal crypto
-crypto = ElGamalCrypto()
+crypto = ElGamalCrypto(
+    group=app.config['ELGAMAL_GROUP'],
+    params_file=app.config['ELGAMAL_PARAMS_FILE'],
+    fixed_base_tables=app.config['ELGAMAL_FIXED_BASE_TABLES'],
+    fixed_base_window=app.config['ELGAMAL_FIXED_BASE_WINDOW'],
+    dlog_solver=DiscreteLogSolver(
+        max_value=app.config['DLOG_MAX_VALUE'],
+        baby_steps=app.config['DLOG_BABY_STEPS'] or None,
+        cache_dir=app.config['DLOG_CACHE_DIR'],
+        max_tables=app.config['DLOG_MEMORY_TABLES']
+    )
+)
+
+# Pre-generated election key pairs, refilled in background processes
+key_pool = KeyPool(
+    crypto,
+    size=app.config['KEY_POOL_SIZE'],
+    workers=app.config['KEY_POOL_WORKERS'],
+    params_file=app.config['ELGAMAL_PARAMS_FILE']
+)
+
+# Precomputed (k, g^k, y^k) encryption coupons per election
+coupon_pool = CouponPool(
+    crypto,
+    depth=app.config['COUPON_POOL_DEPTH'],
+    batch_size=app.config['COUPON_POOL_BATCH_SIZE'],
+    workers=app.config['COUPON_POOL_WORKERS']
+)
+
+# Optional group commit of vote writes (None = one transaction per vote)
+group_committer = None
+if app.config['GROUP_COMMIT_ENABLED']:
+    group_committer = GroupCommitter(
+        app,
+        db,
+        max_batch=app.config['GROUP_COMMIT_MAX_BATCH'],
+        linger_ms=app.config['GROUP_COMMIT_LINGER_MS']
+    )
+
+# Result tallying across a process pool
+tally_engine = TallyEngine(
+    crypto,
+    workers=app.config['TALLY_WORKERS'],
+    chunk_size=app.config['TALLY_CHUNK_SIZE'],
+    batch_size=app.config['TALLY_BATCH_SIZE']
+)
 
 # Database Models
 class User(UserMixin, db.Model):
@@ -49,28 +130,68 @@ class Election(db.Model):
     public_key = db.Column(db.Text)  # Store as JSON string
     private_key = db.Column(db.Text)  # Store as JSON string (only for admin)
     created_at = db.Column(db.DateTime, default=datetime.now)
+    # Cierre programado: elecciones activas por fecha de fin
+    __table_args__ = (db.Index('ix_election_active_end_date', 'is_active', 'end_date'),)
 
 class Candidate(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
-    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), nullable=False)
+    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), nullable=False, index=True)
     encrypted_votes = db.Column(db.Text)  # Store encrypted votes as JSON
     vote_count = db.Column(db.Integer, default=0)
 
 class Vote(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     election_id = db.Column(db.Integer, db.ForeignKey('election.id'), nullable=False)
-    encrypted_vote = db.Column(db.Text, nullable=False)  # Solo el voto encriptado
+    encrypted_vote = db.Column(db.Text)  # Voto encriptado en JSON (formato anterior)
+    encrypted_ballot = db.Column(db.LargeBinary)  # Voto encriptado en binario (ballot_codec)
     vote_hash = db.Column(db.String(64), unique=True, nullable=False)  # Hash único para verificación
     timestamp = db.Column(db.DateTime, default=datetime.now)
     # ❌ NO almacenar user_id ni candidate_id por seguridad
+    # Conteo por lotes: votos de una elección en orden de id
+    __table_args__ = (db.Index('ix_vote_election_id', 'election_id', 'id'),)
+
+class TallyShard(db.Model):
+    """Running homomorphic sum of an election's exponential ballots
+    
+    Each vote folds its ballot into one randomly chosen shard, so
+    concurrent voters only wait for each other when they hit the same row.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), nullable=False)
+    shard = db.Column(db.Integer, nullable=False)
+    aggregates = db.Column(db.Text, nullable=False, default='{}')  # JSON {candidate_id: [c1, c2]}
+    ballots = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    __table_args__ = (db.UniqueConstraint('election_id', 'shard', name='one_tally_shard_per_index'),)
+
+class CounterShard(db.Model):
+    """One shard of a sharded counter; a counter's value is the sum of its shards
+    
+    Increments go to a random shard with a single UPDATE, so concurrent
+    writers of the same counter rarely touch the same row.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(100), nullable=False)
+    shard = db.Column(db.Integer, nullable=False)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    __table_args__ = (db.UniqueConstraint('key', 'shard', name='one_counter_shard_per_index'),)
+
+class TallyCache(db.Model):
+    """Tally checkpoint of an election: counts up to the highest Vote.id processed"""
+    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), primary_key=True)
+    last_vote_id = db.Column(db.Integer, nullable=False, default=0)
+    votes = db.Column(db.Integer, nullable=False, default=0)
+    counts = db.Column(db.Text, nullable=False)  # JSON {candidate_id: count}
+    error_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.now)
 
 class VotingRecord(db.Model):
     """Tabla separada solo para registrar quién ya votó (sin vincular al voto específico)"""
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), nullable=False)
+    election_id = db.Column(db.Integer, db.ForeignKey('election.id'), nullable=False, index=True)
     voted_at = db.Column(db.DateTime, default=datetime.now)
     # Constraint para evitar votos duplicados
     __table_args__ = (db.UniqueConstraint('user_id', 'election_id', name='one_vote_per_user_per_election'),)
@@ -96,29 +217,591 @@ def check_election_status(election):
     return status
 
 def update_election_status():
-    """Update election status based on current time"""
+    """Close the active elections whose end_date has passed
+    
+    A single UPDATE ... RETURNING: the row locks it takes make concurrent
+    runs (one per worker) close and report each election exactly once.
+    """
     now = datetime.now()
     
     # Close elections that have ended
-    expired_elections = Election.query.filter(
-        Election.is_active == True,
-        Election.end_date < now
+    expired_elections = db.session.execute(
+        db.update(Election)
+        .where(Election.is_active == True, Election.end_date < now)
+        .values(is_active=False)
+        .returning(Election.id, Election.title, Election.end_date)
+        .execution_options(synchronize_session=False)
     ).all()
+    if expired_elections:
+        count_stat('active_elections', -len(expired_elections))
+    db.session.commit()
     
-    for election in expired_elections:
-        election.is_active = False
-        print(f"Elección '{election.title}' cerrada automáticamente - terminó el {election.end_date}")
+    for election_id, title, end_date in expired_elections:
+        coupon_pool.discard(election_id)
+        election_contexts.invalidate(election_id)
+        print(f"Elección '{title}' cerrada automáticamente - terminó el {end_date}")
     
     if expired_elections:
-        db.session.commit()
         print(f"Se cerraron {len(expired_elections)} elecciones automáticamente")
     
     return len(expired_elections)
 
+def next_election_deadline():
+    """Earliest end_date among the active elections, or None"""
+    return db.session.scalar(
+        db.select(db.func.min(Election.end_date)).where(Election.is_active == True)
+    )
+
+# Closes elections when their end_date passes; request handlers only
+# compare the clock with the cached next deadline
+election_scheduler = ElectionScheduler(app, next_election_deadline, update_election_status)
+
+def load_election_context(election_id):
+    """Everything vote() needs about an election, in two queries"""
+    election = db.session.get(Election, election_id)
+    if election is None:
+        return None
+    candidate_ids = tuple(db.session.scalars(
+        db.select(Candidate.id).where(Candidate.election_id == election_id).order_by(Candidate.id)
+    ))
+    return ElectionContext(
+        election_id=election.id,
+        start_date=election.start_date,
+        end_date=election.end_date,
+        is_active=election.is_active,
+        public_key_data=json.loads(election.public_key),
+        candidate_ids=candidate_ids,
+        candidate_id_set=frozenset(candidate_ids)
+    )
+
+# Parsed keys and candidate ids per election for the vote hot path;
+# invalidated whenever an election or its candidates change
+election_contexts = ElectionContextCache(
+    load_election_context,
+    max_entries=app.config['ELECTION_CACHE_SIZE'],
+    ttl=app.config['ELECTION_CACHE_TTL']
+)
+
+def warm_coupon_pools():
+    """Precompute coupons for every election that can still receive votes"""
+    elections = Election.query.filter(
+        Election.is_active == True,
+        Election.end_date >= datetime.now()
+    ).all()
+    for election in elections:
+        coupon_pool.fill(election.id, json.loads(election.public_key))
+
+def fold_into_running_tally(election_id, ballot, public_key_data, ballots=1):
+    """Add an exponential ballot to a random tally shard of the election
+    
+    ballot may also be the homomorphic sum of several ballots, given in
+    ballots. The shard row is locked (SELECT ... FOR UPDATE) until the vote
+    commits, so concurrent folds never overwrite each other.
+    """
+    shard_index = random.randrange(app.config['TALLY_SHARDS'])
+    query = TallyShard.query.filter_by(election_id=election_id, shard=shard_index).with_for_update()
+    shard = query.first()
+    if shard is None:
+        # Elections created before running tallies get their shards lazily
+        try:
+            with db.session.begin_nested():
+                shard = TallyShard(election_id=election_id, shard=shard_index, aggregates='{}', ballots=0)
+                db.session.add(shard)
+        except IntegrityError:
+            shard = query.one()
+    
+    group = crypto.group_for(public_key_data)
+    aggregates = json.loads(shard.aggregates)
+    for candidate_id, ciphertext in ballot.items():
+        if candidate_id in aggregates:
+            ciphertext = crypto.homomorphic_add(aggregates[candidate_id], ciphertext, group)
+        aggregates[candidate_id] = ciphertext
+    shard.aggregates = json.dumps(aggregates)
+    shard.ballots += ballots
+
+def candidate_counter_key(candidate_id):
+    return f'candidate:{candidate_id}:votes'
+
+def random_counter_shard():
+    return random.randrange(app.config['COUNTER_SHARDS'])
+
+def counter_update(keys, shard, amount=1):
+    """UPDATE adding amount to one shard of several counters, returning their keys"""
+    return (
+        db.update(CounterShard)
+        .where(CounterShard.key.in_(keys), CounterShard.shard == shard)
+        .values(value=CounterShard.value + amount)
+        .returning(CounterShard.key)
+    )
+
+def create_counter_shards(keys, shard, amount=1):
+    """Create the shard rows counter_update did not find, each in a savepoint"""
+    for key in keys:
+        try:
+            with db.session.begin_nested():
+                db.session.add(CounterShard(key=key, shard=shard, value=amount))
+        except IntegrityError:
+            # Another transaction created the shard first
+            db.session.execute(counter_update([key], shard, amount))
+
+def increment_counters(keys, amount=1):
+    """Add amount to several counters with one atomic UPDATE
+    
+    All keys use the same random shard; shard rows that do not exist yet
+    are created in a savepoint.
+    """
+    shard = random_counter_shard()
+    keys = list(keys)
+    updated = set(db.session.scalars(
+        counter_update(keys, shard, amount).execution_options(synchronize_session=False)
+    ))
+    create_counter_shards([key for key in keys if key not in updated], shard, amount)
+
+def increment_counter(key, amount=1):
+    """Add amount to a random shard of a counter with one atomic UPDATE"""
+    increment_counters([key], amount)
+
+def counter_values(keys):
+    """Current value of several counters, summing their shards in one query"""
+    keys = list(keys)
+    values = dict.fromkeys(keys, 0)
+    if keys:
+        rows = db.session.execute(
+            db.select(CounterShard.key, db.func.sum(CounterShard.value))
+            .where(CounterShard.key.in_(keys))
+            .group_by(CounterShard.key)
+        )
+        values.update((key, int(total)) for key, total in rows)
+    return values
+
+def drain_counter(key):
+    """Reset a counter to zero and return the value it had
+    
+    Compacts the counter into its caller's own storage; the shards are
+    locked until the transaction ends so no increment is lost.
+    """
+    shards = CounterShard.query.filter_by(key=key).with_for_update().all()
+    total = sum(shard.value for shard in shards)
+    for shard in shards:
+        db.session.delete(shard)
+    return total
+
+def drain_counters(keys):
+    """Reset several counters to zero and return {key: value it had}
+    
+    Every shard row is created (at zero) if missing and then locked, so no
+    increment of these counters can land before the transaction ends,
+    whether it would update a shard or create one. Whatever the caller
+    reads later in the same transaction is consistent with the drained
+    values: a concurrent vote is either visible to it or waits and stays
+    in the counters.
+    """
+    keys = list(keys)
+    values = dict.fromkeys(keys, 0)
+    if not keys:
+        return values
+    if db.session.get_bind().dialect.name == 'postgresql':
+        insert = postgresql_insert
+    else:
+        insert = sqlite_insert
+    db.session.execute(
+        insert(CounterShard)
+        .values([
+            {'key': key, 'shard': shard, 'value': 0}
+            for key in keys
+            for shard in range(app.config['COUNTER_SHARDS'])
+        ])
+        .on_conflict_do_nothing(index_elements=['key', 'shard'])
+    )
+    rows = db.session.execute(
+        db.select(CounterShard.key, CounterShard.value)
+        .where(CounterShard.key.in_(keys))
+        .order_by(CounterShard.key, CounterShard.shard)
+        .with_for_update()
+    )
+    for key, value in rows:
+        values[key] += value
+    db.session.execute(
+        db.update(CounterShard)
+        .where(CounterShard.key.in_(keys))
+        .values(value=0)
+        .execution_options(synchronize_session=False)
+    )
+    return values
+
+def set_counter(key, value):
+    """Replace a counter's shards by a single one holding value"""
+    drain_counter(key)
+    # Delete the old shards before inserting shard 0 again
+    db.session.flush()
+    db.session.add(CounterShard(key=key, shard=0, value=value))
+
+# Admin dashboard statistics, kept as counters by the write paths
+DASHBOARD_STATS = (
+    'total_elections',
+    'active_elections',
+    'total_candidates',
+    'total_votes',
+    'total_voting_records',
+    'total_users',
+    'admin_users'
+)
+# Set once the statistics counters hold the table counts
+STATS_READY_KEY = 'stats:ready'
+
+def stats_key(name):
+    return f'stats:{name}'
+
+def count_stat(name, amount=1):
+    """Adjust a dashboard statistic in the current transaction
+    
+    Votes update their statistics inside record_vote instead, without
+    dropping the cached statistics on every vote.
+    """
+    increment_counter(stats_key(name), amount)
+    invalidate_dashboard_stats()
+
+def rebuild_dashboard_stats():
+    """Recompute the dashboard statistics from the tables (full counts)
+    
+    The counters are drained (and their shards locked) before counting:
+    a concurrent write either committed before and is in the counts, or
+    waits and adds its increment on top of the rebuilt values.
+    """
+    drain_counters([STATS_READY_KEY] + [stats_key(name) for name in DASHBOARD_STATS])
+    stats = {
+        'total_elections': Election.query.count(),
+        'active_elections': Election.query.filter_by(is_active=True).count(),
+        'total_candidates': Candidate.query.count(),
+        'total_votes': Vote.query.count(),
+        'total_voting_records': VotingRecord.query.count(),
+        'total_users': User.query.filter_by(is_admin=False).count(),
+        'admin_users': User.query.filter_by(is_admin=True).count()
+    }
+    values = {stats_key(name): value for name, value in stats.items()}
+    values[STATS_READY_KEY] = 1
+    # drain_counters left every shard at zero: the value goes in shard 0
+    for key, value in values.items():
+        db.session.execute(
+            db.update(CounterShard)
+            .where(CounterShard.key == key, CounterShard.shard == 0)
+            .values(value=value)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+    return stats
+
+# (expires at, statistics) of the last dashboard_stats() result
+_dashboard_stats_cache = (0, None)
+
+def dashboard_stats():
+    """Admin dashboard statistics in one aggregated query over the counters
+    
+    Cached in-process for DASHBOARD_STATS_TTL seconds. The counters are
+    only rebuilt from full table counts when they were never initialized
+    (new database or after clear_database).
+    """
+    global _dashboard_stats_cache
+    now = time.monotonic()
+    expires, stats = _dashboard_stats_cache
+    if stats is not None and expires > now:
+        return stats
+    
+    values = counter_values([STATS_READY_KEY] + [stats_key(name) for name in DASHBOARD_STATS])
+    if values[STATS_READY_KEY]:
+        stats = {name: values[stats_key(name)] for name in DASHBOARD_STATS}
+    else:
+        stats = rebuild_dashboard_stats()
+    _dashboard_stats_cache = (now + app.config['DASHBOARD_STATS_TTL'], stats)
+    return stats
+
+def invalidate_dashboard_stats():
+    global _dashboard_stats_cache
+    _dashboard_stats_cache = (0, None)
+
+def candidate_vote_counts(candidates):
+    """Displayed vote count per candidate: its stored count plus its live counter"""
+    live = counter_values(candidate_counter_key(candidate.id) for candidate in candidates)
+    return {
+        candidate.id: (candidate.vote_count or 0) + live[candidate_counter_key(candidate.id)]
+        for candidate in candidates
+    }
+
+def voting_record_insert(user_id, election_id, voted_at, dialect=None):
+    """INSERT ... ON CONFLICT DO NOTHING into voting_record, returning the new id
+    
+    Returns no row when the user already voted in the election
+    (one_vote_per_user_per_election) or when the election is no longer
+    active, without aborting the transaction. The is_active check is part
+    of the insert because vote() only sees the cached context, which other
+    workers do not invalidate when they close the election.
+    dialect defaults to the session's database.
+    """
+    if (dialect or db.session.get_bind().dialect.name) == 'postgresql':
+        insert = postgresql_insert
+    else:
+        insert = sqlite_insert
+    return (
+        insert(VotingRecord)
+        .from_select(
+            ['user_id', 'election_id', 'voted_at'],
+            db.select(
+                db.literal(user_id),
+                Election.id,
+                db.literal(voted_at, db.DateTime)
+            ).where(Election.id == election_id, Election.is_active == True)
+        )
+        .on_conflict_do_nothing(index_elements=['user_id', 'election_id'])
+        .returning(VotingRecord.id)
+    )
+
+def record_vote_statement(election_id, user_id, ballot, vote_hash, now, counter_keys, shard):
+    """All vote writes in one statement of data-modifying CTEs (PostgreSQL)
+    
+    The vote, the counters and the voter flag are only written when the
+    voting record was inserted. Returns one row (record id, counter key)
+    per counter updated, or a single row when none was, and no row at all
+    when the user already voted or the election is closed.
+    """
+    record = voting_record_insert(user_id, election_id, now, 'postgresql').cte('record')
+    recorded = db.select(record.c.id).exists()
+    ballot_insert = db.insert(Vote).from_select(
+        ['election_id', 'encrypted_ballot', 'vote_hash', 'timestamp'],
+        db.select(
+            db.literal(election_id),
+            db.literal(ballot, db.LargeBinary),
+            db.literal(vote_hash),
+            db.literal(now, db.DateTime)
+        ).select_from(record)
+    ).cte('ballot')
+    counters = counter_update(counter_keys, shard).where(recorded).cte('counters')
+    voter = db.update(User).where(User.id == user_id, recorded).values(has_voted=True).cte('voter')
+    return (
+        db.select(record.c.id, counters.c.key)
+        .select_from(record.outerjoin(counters, db.true()))
+        .add_cte(ballot_insert, voter)
+    )
+
+def _record_vote_postgresql(election_id, user_id, ballot, vote_hash, now, counter_keys, shard):
+    """Run record_vote_statement; returns (recorded, counter keys updated)"""
+    rows = db.session.execute(
+        record_vote_statement(election_id, user_id, ballot, vote_hash, now, counter_keys, shard)
+    ).all()
+    return bool(rows), {key for _, key in rows if key is not None}
+
+def record_vote(election_id, user_id, candidate_id, encrypted_vote, vote_hash, public_key_data):
+    """Write a cast vote in the current session, without committing
+    
+    Returns False without writing anything when the user already voted in
+    this election or it is no longer active: the voting record is inserted
+    first with ON CONFLICT DO NOTHING and only for an active election, so
+    concurrent duplicates and closes are detected atomically. On
+    PostgreSQL every write goes out in a single statement.
+    
+    Only ids are used (no ORM objects from the request), so the write can
+    also run in the group committer's thread.
+    """
+    now = datetime.now()
+    ballot = encode_ballot(encrypted_vote)
+    # Contador de votos del candidato y estadísticas (contadores
+    # fragmentados, sin bloquear la fila del candidato)
+    counter_keys = [
+        candidate_counter_key(candidate_id),
+        stats_key('total_votes'),
+        stats_key('total_voting_records')
+    ]
+    shard = random_counter_shard()
+    
+    if db.session.get_bind().dialect.name == 'postgresql':
+        recorded, updated = _record_vote_postgresql(
+            election_id, user_id, ballot, vote_hash, now, counter_keys, shard
+        )
+        if not recorded:
+            return False
+    else:
+        # Record that user voted (without linking to specific vote)
+        if db.session.execute(voting_record_insert(user_id, election_id, now)).first() is None:
+            return False
+        # Store the encrypted vote (anonymously)
+        db.session.execute(db.insert(Vote).values(
+            election_id=election_id,
+            encrypted_ballot=ballot,
+            vote_hash=vote_hash,
+            timestamp=now
+        ))
+        updated = set(db.session.scalars(
+            counter_update(counter_keys, shard).execution_options(synchronize_session=False)
+        ))
+        # Update user's voting status
+        db.session.execute(db.update(User).where(User.id == user_id).values(has_voted=True))
+    
+    create_counter_shards([key for key in counter_keys if key not in updated], shard)
+    
+    if public_key_data.get('ballot_mode') == BALLOT_MODE_EXPONENTIAL:
+        fold_into_running_tally(election_id, encrypted_vote, public_key_data)
+    return True
+
+def _copy_value(value):
+    """Format a value for PostgreSQL COPY in text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bytes):
+        return '\\\\x' + value.hex()
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+def bulk_insert(model, rows):
+    """Insert rows (dicts with the same keys) in the current transaction
+    
+    PostgreSQL gets a single COPY; other databases an executemany.
+    """
+    if not rows:
+        return
+    connection = db.session.connection()
+    table = model.__table__
+    if connection.dialect.name != 'postgresql':
+        connection.execute(table.insert(), rows)
+        return
+    
+    quote = connection.dialect.identifier_preparer.quote
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(row[column]) for column in columns))
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    cursor.copy_expert(
+        f"COPY {quote(table.name)} ({', '.join(quote(column) for column in columns)}) FROM STDIN",
+        buffer
+    )
+
+def store_tally_checkpoint(election_id, previous, last_vote_id, votes, counts, errors, commit=True):
+    """Persist a (partial) tally and its watermark, unless another worker moved it first
+    
+    previous is the (last_vote_id, votes) this tally resumed from, or None
+    when the election had no checkpoint yet. With commit=False the
+    checkpoint is only written in the caller's transaction.
+    """
+    values = {
+        'last_vote_id': last_vote_id,
+        'votes': votes,
+        'counts': json.dumps(counts),
+        'error_count': errors,
+        'updated_at': datetime.now()
+    }
+    if previous is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(TallyCache(election_id=election_id, **values))
+        except IntegrityError:
+            pass
+    else:
+        TallyCache.query.filter_by(
+            election_id=election_id,
+            last_vote_id=previous[0],
+            votes=previous[1]
+        ).update(values, synchronize_session=False)
+    if commit:
+        db.session.commit()
+
+def vote_pages(election_id, after, last_vote_id, page_size):
+    """Yield (id, encrypted vote) for votes after..last_vote_id in id order
+    
+    Each page is its own keyset query (id > last id seen, LIMIT page_size)
+    fetched in full, so the caller may commit between rows: a server-side
+    cursor would not survive the checkpoint commits of count_votes. Only
+    the ciphertext columns are selected, so no ORM objects are built.
+    """
+    while True:
+        rows = db.session.execute(
+            db.select(Vote.id, Vote.encrypted_ballot, Vote.encrypted_vote)
+            .where(Vote.election_id == election_id, Vote.id > after, Vote.id <= last_vote_id)
+            .order_by(Vote.id)
+            .limit(page_size)
+        ).all()
+        for vote_id, ballot, text in rows:
+            # Rows not yet converted by migrate_binary_ballots.py are still JSON
+            yield vote_id, ballot if ballot is not None else text
+        if len(rows) < page_size:
+            return
+        after = rows[-1][0]
+
+def count_votes(election, candidates, commit=True):
+    """Decrypt the votes of an election and count them per candidate
+    
+    Returns (results, errors). Votes are counted in batches and a checkpoint
+    (TallyCache) with the highest Vote.id counted so far is stored after
+    each one, so a refresh only decrypts the votes cast since the previous
+    count and an interrupted count resumes from its last batch. With
+    commit=False the checkpoints are left to the caller's transaction.
+    """
+    public_key_data = json.loads(election.public_key)
+    private_key_data = json.loads(election.private_key)
+    candidate_ids = [candidate.id for candidate in candidates]
+    
+    last_vote_id, total_votes = db.session.execute(
+        db.select(db.func.max(Vote.id), db.func.count(Vote.id))
+        .where(Vote.election_id == election.id)
+    ).one()
+    last_vote_id = last_vote_id or 0
+    
+    cache = db.session.get(TallyCache, election.id)
+    if cache is not None and (cache.last_vote_id, cache.votes) == (last_vote_id, total_votes):
+        counts = json.loads(cache.counts)
+        return {candidate_id: counts.get(str(candidate_id), 0) for candidate_id in candidate_ids}, cache.error_count
+    
+    # The running tally needs one decryption per candidate, but only holds
+    # ballots cast since it was introduced
+    shards = TallyShard.query.filter_by(election_id=election.id).all()
+    ballots = sum(shard.ballots for shard in shards)
+    if ballots and ballots == total_votes:
+        return tally_engine.tally_running(
+            [json.loads(shard.aggregates) for shard in shards],
+            ballots,
+            public_key_data,
+            private_key_data,
+            candidate_ids
+        )
+    
+    # Resume from the checkpoint if no vote below it appeared since (ids
+    # are not always committed in order); otherwise count everything
+    previous = None if cache is None else (cache.last_vote_id, cache.votes)
+    counts = {}
+    since = votes = errors = 0
+    if cache is not None and cache.last_vote_id <= last_vote_id:
+        counted = Vote.query.filter(
+            Vote.election_id == election.id,
+            Vote.id <= cache.last_vote_id
+        ).count()
+        if counted == cache.votes:
+            counts = json.loads(cache.counts)
+            since, votes, errors = cache.last_vote_id, cache.votes, cache.error_count
+    
+    batches = tally_engine.tally_batches(
+        vote_pages(election.id, since, last_vote_id, app.config['TALLY_CHUNK_SIZE']),
+        public_key_data,
+        private_key_data,
+        candidate_ids
+    )
+    for batch in batches:
+        for candidate_id, count in batch['counts'].items():
+            counts[str(candidate_id)] = counts.get(str(candidate_id), 0) + count
+        votes += batch['votes']
+        errors += batch['errors']
+        store_tally_checkpoint(election.id, previous, batch['last_id'], votes, counts, errors, commit)
+        previous = (batch['last_id'], votes)
+    
+    return {candidate_id: counts.get(str(candidate_id), 0) for candidate_id in candidate_ids}, errors
+
 # Routes
 @app.route('/')
 def index():
-    update_election_status()  # Update election status before showing
+    election_scheduler.check()  # Close elections whose end_date has passed
     elections = Election.query.filter_by(is_active=True).all()
     return render_template('index.html', elections=elections)
 
@@ -145,6 +828,7 @@ def register():
             password_hash=generate_password_hash(password)
         )
         db.session.add(user)
+        count_stat('total_users')
         db.session.commit()
         
         flash('Registro exitoso')
@@ -177,19 +861,11 @@ def logout():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    update_election_status()  # Update election status before showing
+    election_scheduler.check()  # Close elections whose end_date has passed
     if current_user.is_admin:
         elections = Election.query.all()
         # Get database statistics for admin
-        db_stats = {
-            'total_elections': Election.query.count(),
-            'active_elections': Election.query.filter_by(is_active=True).count(),
-            'total_candidates': Candidate.query.count(),
-            'total_votes': Vote.query.count(),
-            'total_voting_records': VotingRecord.query.count(),
-            'total_users': User.query.filter_by(is_admin=False).count(),
-            'admin_users': User.query.filter_by(is_admin=True).count()
-        }
+        db_stats = dashboard_stats()
         return render_template('admin_dashboard.html', elections=elections, db_stats=db_stats)
     else:
         active_elections = Election.query.filter_by(is_active=True).all()
@@ -208,17 +884,58 @@ def create_election():
         start_date = datetime.strptime(request.form['start_date'], '%Y-%m-%dT%H:%M')
         end_date = datetime.strptime(request.form['end_date'], '%Y-%m-%dT%H:%M')
         
-        # Generate ElGamal keys for this election
-        keys = crypto.generate_keys()
-        public_key = {
-            'p': keys['p'],
-            'g': keys['g'],
-            'public_key': keys['public_key']
-        }
-        private_key = {
-            'p': keys['p'],
-            'private_key': keys['private_key']
-        }
+        ballot_mode = request.form.get('ballot_mode', BALLOT_MODE_EXPONENTIAL)
+        if ballot_mode not in (BALLOT_MODE_EXPONENTIAL, BALLOT_MODE_JSON):
+            flash('Modo de boleta no válido')
+            return redirect(url_for('create_election'))
+        
+        key_group = request.form.get('key_group', KEY_GROUP_DEFAULT)
+        if key_group != KEY_GROUP_DEFAULT and key_group not in CURVES:
+            flash('Grupo criptográfico no válido')
+            return redirect(url_for('create_election'))
+        
+        if key_group in CURVES:
+            # Elliptic-curve ElGamal can only encrypt points, i.e. g^0 / g^1
+            if ballot_mode != BALLOT_MODE_EXPONENTIAL:
+                flash('Las elecciones con curva elíptica requieren boletas homomórficas')
+                return redirect(url_for('create_election'))
+            
+            keys = crypto.generate_curve_keys(key_group)
+            public_key = {
+                'curve': keys['curve'],
+                'public_key': keys['public_key'],
+                'ballot_mode': ballot_mode
+            }
+            private_key = {
+                'curve': keys['curve'],
+                'private_key': keys['private_key']
+            }
+        else:
+            # Take ElGamal keys for this election from the pre-generated pool
+            keys = key_pool.acquire()
+            group = ModularGroup(keys['p'], keys['g'], q=keys.get('q'))
+            if ballot_mode == BALLOT_MODE_JSON and not group.encodes_messages:
+                # Schnorr groups (ELGAMAL_GROUP 'local'): only g^0 / g^1 fit in the subgroup
+                flash('El grupo ElGamal configurado requiere boletas homomórficas')
+                return redirect(url_for('create_election'))
+            
+            public_key = {
+                'p': keys['p'],
+                'g': keys['g'],
+                'public_key': keys['public_key'],
+                'ballot_mode': ballot_mode
+            }
+            if 'group' in keys:
+                public_key['group'] = keys['group']
+            private_key = {
+                'p': keys['p'],
+                'g': keys['g'],
+                'private_key': keys['private_key']
+            }
+            if 'q' in keys:
+                # Order of g: enables short exponents for nonces and keys
+                public_key['q'] = keys['q']
+                private_key['q'] = keys['q']
         
         election = Election(
             title=title,
@@ -229,40 +946,91 @@ def create_election():
             private_key=json.dumps(private_key)
         )
         db.session.add(election)
+        count_stat('total_elections')
+        count_stat('active_elections')
         db.session.commit()
         
+        # Precompute encryptions while the election is still scheduled
+        coupon_pool.fill(election.id, public_key)
+        election_scheduler.schedule(end_date)
+        
         flash('Elección creada exitosamente')
         return redirect(url_for('dashboard'))
     
+    # Warm up the key pool while the admin fills in the form
+    key_pool.start()
     return render_template('create_election.html')
 
 @app.route('/election/<int:election_id>')
 @login_required
 def view_election(election_id):
-    update_election_status()  # Update election status before showing
+    election_scheduler.check()  # Close elections whose end_date has passed
     election = Election.query.get_or_404(election_id)
     candidates = Candidate.query.filter_by(election_id=election_id).all()
     
     # Check if user has already voted
     user_vote = VotingRecord.query.filter_by(user_id=current_user.id, election_id=election_id).first()
     
-    return render_template('election.html', election=election, candidates=candidates, user_vote=user_vote)
+    vote_counts = candidate_vote_counts(candidates) if current_user.is_admin else {}
+    
+    return render_template('election.html', election=election, candidates=candidates,
+                           user_vote=user_vote, vote_counts=vote_counts)
+
+# SQLSTATEs of errors after which a rolled back write can simply run again
+RETRYABLE_SQLSTATES = (
+    '40001',  # serialization_failure
+    '40P01'  # deadlock_detected
+)
+
+class RetryableWriteError(Exception):
+    """A vote write kept failing with a retryable error"""
+
+def is_retryable(error):
+    """Deadlock or serialization failure reported by the database"""
+    orig = getattr(error, 'orig', None)
+    code = getattr(orig, 'pgcode', None) or getattr(orig, 'sqlstate', None)
+    return code in RETRYABLE_SQLSTATES
+
+def run_vote_write(write):
+    """Run a vote write (directly or through the group committer) and commit it
+    
+    Votes of one group-commit batch pick their counter and tally shards at
+    random, so concurrent batches of several workers may deadlock; the
+    database then rolls back the losing write (its savepoint, or its whole
+    transaction) and it is run again, up to VOTE_WRITE_ATTEMPTS times.
+    """
+    attempts = app.config['VOTE_WRITE_ATTEMPTS']
+    for attempt in range(1, attempts + 1):
+        try:
+            if group_committer is not None:
+                # Hand the pooled connection back while waiting, so queued
+                # requests can never starve the committer of connections
+                db.session.close()
+                # Acknowledged only once the batch holding this vote committed
+                return group_committer.submit(write).result()
+            recorded = write()
+            db.session.commit()
+            return recorded
+        except OperationalError as e:
+            db.session.rollback()
+            if not is_retryable(e):
+                raise
+            print(f"Escritura del voto reintentada ({attempt}/{attempts}): {e.orig}")
+    raise RetryableWriteError(f"Vote write failed {attempts} times")
 
 @app.route('/vote', methods=['POST'])
 @login_required
 def vote():
-    election_id = request.form['election_id']
-    candidate_id = request.form['candidate_id']
+    election_id = request.form.get('election_id', type=int)
+    candidate_id = request.form.get('candidate_id', type=int)
     
-    update_election_status()  # Update election status before processing vote
-    
-    election = Election.query.get_or_404(election_id)
-    candidate = Candidate.query.get_or_404(candidate_id)
+    election_scheduler.check()  # Close elections whose end_date has passed
     
-    # Check if user has already voted
-    existing_vote = VotingRecord.query.filter_by(user_id=current_user.id, election_id=election_id).first()
-    if existing_vote:
-        flash('Ya has votado en esta elección')
+    election = election_contexts.get(election_id) if election_id is not None else None
+    if election is None:
+        abort(404)
+    if candidate_id not in election.candidate_id_set:
+        flash('El candidato no pertenece a esta elección')
         return redirect(url_for('view_election', election_id=election_id))
     
     # Check if election is active and within time bounds
@@ -279,14 +1047,21 @@ def vote():
         flash(f'La elección ha terminado. Terminó el {election.end_date.strftime("%Y-%m-%d %H:%M:%S")}')
         return redirect(url_for('view_election', election_id=election_id))
     
-    # Encrypt the vote using ElGamal - Include candidate_id in encrypted data
-    public_key_data = json.loads(election.public_key)
-    vote_data = {
-        'candidate_id': int(candidate_id),
-        'value': 1,  # 1 vote for this candidate
-        'election_id': int(election_id)
-    }
-    encrypted_vote = crypto.encrypt_vote(vote_data, public_key_data)
+    public_key_data = election.public_key_data
+    if public_key_data.get('ballot_mode') == BALLOT_MODE_EXPONENTIAL:
+        # One exponential ciphertext per candidate (g^1 for the chosen one)
+        candidate_ids = election.candidate_ids
+        coupons = coupon_pool.take(election_id, public_key_data, len(candidate_ids))
+        encrypted_vote = crypto.encrypt_ballot(candidate_ids, candidate_id, public_key_data, coupons)
+    else:
+        # Legacy ballot: encrypt candidate_id inside a JSON document
+        vote_data = {
+            'candidate_id': candidate_id,
+            'value': 1,  # 1 vote for this candidate
+            'election_id': election_id
+        }
+        coupons = coupon_pool.take(election_id, public_key_data)
+        encrypted_vote = crypto.encrypt_vote(vote_data, public_key_data, coupons[0] if coupons else None)
     
     # Create vote hash for integrity (without revealing voter identity)
     hash_data = {
@@ -296,31 +1071,150 @@ def vote():
     }
     vote_hash = crypto.hash_vote(hash_data)
     
-    # Store the encrypted vote (anonymously)
-    vote = Vote(
-        election_id=election_id,
-        encrypted_vote=json.dumps(encrypted_vote),
-        vote_hash=vote_hash
+    write = partial(
+        record_vote, election_id, current_user.id, candidate_id,
+        encrypted_vote, vote_hash, public_key_data
     )
-    db.session.add(vote)
-    
-    # Record that user voted (without linking to specific vote)
-    voting_record = VotingRecord(
-        user_id=current_user.id,
-        election_id=election_id
-    )
-    db.session.add(voting_record)
-    
-    # Actualizar contador de votos del candidato 
-    candidate.vote_count += 1
+    try:
+        recorded = run_vote_write(write)
+    except (IntegrityError, RetryableWriteError):
+        # e.g. a repeated vote hash, or deadlocks on every attempt
+        db.session.rollback()
+        flash('No se pudo registrar el voto, inténtalo de nuevo')
+        return redirect(url_for('view_election', election_id=election_id))
     
-    # Update user's voting status
-    current_user.has_voted = True
-    db.session.commit()
+    if not recorded:
+        # Nothing was written: the voting record already existed, or
+        # another worker closed the election after it was cached
+        if not db.session.scalar(db.select(Election.is_active).where(Election.id == election_id)):
+            election_contexts.invalidate(election_id)
+            flash('La elección está cerrada')
+            return redirect(url_for('view_election', election_id=election_id))
+        flash('Ya has votado en esta elección')
+        return redirect(url_for('view_election', election_id=election_id))
     
     flash('Voto registrado exitosamente')
     return redirect(url_for('view_election', election_id=election_id))
 
+@app.route('/api/elections/<int:election_id>/ballots/batch', methods=['POST'])
+@login_required
+def upload_ballot_batch(election_id):
+    """Store a batch of ballots encrypted offline (e.g. by a polling station)
+    
+    Expects JSON {"ballots": [...], "voters": [user_id, ...]}: ballots in
+    the election's format (as produced by encrypt_ballot or encrypt_vote)
+    and one eligibility record per ballot. The batch is validated as a
+    whole and written in a single transaction with bulk inserts.
+    """
+    if not current_user.is_admin:
+        return jsonify({'error': 'Solo los administradores pueden cargar lotes de votos'}), 403
+    
+    started = time.perf_counter()
+    election = db.session.get(Election, election_id)
+    if election is None:
+        return jsonify({'error': 'La elección no existe'}), 404
+    
+    now = datetime.now()
+    if not election.is_active or now < election.start_date or now > election.end_date:
+        return jsonify({'error': 'La elección no está abierta'}), 409
+    
+    payload = request.get_json(silent=True) or {}
+    ballots = payload.get('ballots')
+    voters = payload.get('voters')
+    if not isinstance(ballots, list) or not isinstance(voters, list) or not ballots:
+        return jsonify({'error': 'Se esperaban las listas "ballots" y "voters"'}), 400
+    if len(ballots) != len(voters):
+        return jsonify({'error': 'Cada voto necesita su registro de votante'}), 400
+    if len(ballots) > app.config['BALLOT_BATCH_MAX_SIZE']:
+        return jsonify({'error': f'El lote supera {app.config["BALLOT_BATCH_MAX_SIZE"]} votos'}), 413
+    
+    # Ballots must match the election's format and group
+    public_key_data = json.loads(election.public_key)
+    group = crypto.group_for(public_key_data)
+    exponential = public_key_data.get('ballot_mode') == BALLOT_MODE_EXPONENTIAL
+    candidate_keys = {str(c.id) for c in Candidate.query.filter_by(election_id=election.id).all()}
+    invalid = []
+    vote_rows = []
+    hashes = set()
+    for index, ballot in enumerate(ballots):
+        try:
+            if exponential:
+                if not isinstance(ballot, dict) or set(ballot) != candidate_keys:
+                    raise ValueError("Ballot does not cover the election's candidates")
+                for ciphertext in ballot.values():
+                    crypto.validate_ciphertext(ciphertext, group)
+            else:
+                crypto.validate_ciphertext(ballot, group)
+            encrypted_ballot = encode_ballot(ballot)
+        except ValueError:
+            invalid.append(index)
+            continue
+        
+        # Hash the binary encoding: unlike the JSON it does not depend on
+        # the order of the candidates' keys
+        vote_hash = crypto.hash_vote({
+            'encrypted_ballot': encrypted_ballot.hex(),
+            'election_id': election.id
+        })
+        if vote_hash in hashes:
+            # The same ciphertext twice is a replay, not two voters
+            invalid.append(index)
+            continue
+        hashes.add(vote_hash)
+        vote_rows.append({
+            'election_id': election.id,
+            'encrypted_ballot': encrypted_ballot,
+            'vote_hash': vote_hash,
+            'timestamp': now
+        })
+    if invalid:
+        return jsonify({'error': 'Votos no válidos', 'invalid': invalid[:100]}), 400
+    
+    # Eligibility: known users, each voting once
+    if not all(type(voter) is int for voter in voters) or len(set(voters)) != len(voters):
+        return jsonify({'error': 'Los votantes deben ser identificadores únicos'}), 400
+    known = set(db.session.execute(db.select(User.id).where(User.id.in_(voters))).scalars())
+    unknown = [voter for voter in voters if voter not in known]
+    if unknown:
+        return jsonify({'error': 'Votantes desconocidos', 'voters': unknown[:100]}), 400
+    already_voted = list(db.session.execute(
+        db.select(VotingRecord.user_id).where(
+            VotingRecord.election_id == election.id,
+            VotingRecord.user_id.in_(voters)
+        )
+    ).scalars())
+    if already_voted:
+        return jsonify({'error': 'Votantes que ya votaron', 'voters': already_voted[:100]}), 409
+    
+    try:
+        bulk_insert(Vote, vote_rows)
+        bulk_insert(VotingRecord, [
+            {'user_id': voter, 'election_id': election.id, 'voted_at': now} for voter in voters
+        ])
+        User.query.filter(User.id.in_(voters)).update({'has_voted': True}, synchronize_session=False)
+        count_stat('total_votes', len(vote_rows))
+        count_stat('total_voting_records', len(voters))
+        
+        if exponential:
+            # Fold the whole batch into the running tally as one sum
+            aggregates = crypto.aggregate_ballots(ballots, group)
+            batch_sum = {
+                str(candidate_id): [group.encode(c1), group.encode(c2)]
+                for candidate_id, (c1, c2) in aggregates.items()
+            }
+            fold_into_running_tally(election.id, batch_sum, public_key_data, len(ballots))
+        
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent upload or vote() registered one of these voters
+        db.session.rollback()
+        return jsonify({'error': 'Algún votante ya votó o algún voto está repetido'}), 409
+    
+    return jsonify({
+        'inserted': len(vote_rows),
+        'seconds': round(time.perf_counter() - started, 3)
+    }), 201
+
 @app.route('/add_candidate/<int:election_id>', methods=['GET', 'POST'])
 @login_required
 def add_candidate(election_id):
@@ -341,7 +1235,9 @@ def add_candidate(election_id):
             encrypted_votes=json.dumps([])  # Initialize empty encrypted votes list
         )
         db.session.add(candidate)
+        count_stat('total_candidates')
         db.session.commit()
+        election_contexts.invalidate(election_id)
         
         flash('Candidato agregado exitosamente')
         return redirect(url_for('view_election', election_id=election_id))
@@ -359,31 +1255,9 @@ def view_results(election_id):
     candidates = Candidate.query.filter_by(election_id=election_id).all()
     
     # Decrypt votes and count them
-    private_key_data = json.loads(election.private_key)
-    results = {candidate.id: 0 for candidate in candidates}
-    
-    # Get all votes for this election
-    votes = Vote.query.filter_by(election_id=election_id).all()
-    
-    for vote in votes:
-        try:
-            encrypted_vote = json.loads(vote.encrypted_vote)
-            decrypted_data = crypto.decrypt_vote(encrypted_vote, private_key_data)
-            
-            # Extract candidate_id from decrypted data
-            if isinstance(decrypted_data, dict):
-                candidate_id = decrypted_data.get('candidate_id')
-                vote_value = decrypted_data.get('value', 1)
-            else:
-                # Backward compatibility
-                candidate_id = decrypted_data
-                vote_value = 1
-            
-            if candidate_id in results:
-                results[candidate_id] += vote_value
-                
-        except Exception as e:
-            print(f"Error decrypting vote: {e}")
+    results, errors = count_votes(election, candidates)
+    if errors:
+        flash(f'{errors} votos no se pudieron descifrar y no se contaron')
     
     # Prepare results for template
     final_results = []
@@ -403,8 +1277,12 @@ def close_election(election_id):
         return redirect(url_for('dashboard'))
     
     election = Election.query.get_or_404(election_id)
+    if election.is_active:
+        count_stat('active_elections', -1)
     election.is_active = False
     db.session.commit()
+    coupon_pool.discard(election.id)
+    election_contexts.invalidate(election.id)
     
     flash(f'Elección "{election.title}" cerrada exitosamente')
     return redirect(url_for('dashboard'))
@@ -421,8 +1299,13 @@ def reopen_election(election_id):
     
     # Solo permitir reabrir si no ha pasado la fecha de fin
     if now <= election.end_date:
+        if not election.is_active:
+            count_stat('active_elections')
         election.is_active = True
         db.session.commit()
+        coupon_pool.fill(election.id, json.loads(election.public_key))
+        election_scheduler.schedule(election.end_date)
+        election_contexts.invalidate(election.id)
         flash(f'Elección "{election.title}" reabierta exitosamente')
     else:
         flash('No se puede reabrir una elección cuya fecha de fin ya pasó')
@@ -436,7 +1319,7 @@ def update_elections_status():
         flash('Solo los administradores pueden actualizar el estado de las elecciones')
         return redirect(url_for('dashboard'))
     
-    closed_count = update_election_status()
+    closed_count = election_scheduler.run()
     if closed_count > 0:
         flash(f'Se cerraron {closed_count} elecciones automáticamente')
     else:
@@ -454,32 +1337,16 @@ def update_vote_counts(election_id):
     election = Election.query.get_or_404(election_id)
     candidates = Candidate.query.filter_by(election_id=election_id).all()
     
-    # Decrypt votes and count them
-    private_key_data = json.loads(election.private_key)
-    results = {candidate.id: 0 for candidate in candidates}
-    
-    # Get all votes for this election
-    votes = Vote.query.filter_by(election_id=election_id).all()
+    # The recount replaces the live counters. They are drained first, in
+    # the recount's transaction: until the commit a vote cast meanwhile
+    # waits on the locked shards, so it ends up in the counters rather than
+    # being dropped with them
+    drain_counters(candidate_counter_key(candidate.id) for candidate in candidates)
     
-    for vote in votes:
-        try:
-            encrypted_vote = json.loads(vote.encrypted_vote)
-            decrypted_data = crypto.decrypt_vote(encrypted_vote, private_key_data)
-            
-            # Extract candidate_id from decrypted data
-            if isinstance(decrypted_data, dict):
-                candidate_id = decrypted_data.get('candidate_id')
-                vote_value = decrypted_data.get('value', 1)
-            else:
-                # Backward compatibility
-                candidate_id = decrypted_data
-                vote_value = 1
-            
-            if candidate_id in results:
-                results[candidate_id] += vote_value
-                
-        except Exception as e:
-            print(f"Error decrypting vote: {e}")
+    # Decrypt votes and count them
+    results, errors = count_votes(election, candidates, commit=False)
+    if errors:
+        flash(f'{errors} votos no se pudieron descifrar y no se contaron')
     
     # Update vote counts for each candidate
     for candidate in candidates:
@@ -489,6 +1356,48 @@ def update_vote_counts(election_id):
     flash('Contadores de votos actualizados correctamente')
     return redirect(url_for('view_election', election_id=election_id))
 
+@app.route('/admin/key_pool')
+@login_required
+def key_pool_stats():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Solo los administradores pueden ver el estado del pool de claves'}), 403
+    
+    return jsonify(key_pool.stats())
+
+@app.route('/admin/coupon_pool')
+@login_required
+def coupon_pool_stats():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Solo los administradores pueden ver el estado del pool de cupones'}), 403
+    
+    return jsonify(coupon_pool.stats())
+
+@app.route('/admin/tally_stats')
+@login_required
+def tally_stats():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Solo los administradores pueden ver las estadísticas de conteo'}), 403
+    
+    return jsonify(tally_engine.last_tally or {})
+
+@app.route('/admin/group_commit')
+@login_required
+def group_commit_stats():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Solo los administradores pueden ver las estadísticas de escritura'}), 403
+    
+    if group_committer is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(group_committer.stats(), enabled=True))
+
+@app.route('/admin/scheduler')
+@login_required
+def scheduler_stats():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Solo los administradores pueden ver el planificador de elecciones'}), 403
+    
+    return jsonify(election_scheduler.stats())
+
 @app.route('/admin/create_admin', methods=['GET', 'POST'])
 def create_admin():
     # Check if any admin exists
@@ -511,6 +1420,7 @@ def create_admin():
             is_admin=True
         )
         db.session.add(admin)
+        count_stat('admin_users')
         db.session.commit()
         
         flash('Administrador creado exitosamente')
@@ -543,12 +1453,27 @@ def delete_election(election_id):
         # Delete all votes for this election
         Vote.query.filter_by(election_id=election_id).delete()
         
+        TallyShard.query.filter_by(election_id=election_id).delete()
+        TallyCache.query.filter_by(election_id=election_id).delete()
+        
+        candidate_keys = [
+            candidate_counter_key(candidate.id)
+            for candidate in Candidate.query.filter_by(election_id=election_id).all()
+        ]
+        CounterShard.query.filter(CounterShard.key.in_(candidate_keys)).delete(synchronize_session=False)
+        
         # Delete all candidates (after votes are deleted)
         Candidate.query.filter_by(election_id=election_id).delete()
+        count_stat('total_candidates', -len(candidate_keys))
         
         # Delete the election
         db.session.delete(election)
+        count_stat('total_elections', -1)
+        if election.is_active:
+            count_stat('active_elections', -1)
         db.session.commit()
+        coupon_pool.discard(election_id)
+        election_contexts.invalidate(election_id)
         
         flash(f'Elección "{election_title}" eliminada exitosamente')
     except Exception as e:
@@ -577,6 +1502,9 @@ def clear_database():
         
         # Delete all votes
         Vote.query.delete()
+        TallyShard.query.delete()
+        TallyCache.query.delete()
+        CounterShard.query.delete()
         
         # Delete all candidates
         Candidate.query.delete()
@@ -593,6 +1521,9 @@ def clear_database():
             admin.has_voted = False
         
         db.session.commit()
+        coupon_pool.clear()
+        election_contexts.clear()
+        invalidate_dashboard_stats()
         
         flash(f'Base de datos limpiada exitosamente. Se eliminaron: {election_count} elecciones, {candidate_count} candidatos, {vote_count} votos, {voting_record_count} registros de votación y {user_count} usuarios no administradores.')
         
@@ -605,4 +1536,7 @@ def clear_database():
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        warm_coupon_pools()
+        election_scheduler.refresh()
+    key_pool.start()
     app.run(debug=True,port=PORT,host='0.0.0.0')
@@ -0,0 +1,114 @@
+"""
+Compact binary encoding of encrypted ballots (Vote.encrypted_ballot)
+
+A stored ballot is either one ElGamal ciphertext (c1, c2) (legacy JSON
+ballots) or an exponential ballot {candidate_id: (c1, c2)}. Instead of
+decimal JSON every group element is written as a fixed-width big-endian
+field, which is less than half the size and parses in linear time:
+
+    header   version (1 byte) | kind (1) | element encoding (1) | width (2)
+    single   c1 | c2
+    ballot   count (2) | count x (candidate_id (4) | c1 | c2)
+
+Elements of modular groups are integers; elliptic-curve elements are
+compressed SEC1 points (see EllipticCurveGroup.encode), the point at
+infinity being all zero bytes. Ballot entries are written in candidate_id
+order, so equal ballots always encode (and hash) to the same bytes.
+decode_ballot returns exactly what json.loads returned for the text
+format, so callers can handle both.
+"""
+
+import struct
+
+VERSION = 1
+
+KIND_SINGLE = 0
+KIND_BALLOT = 1
+
+ENCODING_INTEGER = 0
+ENCODING_POINT = 1
+
+_HEADER = struct.Struct('>BBBH')
+_COUNT = struct.Struct('>H')
+_CANDIDATE = struct.Struct('>I')
+
+def _element_bytes(element):
+    if isinstance(element, str):
+        return ENCODING_POINT, bytes.fromhex(element)
+    return ENCODING_INTEGER, element.to_bytes((element.bit_length() + 7) // 8, 'big')
+
+def encode_ballot(ballot):
+    """Encode a ciphertext pair or an exponential ballot dict as bytes"""
+    if isinstance(ballot, dict):
+        kind = KIND_BALLOT
+        entries = sorted((int(candidate_id), ciphertext) for candidate_id, ciphertext in ballot.items())
+        ciphertexts = [ciphertext for _, ciphertext in entries]
+    else:
+        kind = KIND_SINGLE
+        ciphertexts = [ballot]
+
+    elements = [_element_bytes(element) for ciphertext in ciphertexts for element in ciphertext]
+    encodings = {encoding for encoding, _ in elements}
+    if len(encodings) > 1:
+        raise ValueError("Ballot mixes integer and curve point elements")
+    encoding = encodings.pop() if encodings else ENCODING_INTEGER
+    width = max((len(data) for _, data in elements), default=0)
+    padded = [data.rjust(width, b'\0') for _, data in elements]
+
+    parts = [_HEADER.pack(VERSION, kind, encoding, width)]
+    if kind == KIND_SINGLE:
+        parts.extend(padded)
+    else:
+        parts.append(_COUNT.pack(len(entries)))
+        for i, (candidate_id, _) in enumerate(entries):
+            parts.append(_CANDIDATE.pack(candidate_id))
+            parts.extend(padded[2 * i:2 * i + 2])
+    return b''.join(parts)
+
+def decode_ballot(data):
+    """Decode bytes written by encode_ballot
+
+    Returns [c1, c2] or {str(candidate_id): [c1, c2]}, like json.loads of
+    the text format. Raises ValueError on malformed or unknown data.
+    """
+    data = memoryview(data)
+    if len(data) < _HEADER.size:
+        raise ValueError("Truncated ballot")
+    version, kind, encoding, width = _HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"Unsupported ballot format version {version}")
+
+    if encoding == ENCODING_INTEGER:
+        def element(offset):
+            return int.from_bytes(data[offset:offset + width], 'big')
+    elif encoding == ENCODING_POINT:
+        def element(offset):
+            point = data[offset:offset + width]
+            # All zero bytes encode the point at infinity
+            return point.hex() if any(point) else '00'
+    else:
+        raise ValueError(f"Unknown element encoding {encoding}")
+
+    offset = _HEADER.size
+    if kind == KIND_SINGLE:
+        if len(data) != offset + 2 * width:
+            raise ValueError("Ballot length does not match its header")
+        return [element(offset), element(offset + width)]
+
+    if kind != KIND_BALLOT:
+        raise ValueError(f"Unknown ballot kind {kind}")
+    if len(data) < offset + _COUNT.size:
+        raise ValueError("Truncated ballot")
+    (count,) = _COUNT.unpack_from(data, offset)
+    offset += _COUNT.size
+    entry_size = _CANDIDATE.size + 2 * width
+    if len(data) != offset + count * entry_size:
+        raise ValueError("Ballot length does not match its header")
+
+    ballot = {}
+    for _ in range(count):
+        (candidate_id,) = _CANDIDATE.unpack_from(data, offset)
+        offset += _CANDIDATE.size
+        ballot[str(candidate_id)] = [element(offset), element(offset + width)]
+        offset += 2 * width
+    return ballot
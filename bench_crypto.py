@@ -0,0 +1,234 @@
+"""
+Micro-benchmarks de ElGamalCrypto
+
+Mide generate_keys, encrypt, encrypt_vote, decrypt, decrypt_vote,
+homomorphic_add y hash_vote (además de los votos exponenciales y los
+formatos de almacenamiento JSON y binario) para claves de 1024, 2048 y 3072
+bits, y opcionalmente sobre P-256. Para cada operación informa de
+operaciones/s, la distribución de latencias por llamada y la memoria
+asignada (pico trazado con tracemalloc y bloques retenidos por llamada).
+
+Uso:
+    python bench_crypto.py [--groups modp1024,modp2048,modp3072,P-256]
+                           [--ops encrypt,decrypt] [--min-time 0.5]
+                           [--output resultados.json]
+                           [--baseline base.json] [--threshold 0.10]
+
+Con --baseline compara operaciones/s con un informe anterior y termina con
+código 1 si alguna operación es más lenta que la base en más de threshold
+(por defecto un 10 %). bench_baseline.json es la base de referencia de
+todos los grupos (metadata indica la máquina y la versión de Python): las
+operaciones/s solo son comparables en la misma máquina, así que en otra
+conviene generar primero su propia base con --output.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from elgamal_crypto import ElGamalCrypto, CURVES
+from discrete_log import DiscreteLogSolver
+from ballot_codec import encode_ballot, decode_ballot
+
+DEFAULT_GROUPS = ('modp1024', 'modp2048', 'modp3072')
+
+# Candidatos de las papeletas exponenciales
+CANDIDATE_IDS = (1, 2, 3)
+
+VOTE = {'candidate_id': 2, 'value': 1, 'election_id': 1}
+
+# Llamadas medidas bajo tracemalloc (que ralentiza) para la memoria
+ALLOCATION_CALLS = 20
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks de ElGamalCrypto')
+    parser.add_argument('--groups', default=','.join(DEFAULT_GROUPS),
+                        help=f"grupos separados por comas ({', '.join(DEFAULT_GROUPS + tuple(CURVES))})")
+    parser.add_argument('--ops', help='operaciones a medir, separadas por comas (por defecto todas)')
+    parser.add_argument('--min-time', type=float, default=0.5, help='segundos mínimos por operación')
+    parser.add_argument('--min-iterations', type=int, default=20)
+    parser.add_argument('--output', help='fichero donde guardar los resultados JSON')
+    parser.add_argument('--baseline', help='resultados JSON anteriores con los que comparar')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='caída de operaciones/s tolerada frente a la base (0.10 = 10 %%)')
+    return parser.parse_args()
+
+def group_operations(crypto, group_name):
+    """{operación: función sin argumentos} para un grupo"""
+    if group_name in CURVES:
+        keys = crypto.generate_curve_keys(group_name)
+        public_key = {'curve': group_name, 'public_key': keys['public_key']}
+        private_key = {'curve': group_name, 'private_key': keys['private_key']}
+        generate_keys = lambda: crypto.generate_curve_keys(group_name)
+    else:
+        keys = crypto.generate_keys()
+        public_key = {'p': keys['p'], 'g': keys['g'], 'q': keys['q'], 'public_key': keys['public_key']}
+        private_key = {'p': keys['p'], 'g': keys['g'], 'q': keys['q'], 'private_key': keys['private_key']}
+        generate_keys = crypto.generate_keys
+
+    group = crypto.group_for(public_key)
+    point = group.fixed_exp(group.generator, 1)
+    single = crypto.encrypt(point, public_key)
+    ballot = crypto.encrypt_ballot(CANDIDATE_IDS, 2, public_key)
+    text_ballot = json.dumps(ballot)
+    binary_ballot = encode_ballot(ballot)
+    operations = {
+        'generate_keys': generate_keys,
+        'encrypt': lambda: crypto.encrypt(point, public_key),
+        'decrypt': lambda: crypto.decrypt(single, private_key),
+        'homomorphic_add': lambda: crypto.homomorphic_add(single, single, group),
+        'encrypt_exponential': lambda: crypto.encrypt_exponential(1, public_key),
+        'decrypt_exponential': lambda: crypto.decrypt_exponential(ballot['2'], private_key, max_value=10),
+        'encrypt_ballot': lambda: crypto.encrypt_ballot(CANDIDATE_IDS, 2, public_key),
+        'ballot_json_encode': lambda: json.dumps(ballot),
+        'ballot_json_decode': lambda: json.loads(text_ballot),
+        'ballot_binary_encode': lambda: encode_ballot(ballot),
+        'ballot_binary_decode': lambda: decode_ballot(binary_ballot)
+    }
+    if group_name not in CURVES:
+        # Votos JSON: sólo los grupos modulares cifran mensajes arbitrarios
+        encrypted_vote = crypto.encrypt_vote(VOTE, public_key)
+        operations['encrypt_vote'] = lambda: crypto.encrypt_vote(VOTE, public_key)
+        operations['decrypt_vote'] = lambda: crypto.decrypt_vote(encrypted_vote, private_key)
+    sizes = {
+        'ballot_json_bytes': len(text_ballot.encode()),
+        'ballot_binary_bytes': len(binary_ballot)
+    }
+    return operations, sizes
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano de una lista ordenada"""
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def measure(function, min_time, min_iterations):
+    """Latencias por llamada, operaciones/s y memoria asignada de function"""
+    # Calentamiento: tablas de base fija, cachés de grupo...
+    for _ in range(3):
+        function()
+
+    latencies = []
+    clock = time.perf_counter_ns
+    started = clock()
+    deadline = started + int(min_time * 1e9)
+    while len(latencies) < min_iterations or clock() < deadline:
+        call_started = clock()
+        function()
+        latencies.append(clock() - call_started)
+    total_ns = sum(latencies)
+
+    # Memoria, aparte: tracemalloc altera los tiempos
+    tracemalloc.start()
+    peak = 0
+    blocks_before = sys.getallocatedblocks()
+    for _ in range(ALLOCATION_CALLS):
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        function()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    retained_blocks = (sys.getallocatedblocks() - blocks_before) / ALLOCATION_CALLS
+    tracemalloc.stop()
+
+    latencies.sort()
+    to_us = lambda ns: round(ns / 1000, 3)
+    return {
+        'iterations': len(latencies),
+        'ops_per_sec': round(len(latencies) / (total_ns / 1e9), 2),
+        'latency_us': {
+            'mean': to_us(total_ns / len(latencies)),
+            'min': to_us(latencies[0]),
+            'p50': to_us(percentile(latencies, 0.50)),
+            'p90': to_us(percentile(latencies, 0.90)),
+            'p99': to_us(percentile(latencies, 0.99)),
+            'max': to_us(latencies[-1])
+        },
+        'allocations': {
+            'peak_bytes_per_call': peak,
+            'retained_blocks_per_call': round(retained_blocks, 2)
+        }
+    }
+
+def run(args):
+    groups = [name.strip() for name in args.groups.split(',') if name.strip()]
+    selected = {name.strip() for name in args.ops.split(',')} if args.ops else None
+    results = {}
+    sizes = {}
+
+    # hash_vote no depende del grupo
+    if selected is None or 'hash_vote' in selected:
+        results['hash_vote'] = measure(lambda: ElGamalCrypto.hash_vote(VOTE), args.min_time, args.min_iterations)
+        print_result('hash_vote', results['hash_vote'])
+
+    for group_name in groups:
+        crypto = ElGamalCrypto(
+            group=None if group_name in CURVES else group_name,
+            dlog_solver=DiscreteLogSolver(max_value=1000)
+        )
+        operations, sizes[group_name] = group_operations(crypto, group_name)
+        for name, function in operations.items():
+            if selected is not None and name not in selected:
+                continue
+            key = f'{group_name}/{name}'
+            results[key] = measure(function, args.min_time, args.min_iterations)
+            print_result(key, results[key])
+
+    return {
+        'metadata': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'min_time': args.min_time,
+            'groups': groups
+        },
+        'sizes': sizes,
+        'results': results
+    }
+
+def print_result(key, result):
+    latency = result['latency_us']
+    print(f"   {key:38} {result['ops_per_sec']:>12.1f} op/s  "
+          f"p50 {latency['p50']:>10.1f}µs  p99 {latency['p99']:>10.1f}µs  "
+          f"pico {result['allocations']['peak_bytes_per_call']:>8} B")
+
+def compare(report, baseline, threshold):
+    """Operaciones más lentas que la base en más de threshold: [(clave, base, actual, cambio)]"""
+    regressions = []
+    print(f"\n📏 Comparación con la base (umbral {threshold:.0%})")
+    for key, result in report['results'].items():
+        previous = baseline.get('results', {}).get(key)
+        if previous is None:
+            continue
+        before, after = previous['ops_per_sec'], result['ops_per_sec']
+        change = after / before - 1 if before else 0
+        regressed = change < -threshold
+        print(f"   {'❌' if regressed else '✅'} {key:38} {before:>12.1f} → {after:>12.1f} op/s ({change:+.1%})")
+        if regressed:
+            regressions.append((key, before, after, change))
+    return regressions
+
+def main():
+    args = parse_args()
+    print("🚀 Micro-benchmarks de ElGamalCrypto")
+    print("=" * 60)
+    report = run(args)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Resultados guardados en {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} operaciones empeoraron más de un {args.threshold:.0%}")
+            sys.exit(1)
+        print("\n✅ Sin regresiones")
+
+if __name__ == "__main__":
+    main()
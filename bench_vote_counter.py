@@ -0,0 +1,105 @@
+"""
+Benchmark de contadores de votos con muchos votantes simultáneos
+
+Compara el incremento de una única fila (UPDATE candidate SET vote_count =
+vote_count + 1, la fila caliente) con el contador fragmentado
+(increment_counter) cuando todos los hilos votan al mismo candidato.
+
+Uso:
+    python bench_vote_counter.py [hilos] [incrementos_por_hilo]
+
+Por defecto usa una base SQLite temporal, que bloquea la base entera en cada
+escritura (ambas estrategias rinden igual); la contención por la fila
+caliente sólo se ve con DATABASE_URL apuntando a PostgreSQL.
+¡No usar con la base de datos de producción! Crea y borra sus tablas.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+if not os.environ.get('DATABASE_URL'):
+    _db_file = os.path.join(tempfile.mkdtemp(), 'bench_vote_counter.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{_db_file}'
+
+from datetime import datetime, timedelta
+from app import (app, db, Election, Candidate, CounterShard, candidate_counter_key,
+                 candidate_vote_counts, increment_counter)
+
+def hot_row_increment(candidate_id):
+    db.session.execute(
+        db.update(Candidate).where(Candidate.id == candidate_id)
+        .values(vote_count=Candidate.vote_count + 1)
+    )
+
+def sharded_increment(candidate_id):
+    increment_counter(candidate_counter_key(candidate_id))
+
+def run(strategy, candidate_id, threads, increments):
+    """Cada hilo hace sus incrementos en transacciones propias; devuelve (segundos, errores)"""
+    errors = []
+    barrier = threading.Barrier(threads)
+
+    def voter():
+        with app.app_context():
+            barrier.wait()
+            for _ in range(increments):
+                try:
+                    strategy(candidate_id)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    errors.append(e)
+
+    workers = [threading.Thread(target=voter) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - started, len(errors)
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    increments = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    expected = threads * increments
+
+    with app.app_context():
+        db.create_all()
+        now = datetime.now()
+        election = Election(title='Benchmark', description='bench_vote_counter',
+                            start_date=now - timedelta(hours=1), end_date=now + timedelta(hours=1),
+                            public_key='{}', private_key='{}')
+        db.session.add(election)
+        db.session.flush()
+        candidate = Candidate(name='Candidato', description='', election_id=election.id)
+        db.session.add(candidate)
+        db.session.commit()
+        candidate_id = candidate.id
+
+    print(f"🗳️  {threads} hilos x {increments} votos al mismo candidato "
+          f"({app.config['COUNTER_SHARDS']} fragmentos)")
+    print("=" * 60)
+    try:
+        for name, strategy in (('fila única', hot_row_increment), ('fragmentado', sharded_increment)):
+            seconds, errors = run(strategy, candidate_id, threads, increments)
+            with app.app_context():
+                candidate = db.session.get(Candidate, candidate_id)
+                if strategy is hot_row_increment:
+                    total = candidate.vote_count
+                else:
+                    total = candidate_vote_counts([candidate])[candidate_id] - candidate.vote_count
+            status = "✅" if total == expected - errors else "❌"
+            print(f"{status} {name:12} {expected / seconds:9.0f} votos/s  "
+                  f"{seconds:6.2f}s  total {total}/{expected}  errores {errors}")
+    finally:
+        with app.app_context():
+            CounterShard.query.filter_by(key=candidate_counter_key(candidate_id)).delete()
+            Candidate.query.filter_by(id=candidate_id).delete()
+            Election.query.filter_by(title='Benchmark', description='bench_vote_counter').delete()
+            db.session.commit()
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,78 @@ class Config:
     
     # Configuración de sesión
     PERMANENT_SESSION_LIFETIME = timedelta(hours=2)
+    
+    # Grupo ElGamal compartido por todas las elecciones nuevas: 'ffdhe2048',
+    # 'ffdhe3072' (RFC 7919), 'modp2048', 'modp3072' (RFC 3526) o 'local'
+    # (parámetros generados una sola vez y guardados en ELGAMAL_PARAMS_FILE).
+    # Las elecciones existentes conservan su propio p.
+    ELGAMAL_GROUP = os.environ.get('ELGAMAL_GROUP', 'ffdhe2048')
+    ELGAMAL_PARAMS_FILE = os.environ.get('ELGAMAL_PARAMS_FILE') or \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'elgamal_params.json')
+    
+    # Pool de pares de claves pregenerados para nuevas elecciones
+    KEY_POOL_SIZE = int(os.environ.get('KEY_POOL_SIZE', 4))
+    KEY_POOL_WORKERS = int(os.environ.get('KEY_POOL_WORKERS', 1))
+    
+    # Cupones de cifrado precalculados (k, g^k, y^k) por elección: una boleta
+    # homomórfica consume un cupón por candidato (0 = desactivado)
+    COUPON_POOL_DEPTH = int(os.environ.get('COUPON_POOL_DEPTH', 1000))
+    COUPON_POOL_BATCH_SIZE = int(os.environ.get('COUPON_POOL_BATCH_SIZE', 250))
+    COUPON_POOL_WORKERS = int(os.environ.get('COUPON_POOL_WORKERS', 1))
+    
+    # Group commit: los votos que llegan con menos de GROUP_COMMIT_LINGER_MS
+    # de diferencia se guardan en una sola transacción (hasta
+    # GROUP_COMMIT_MAX_BATCH votos); cada voto se confirma al usuario solo
+    # cuando su lote se ha guardado
+    GROUP_COMMIT_ENABLED = os.environ.get('GROUP_COMMIT_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    GROUP_COMMIT_MAX_BATCH = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 64))
+    GROUP_COMMIT_LINGER_MS = float(os.environ.get('GROUP_COMMIT_LINGER_MS', 2))
+    # Intentos de escritura de un voto ante interbloqueos o fallos de
+    # serialización (p. ej. entre lotes de group commit de varios procesos)
+    VOTE_WRITE_ATTEMPTS = int(os.environ.get('VOTE_WRITE_ATTEMPTS', 3))
+    
+    # Caché en memoria del contexto de cada elección (clave pública, candidatos)
+    # usado al votar; el TTL limita cuánto tarda en verse un cambio hecho
+    # desde otro proceso
+    ELECTION_CACHE_SIZE = int(os.environ.get('ELECTION_CACHE_SIZE', 256))
+    ELECTION_CACHE_TTL = float(os.environ.get('ELECTION_CACHE_TTL', 30))
+    
+    # Segundos que se reutilizan las estadísticas del panel de administración
+    DASHBOARD_STATS_TTL = float(os.environ.get('DASHBOARD_STATS_TTL', 5))
+    
+    # Filas por contador fragmentado (votos por candidato): cada incremento
+    # va a una fila al azar, así no hay una fila caliente por candidato
+    COUNTER_SHARDS = int(os.environ.get('COUNTER_SHARDS', 16))
+    
+    # Máximo de votos por lote en /api/elections/<id>/ballots/batch
+    BALLOT_BATCH_MAX_SIZE = int(os.environ.get('BALLOT_BATCH_MAX_SIZE', 10000))
+    
+    # Conteo de resultados en paralelo (0 = un proceso por núcleo)
+    TALLY_WORKERS = int(os.environ.get('TALLY_WORKERS', 0))
+    TALLY_CHUNK_SIZE = int(os.environ.get('TALLY_CHUNK_SIZE', 1000))
+    # Votos por lote del conteo: tras cada lote se guarda un punto de control
+    # (TallyCache) desde el que se reanuda si el conteo se interrumpe
+    TALLY_BATCH_SIZE = int(os.environ.get('TALLY_BATCH_SIZE', 20000))
+    
+    # Filas del conteo cifrado acumulado por elección: cada voto suma su
+    # boleta a una fila al azar, así los votos concurrentes no se bloquean
+    TALLY_SHARDS = int(os.environ.get('TALLY_SHARDS', 16))
+    
+    # Tablas de exponenciación de base fija para el cifrado ElGamal (con
+    # ventana de 4 bits, cada tabla de 2048 bits ocupa ~0.3 MB con los
+    # exponentes cortos de 256 bits y ~2.5 MB sin q, con exponentes completos)
+    ELGAMAL_FIXED_BASE_TABLES = int(os.environ.get('ELGAMAL_FIXED_BASE_TABLES', 16))
+    ELGAMAL_FIXED_BASE_WINDOW = int(os.environ.get('ELGAMAL_FIXED_BASE_WINDOW', 4))
+    
+    # Logaritmo discreto (baby-step giant-step) para descifrar conteos g^n.
+    # DLOG_MAX_VALUE es el mayor conteo esperado (tamaño del electorado);
+    # DLOG_BABY_STEPS es el tamaño de la tabla (0 = raíz cuadrada de
+    # DLOG_MAX_VALUE): más pasos de bebé usan más memoria y menos pasos gigantes.
+    DLOG_MAX_VALUE = int(os.environ.get('DLOG_MAX_VALUE', 50_000_000))
+    DLOG_BABY_STEPS = int(os.environ.get('DLOG_BABY_STEPS', 0))
+    DLOG_MEMORY_TABLES = int(os.environ.get('DLOG_MEMORY_TABLES', 8))
+    DLOG_CACHE_DIR = os.environ.get('DLOG_CACHE_DIR') or \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'dlog_cache')
 
 class DevelopmentConfig(Config):
     """Configuración para desarrollo"""
@@ -0,0 +1,173 @@
+"""
+Per-election pool of precomputed ElGamal encryption coupons
+
+The expensive part of an encryption, (g^k, y^k), does not depend on the
+vote. Worker processes precompute (k, g^k, y^k) coupons with
+ElGamalCrypto.precompute_coupons while an election is scheduled or idle, so
+casting a vote only costs one group multiplication per ciphertext. take()
+removes coupons from the pool under a lock, so a coupon is handed out at
+most once; when the pool runs dry the caller encrypts online and the
+shortfall is counted as a fallback. Coupons contain the nonces, so they only
+ever live in memory.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from elgamal_crypto import ElGamalCrypto
+
+# Window over which the consumption rate is measured, in seconds
+RATE_WINDOW = 60
+
+# Per-process crypto instance for pool workers, so their tables survive
+# between batches
+_worker_crypto = None
+
+def _generate_coupons(public_key_data, count):
+    """Worker process entry point"""
+    global _worker_crypto
+    if _worker_crypto is None:
+        _worker_crypto = ElGamalCrypto(fixed_base_tables=0)
+    return _worker_crypto.precompute_coupons(public_key_data, count)
+
+class _ElectionCoupons:
+    def __init__(self, public_key_data):
+        self.public_key_data = public_key_data
+        self.coupons = deque()
+        self.pending = 0
+        self.generated = 0
+        self.consumed = 0
+        self.fallbacks = 0
+        # (timestamp, coupons taken) for the consumption rate
+        self.recent = deque()
+
+class CouponPool:
+    def __init__(self, crypto, depth=1000, batch_size=250, workers=1):
+        self.crypto = crypto
+        self.depth = depth
+        self.batch_size = batch_size
+        self.workers = workers
+        self._elections = {}
+        self._executor = None
+        self._lock = threading.Lock()
+        self.errors = 0
+
+    def fill(self, election_id, public_key_data):
+        """Start (or top up) the pool of an election in the background"""
+        if self.depth <= 0:
+            return
+        with self._lock:
+            state = self._state(election_id, public_key_data)
+        self._refill(state)
+
+    def _state(self, election_id, public_key_data):
+        # Must hold self._lock. A different key means the id was reused by a
+        # new election, so the old coupons are useless
+        state = self._elections.get(election_id)
+        if state is None or state.public_key_data['public_key'] != public_key_data['public_key']:
+            state = self._elections[election_id] = _ElectionCoupons(public_key_data)
+        return state
+
+    def take(self, election_id, public_key_data, count=1):
+        """Remove and return up to count coupons for an election
+
+        Fewer coupons than requested (possibly none) are returned when the
+        pool is short; the caller encrypts the rest online.
+        """
+        if self.depth <= 0:
+            return []
+
+        with self._lock:
+            state = self._state(election_id, public_key_data)
+            coupons = [state.coupons.popleft() for _ in range(min(count, len(state.coupons)))]
+            state.consumed += len(coupons)
+            state.fallbacks += count - len(coupons)
+
+            now = time.monotonic()
+            state.recent.append((now, count))
+            while state.recent and state.recent[0][0] < now - RATE_WINDOW:
+                state.recent.popleft()
+
+        self._refill(state)
+        return coupons
+
+    def _refill(self, state):
+        with self._lock:
+            missing = self.depth - len(state.coupons) - state.pending
+            # Top up in whole batches, but never leave an empty pool idle
+            batches = max(missing, 0) // self.batch_size
+            if not batches and missing > 0 and not state.coupons and not state.pending:
+                batches = 1
+            if not batches:
+                return
+            state.pending += batches * self.batch_size
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            executor = self._executor
+
+        for _ in range(batches):
+            try:
+                future = executor.submit(_generate_coupons, state.public_key_data, self.batch_size)
+            except RuntimeError as e:
+                # Executor shut down (e.g. interpreter exiting)
+                print(f"Coupon pool refill failed: {e}")
+                with self._lock:
+                    state.pending -= self.batch_size
+                    self.errors += 1
+                continue
+            future.add_done_callback(
+                lambda future, state=state: self._on_generated(state, future)
+            )
+
+    def _on_generated(self, state, future):
+        with self._lock:
+            state.pending -= self.batch_size
+            try:
+                coupons = future.result()
+            except Exception as e:
+                self.errors += 1
+                print(f"Coupon pool worker failed: {e}")
+                return
+            # Coupons for a discarded election are dropped with the state
+            state.coupons.extend(coupons)
+            state.generated += len(coupons)
+
+    def discard(self, election_id):
+        """Forget the coupons of a closed or deleted election"""
+        with self._lock:
+            self._elections.pop(election_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._elections.clear()
+
+    def stats(self):
+        """Per-election depth, consumption rate and online fallbacks"""
+        now = time.monotonic()
+        with self._lock:
+            elections = {}
+            for election_id, state in self._elections.items():
+                recent = sum(count for timestamp, count in state.recent
+                             if timestamp >= now - RATE_WINDOW)
+                elections[election_id] = {
+                    'available': len(state.coupons),
+                    'pending': state.pending,
+                    'generated': state.generated,
+                    'consumed': state.consumed,
+                    'fallbacks': state.fallbacks,
+                    'requested_per_minute': recent * 60 / RATE_WINDOW
+                }
+            return {
+                'depth': self.depth,
+                'batch_size': self.batch_size,
+                'workers': self.workers,
+                'errors': self.errors,
+                'elections': elections
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
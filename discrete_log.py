@@ -0,0 +1,186 @@
+"""
+Baby-step giant-step discrete logarithm solver for exponential ElGamal tallies
+
+Decrypting a homomorphic tally yields g^count instead of count. The solver
+precomputes a table of baby steps g^j (0 <= j < m) once per group and then
+needs at most ceil(max_value / m) giant steps to recover any count up to
+max_value. Tables are kept in a bounded in-memory LRU and, optionally, on disk
+so worker restarts do not pay the precomputation again.
+
+The solver works on any group object exposing generator, identity, op(),
+exp(), inverse(), equals(), table_key() and cache_id (see ModularGroup and
+EllipticCurveGroup in elgamal_crypto).
+"""
+
+import hashlib
+import math
+import os
+import threading
+from array import array
+from collections import OrderedDict
+
+CACHE_MAGIC = b'BSGS1'
+
+class BabyStepTable:
+    """Baby steps g^j for 0 <= j < size, indexed by their 64-bit table key"""
+    def __init__(self, group, size, keys=None):
+        self.group = group
+        self.size = size
+
+        if keys is None:
+            keys = array('Q')
+            current = group.identity
+            for _ in range(size):
+                keys.append(group.table_key(current))
+                current = group.op(current, group.generator)
+        self.keys = keys
+
+        self.index = {}
+        self.collisions = {}
+        for j, key in enumerate(keys):
+            if key in self.index:
+                self.collisions.setdefault(key, []).append(j)
+            else:
+                self.index[key] = j
+
+        # Giant step factor g^(-size)
+        self.giant_step = group.inverse(group.exp(group.generator, size))
+
+    def candidates(self, key):
+        """Baby step exponents whose table key equals key"""
+        j = self.index.get(key)
+        if j is None:
+            return ()
+        return [j] + self.collisions.get(key, [])
+
+    def solve(self, h, max_value):
+        """Return x in [0, max_value] with g^x = h, or None"""
+        group, size = self.group, self.size
+        gamma = h
+        for i in range(max_value // size + 1):
+            for j in self.candidates(group.table_key(gamma)):
+                x = i * size + j
+                # Only the low 64 bits were compared, so confirm the match
+                if x <= max_value and group.equals(group.exp(group.generator, x), h):
+                    return x
+            gamma = group.op(gamma, self.giant_step)
+        return None
+
+    def memory_bytes(self):
+        """Rough memory footprint of the table (keys array plus index dict)"""
+        return self.keys.itemsize * len(self.keys) + self.size * 100
+
+    def save(self, path):
+        """Write the table keys to path atomically"""
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(CACHE_MAGIC)
+            f.write(self.size.to_bytes(8, 'little'))
+            self.keys.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, group, size):
+        """Load a table written by save(), or return None if it does not match"""
+        with open(path, 'rb') as f:
+            if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+                return None
+            if int.from_bytes(f.read(8), 'little') != size:
+                return None
+            keys = array('Q')
+            keys.fromfile(f, size)
+        # Spot-check the last baby step so a stale file is never trusted
+        if keys[size - 1] != group.table_key(group.exp(group.generator, size - 1)):
+            return None
+        return cls(group, size, keys)
+
+class DiscreteLogSolver:
+    """Cached baby-step giant-step solver for small discrete logarithms
+
+    max_value is the largest count expected (e.g. the electorate size) and
+    baby_steps the table size m: memory grows with m while the worst-case
+    number of giant steps is max_value / m. By default m = sqrt(max_value).
+    """
+    def __init__(self, max_value=10_000_000, baby_steps=None, cache_dir=None, max_tables=8):
+        self.max_value = max_value
+        self.baby_steps = baby_steps or math.isqrt(max_value) + 1
+        self.cache_dir = cache_dir
+        self.max_tables = max_tables
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cache_path(self, group):
+        digest = hashlib.sha256(f"{group.cache_id}:{self.baby_steps}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest[:32]}.bsgs")
+
+    def _load_or_build(self, group):
+        path = self._cache_path(group) if self.cache_dir else None
+        if path and os.path.exists(path):
+            try:
+                table = BabyStepTable.load(path, group, self.baby_steps)
+                if table is not None:
+                    return table
+            except (OSError, EOFError, ValueError) as e:
+                print(f"Ignoring discrete log cache {path}: {e}")
+
+        table = BabyStepTable(group, self.baby_steps)
+        if path:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                table.save(path)
+            except OSError as e:
+                print(f"Could not write discrete log cache {path}: {e}")
+        return table
+
+    def table(self, group):
+        """Return the baby-step table for a group, loading or building it once"""
+        key = group.cache_id
+        with self._lock:
+            table = self._tables.get(key)
+            if table is not None:
+                self._tables.move_to_end(key)
+                return table
+
+        table = self._load_or_build(group)
+
+        with self._lock:
+            self._tables[key] = table
+            self._tables.move_to_end(key)
+            while len(self._tables) > self.max_tables:
+                self._tables.popitem(last=False)
+        return table
+
+    def solve(self, group, h, max_value=None):
+        """Return x with g^x = h (g = group.generator) and 0 <= x <= max_value
+
+        Raises ValueError when no such x exists in the range.
+        """
+        if max_value is None:
+            max_value = self.max_value
+
+        # Tiny tallies do not need a table at all
+        if max_value < self.baby_steps and group.cache_id not in self._tables:
+            current = group.identity
+            for x in range(max_value + 1):
+                if group.equals(current, h):
+                    return x
+                current = group.op(current, group.generator)
+            raise ValueError("Discrete logarithm exceeds max_value")
+
+        x = self.table(group).solve(h, max_value)
+        if x is None:
+            raise ValueError("Discrete logarithm exceeds max_value")
+        return x
+
+    def stats(self):
+        """Table size and memory tradeoff, for observability"""
+        with self._lock:
+            tables = list(self._tables.values())
+        return {
+            'max_value': self.max_value,
+            'baby_steps': self.baby_steps,
+            'max_giant_steps': self.max_value // self.baby_steps + 1,
+            'cached_tables': len(tables),
+            'memory_bytes': sum(table.memory_bytes() for table in tables),
+            'cache_dir': self.cache_dir
+        }
@@ -0,0 +1,90 @@
+"""
+In-process LRU cache of per-election voting context
+
+vote() needs the same things on every request: the election's dates and
+status, its parsed public key and the ids of its candidates. Loading them
+costs several queries plus parsing the JSON key (2048-bit decimal
+integers). ElectionContextCache keeps the result of a loader function per
+election id, evicting the least recently used entry beyond max_entries.
+
+Entries must be invalidated whenever the election or its candidates
+change; the ttl bounds how long a change made by another worker process
+(which cannot invalidate this one) stays invisible.
+"""
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+ElectionContext = namedtuple('ElectionContext', [
+    'election_id',
+    'start_date',
+    'end_date',
+    'is_active',
+    'public_key_data',  # Parsed public key; shared between requests, never modify it
+    'candidate_ids',  # Ordered tuple, as used to build exponential ballots
+    'candidate_id_set'  # frozenset for membership checks
+])
+
+class ElectionContextCache:
+    def __init__(self, loader, max_entries=256, ttl=30, clock=time.monotonic):
+        """loader(election_id) returns an ElectionContext, or None when the
+        election does not exist (misses are not cached). clock returns the
+        current time in seconds for the ttl."""
+        self._loader = loader
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a load that raced with one is not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, election_id):
+        """Context of an election, loading it on a miss or after ttl seconds"""
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(election_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(election_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        context = self._loader(election_id)
+        if context is not None and self.max_entries > 0:
+            with self._lock:
+                if generation != self._generation:
+                    return context
+                self._entries[election_id] = (now + self.ttl, context)
+                self._entries.move_to_end(election_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return context
+
+    def invalidate(self, election_id):
+        """Drop an election's context after it (or its candidates) changed"""
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop(election_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,116 @@
+"""
+Scheduled closing of elections at their end_date
+
+Instead of scanning for expired elections on every request, the scheduler
+caches the next end_date among active elections and arms a timer for it.
+Request handlers call check(), which only compares the clock with the
+cached deadline and touches the database once it has passed (e.g. when the
+timer of this worker was delayed). Closing is done by the close_expired
+callable with a single conditional UPDATE, so when several workers fire at
+the same deadline each election is closed exactly once.
+"""
+
+import threading
+from datetime import datetime
+
+# Delay before retrying after a failed run, in seconds
+RETRY_SECONDS = 30
+
+class ElectionScheduler:
+    def __init__(self, app, next_deadline, close_expired):
+        """next_deadline() returns the earliest end_date of the active
+        elections (or None); close_expired() closes the expired ones and
+        returns how many it closed. Both run inside an app context."""
+        self.app = app
+        self._next_deadline = next_deadline
+        self._close_expired = close_expired
+        self._lock = threading.Lock()
+        self._deadline = None
+        self._loaded = False
+        self._timer = None
+        self.runs = 0
+        self.closed = 0
+        self.errors = 0
+
+    def check(self):
+        """Close expired elections if the cached deadline has passed
+
+        Costs one query the first time (to load the deadline) and none
+        afterwards until the deadline is reached.
+        """
+        if not self._loaded:
+            self.refresh()
+        deadline = self._deadline
+        if deadline is not None and datetime.now() > deadline:
+            return self.run()
+        return 0
+
+    def run(self):
+        """Close every expired election now and rearm for the next deadline"""
+        closed = self._close_expired()
+        with self._lock:
+            self.runs += 1
+            self.closed += closed
+        self.refresh()
+        return closed
+
+    def refresh(self):
+        """Reload the next deadline from the database and rearm the timer"""
+        deadline = self._next_deadline()
+        with self._lock:
+            self._deadline = deadline
+            self._loaded = True
+            self._arm(deadline)
+
+    def schedule(self, deadline):
+        """Take into account a new (or reopened) election ending at deadline"""
+        with self._lock:
+            # Not loaded yet: the first refresh() will read it from the database
+            if self._loaded and (self._deadline is None or deadline < self._deadline):
+                self._deadline = deadline
+                self._arm(deadline)
+
+    def _arm(self, deadline):
+        # Must hold self._lock
+        if deadline is None:
+            self._start_timer(None)
+        else:
+            # Elections close once end_date < now, so fire just after it
+            delay = max((deadline - datetime.now()).total_seconds(), 0) + 0.01
+            self._start_timer(delay)
+
+    def _start_timer(self, delay):
+        # Must hold self._lock
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if delay is not None:
+            self._timer = threading.Timer(delay, self._fire)
+            self._timer.name = 'election-scheduler'
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _fire(self):
+        with self.app.app_context():
+            try:
+                self.run()
+            except Exception as e:
+                print(f"Election scheduler run failed: {e}")
+                with self._lock:
+                    self.errors += 1
+                    self._start_timer(RETRY_SECONDS)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'next_deadline': self._deadline.strftime('%Y-%m-%d %H:%M:%S') if self._deadline else None,
+                'loaded': self._loaded,
+                'timer_armed': self._timer is not None and self._timer.is_alive(),
+                'runs': self.runs,
+                'closed': self.closed,
+                'errors': self.errors
+            }
+
+    def shutdown(self):
+        with self._lock:
+            self._start_timer(None)
@@ -1,87 +1,799 @@
 import random
 import secrets
+import threading
+from collections import OrderedDict
 from Crypto.Util import number
 from Crypto.Random import get_random_bytes
 import hashlib
+import json
+import os
+from discrete_log import DiscreteLogSolver
+
+# Pre-vetted safe-prime groups (p = 2q + 1, generator 2). Using one of these
+# avoids generating a fresh 2048-bit prime for every election.
+STANDARD_GROUPS = {
+    # RFC 2409, Oakley group 2 (only for tests)
+    'modp1024': (
+        'FFFFFFFF FFFFFFFF C90FDAA2 2168C234 C4C6628B 80DC1CD1 29024E08 8A67CC74 '
+        '020BBEA6 3B139B22 514A0879 8E3404DD EF9519B3 CD3A431B 302B0A6D F25F1437 '
+        '4FE1356D 6D51C245 E485B576 625E7EC6 F44C42E9 A637ED6B 0BFF5CB6 F406B7ED '
+        'EE386BFB 5A899FA5 AE9F2411 7C4B1FE6 49286651 ECE65381 FFFFFFFF FFFFFFFF'
+    ),
+    # RFC 3526, group 14
+    'modp2048': (
+        'FFFFFFFF FFFFFFFF C90FDAA2 2168C234 C4C6628B 80DC1CD1 29024E08 8A67CC74 '
+        '020BBEA6 3B139B22 514A0879 8E3404DD EF9519B3 CD3A431B 302B0A6D F25F1437 '
+        '4FE1356D 6D51C245 E485B576 625E7EC6 F44C42E9 A637ED6B 0BFF5CB6 F406B7ED '
+        'EE386BFB 5A899FA5 AE9F2411 7C4B1FE6 49286651 ECE45B3D C2007CB8 A163BF05 '
+        '98DA4836 1C55D39A 69163FA8 FD24CF5F 83655D23 DCA3AD96 1C62F356 208552BB '
+        '9ED52907 7096966D 670C354E 4ABC9804 F1746C08 CA18217C 32905E46 2E36CE3B '
+        'E39E772C 180E8603 9B2783A2 EC07A28F B5C55DF0 6F4C52C9 DE2BCBF6 95581718 '
+        '3995497C EA956AE5 15D22618 98FA0510 15728E5A 8AACAA68 FFFFFFFF FFFFFFFF'
+    ),
+    # RFC 3526, group 15
+    'modp3072': (
+        'FFFFFFFF FFFFFFFF C90FDAA2 2168C234 C4C6628B 80DC1CD1 29024E08 8A67CC74 '
+        '020BBEA6 3B139B22 514A0879 8E3404DD EF9519B3 CD3A431B 302B0A6D F25F1437 '
+        '4FE1356D 6D51C245 E485B576 625E7EC6 F44C42E9 A637ED6B 0BFF5CB6 F406B7ED '
+        'EE386BFB 5A899FA5 AE9F2411 7C4B1FE6 49286651 ECE45B3D C2007CB8 A163BF05 '
+        '98DA4836 1C55D39A 69163FA8 FD24CF5F 83655D23 DCA3AD96 1C62F356 208552BB '
+        '9ED52907 7096966D 670C354E 4ABC9804 F1746C08 CA18217C 32905E46 2E36CE3B '
+        'E39E772C 180E8603 9B2783A2 EC07A28F B5C55DF0 6F4C52C9 DE2BCBF6 95581718 '
+        '3995497C EA956AE5 15D22618 98FA0510 15728E5A 8AAAC42D AD33170D 04507A33 '
+        'A85521AB DF1CBA64 ECFB8504 58DBEF0A 8AEA7157 5D060C7D B3970F85 A6E1E4C7 '
+        'ABF5AE8C DB0933D7 1E8C94E0 4A25619D CEE3D226 1AD2EE6B F12FFA06 D98A0864 '
+        'D8760273 3EC86A64 521F2B18 177B200C BBE11757 7A615D6C 770988C0 BAD946E2 '
+        '08E24FA0 74E5AB31 43DB5BFC E0FD108E 4B82D120 A93AD2CA FFFFFFFF FFFFFFFF'
+    ),
+    # RFC 7919
+    'ffdhe2048': (
+        'FFFFFFFF FFFFFFFF ADF85458 A2BB4A9A AFDC5620 273D3CF1 D8B9C583 CE2D3695 '
+        'A9E13641 146433FB CC939DCE 249B3EF9 7D2FE363 630C75D8 F681B202 AEC4617A '
+        'D3DF1ED5 D5FD6561 2433F51F 5F066ED0 85636555 3DED1AF3 B557135E 7F57C935 '
+        '984F0C70 E0E68B77 E2A689DA F3EFE872 1DF158A1 36ADE735 30ACCA4F 483A797A '
+        'BC0AB182 B324FB61 D108A94B B2C8E3FB B96ADAB7 60D7F468 1D4F42A3 DE394DF4 '
+        'AE56EDE7 6372BB19 0B07A7C8 EE0A6D70 9E02FCE1 CDF7E2EC C03404CD 28342F61 '
+        '9172FE9C E98583FF 8E4F1232 EEF28183 C3FE3B1B 4C6FAD73 3BB5FCBC 2EC22005 '
+        'C58EF183 7D1683B2 C6F34A26 C1B2EFFA 886B4238 61285C97 FFFFFFFF FFFFFFFF'
+    ),
+    # RFC 7919
+    'ffdhe3072': (
+        'FFFFFFFF FFFFFFFF ADF85458 A2BB4A9A AFDC5620 273D3CF1 D8B9C583 CE2D3695 '
+        'A9E13641 146433FB CC939DCE 249B3EF9 7D2FE363 630C75D8 F681B202 AEC4617A '
+        'D3DF1ED5 D5FD6561 2433F51F 5F066ED0 85636555 3DED1AF3 B557135E 7F57C935 '
+        '984F0C70 E0E68B77 E2A689DA F3EFE872 1DF158A1 36ADE735 30ACCA4F 483A797A '
+        'BC0AB182 B324FB61 D108A94B B2C8E3FB B96ADAB7 60D7F468 1D4F42A3 DE394DF4 '
+        'AE56EDE7 6372BB19 0B07A7C8 EE0A6D70 9E02FCE1 CDF7E2EC C03404CD 28342F61 '
+        '9172FE9C E98583FF 8E4F1232 EEF28183 C3FE3B1B 4C6FAD73 3BB5FCBC 2EC22005 '
+        'C58EF183 7D1683B2 C6F34A26 C1B2EFFA 886B4238 611FCFDC DE355B3B 6519035B '
+        'BC34F4DE F99C0238 61B46FC9 D6E6C907 7AD91D26 91F7F7EE 598CB0FA C186D91C '
+        'AEFE1309 85139270 B4130C93 BC437944 F4FD4452 E2D74DD3 64F2E21E 71F54BFF '
+        '5CAE82AB 9C9DF69E E86D2BC5 22363A0D ABC52197 9B0DEADA 1DBF9A42 D5C4484E '
+        '0ABCD06B FA53DDEF 3C1B20EE 3FD59D7C 25E41D2B 66C62E37 FFFFFFFF FFFFFFFF'
+    ),
+}
+
+def standard_group(name):
+    """Return (p, g) for one of the STANDARD_GROUPS"""
+    if name not in STANDARD_GROUPS:
+        raise ValueError(f"Unknown ElGamal group: {name}")
+    return int(STANDARD_GROUPS[name].replace(' ', ''), 16), 2
+
+def generate_schnorr_group(bits, q_bits=256):
+    """Generate (p, q, g) with p = k*q + 1 prime and g of prime order q"""
+    q = number.getPrime(q_bits)
+    while True:
+        # k even so that p = k*q + 1 is odd, top bit set so p has `bits` bits
+        k = (secrets.randbits(bits - q_bits) | (1 << (bits - q_bits - 1))) & ~1
+        p = k * q + 1
+        if p.bit_length() == bits and number.isPrime(p):
+            break
+    
+    while True:
+        g = pow(random.randrange(2, p - 1), (p - 1) // q, p)
+        if g != 1:
+            return p, q, g
+
+def load_local_group(path, bits, q_bits=256):
+    """Load (p, g, q) from a JSON parameter file, generating it once if missing
+    
+    q is None for parameter files written before subgroup support.
+    """
+    if os.path.exists(path):
+        with open(path) as f:
+            params = json.load(f)
+        return params['p'], params['g'], params.get('q')
+    
+    p, q, g = generate_schnorr_group(bits, q_bits)
+    
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump({'p': p, 'g': g, 'q': q}, f)
+    os.replace(tmp_path, path)
+    return p, g, q
+
+# Elliptic curves y^2 = x^3 + ax + b available for ElGamal elections
+CURVES = {
+    # NIST P-256 (FIPS 186-4 / SEC 2 secp256r1), cofactor 1
+    'P-256': {
+        'p': 0xffffffff00000001000000000000000000000000ffffffffffffffffffffffff,
+        'a': -3,
+        'b': 0x5ac635d8aa3a93e7b3ebbd55769886bc651d06b0cc53b0f63bce3c3e27d2604b,
+        'n': 0xffffffff00000000ffffffffffffffffbce6faada7179e84f3b9cac2fc632551,
+        'Gx': 0x6b17d1f2e12c4247f8bce6e563a440f277037d812deb33a0f4a13945d898c296,
+        'Gy': 0x4fe342e2fe1a7f9b8ee7eb4a7c0f9e162bce33576b315ececbb6406837bf51f5
+    }
+}
+
+# Low 64 bits of an element, used as lookup key by the discrete log solver
+TABLE_KEY_MASK = (1 << 64) - 1
+
+def jacobi_symbol(a, n):
+    """Jacobi symbol (a/n) for odd n > 0; the Legendre symbol when n is prime
+    
+    Much cheaper than Euler's criterion pow(a, (n - 1) // 2, n) for the
+    subgroup-membership test of safe-prime groups.
+    """
+    a %= n
+    result = 1
+    while a:
+        while not a & 1:
+            a >>= 1
+            if n & 7 in (3, 5):
+                result = -result
+        a, n = n, a
+        if a & 3 == 3 and n & 3 == 3:
+            result = -result
+        a %= n
+    return result if n == 1 else 0
+
+class ModularGroup:
+    """Multiplicative group of integers modulo a prime p (classic ElGamal)
+    
+    Elements are plain integers, so encode/decode are the identity and
+    ciphertexts stay JSON-serializable as before. When the order q of g is
+    known, private keys and nonces are short exponents of exponent_bits
+    bits; otherwise (legacy keys) they are drawn from [1, p-2].
+    """
+    identity = 1
+    
+    def __init__(self, p, g=None, fixed_base=None, q=None, exponent_bits=256):
+        self.p = p
+        self.generator = g
+        self.fixed_base = fixed_base
+        self.q = q
+        if q:
+            self.exponent_bits = min(q.bit_length(), exponent_bits)
+        else:
+            self.exponent_bits = p.bit_length()
+    
+    @property
+    def cache_id(self):
+        return f"{self.p}:{self.generator}"
+    
+    def op(self, a, b):
+        return (a * b) % self.p
+    
+    def inverse(self, a):
+        return pow(a, -1, self.p)
+    
+    def exp(self, base, exponent):
+        return pow(base, exponent, self.p)
+    
+    def fixed_exp(self, base, exponent):
+        """Exponentiation of a base that is reused many times (g or y)"""
+        if self.fixed_base is None:
+            return pow(base, exponent, self.p)
+        return self.fixed_base.pow(base, exponent, self.p, self.exponent_bits)
+    
+    def random_exponent(self):
+        if self.q:
+            upper = min(self.q, 1 << self.exponent_bits)
+            return 1 + secrets.randbelow(upper - 1)
+        return 1 + secrets.randbelow(self.p - 2)
+    
+    @property
+    def encodes_messages(self):
+        """Whether arbitrary messages can be encoded into the group of g
+        
+        With a known subgroup order q only safe primes (p = 2q + 1) can: the
+        subgroup is then the quadratic residues. Keys without q use the
+        whole group, as before.
+        """
+        return not self.q or self.p == 2 * self.q + 1
+    
+    def message_element(self, message):
+        """Convert a str or int message into a group element
+        
+        In a safe-prime group the message m (1 <= m <= q) is mapped to
+        whichever of m and p - m is a quadratic residue: a ciphertext c2
+        outside the subgroup of g would reveal the message (c2^q = m^q)
+        without the private key.
+        """
+        if isinstance(message, str):
+            message_int = int.from_bytes(message.encode('utf-8'), 'big')
+        else:
+            message_int = message
+        
+        if not self.q:
+            # Ensure message is smaller than p
+            if message_int >= self.p:
+                raise ValueError("Message too large for key size")
+            return message_int
+        if not self.encodes_messages:
+            raise ValueError("Messages cannot be encoded in this subgroup; use exponential ballots")
+        if not 0 < message_int <= self.q:
+            raise ValueError("Message out of range for key size")
+        if jacobi_symbol(message_int, self.p) == 1:
+            return message_int
+        return self.p - message_int
+    
+    def contains(self, element):
+        """Whether element belongs to the subgroup generated by g
+        
+        Without a known order q (legacy keys) any 0 < element < p does.
+        """
+        if type(element) is not int or not 0 < element < self.p:
+            return False
+        if not self.q:
+            return True
+        if self.p == 2 * self.q + 1:
+            # The subgroup of order q is that of the quadratic residues
+            return jacobi_symbol(element, self.p) == 1
+        return pow(element, self.q, self.p) == 1
+    
+    def element_message(self, element):
+        """Inverse of message_element"""
+        # Messages below q decode to themselves, so ciphertexts from before
+        # the encoding (and legacy keys) still decrypt
+        if self.q and self.encodes_messages and element > self.q:
+            return self.p - element
+        return element
+    
+    def encode(self, element):
+        return element
+    
+    def decode(self, value):
+        return value
+    
+    def table_key(self, element):
+        return element & TABLE_KEY_MASK
+    
+    def equals(self, a, b):
+        return a % self.p == b % self.p
+
+class EllipticCurveGroup:
+    """Additive group of points on one of the CURVES
+    
+    Points are kept in Jacobian coordinates (X, Y, Z) so additions need no
+    modular inversion, and None is the point at infinity. They are stored as
+    compressed SEC1 hex strings: 33 bytes per point instead of a 2048-bit
+    integer.
+    """
+    identity = None
+    
+    def __init__(self, name, fixed_base_tables=16, window=4):
+        if name not in CURVES:
+            raise ValueError(f"Unknown elliptic curve: {name}")
+        params = CURVES[name]
+        self.name = name
+        self.p = params['p']
+        self.a = params['a']
+        self.b = params['b']
+        self.order = params['n']
+        self.generator = (params['Gx'], params['Gy'], 1)
+        self.max_tables = fixed_base_tables
+        self.window = window
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @property
+    def cache_id(self):
+        return self.name
+    
+    def affine(self, point):
+        """Return (x, y) for a point, or None for the point at infinity"""
+        if point is None:
+            return None
+        X, Y, Z = point
+        if Z == 1:
+            return (X, Y)
+        p = self.p
+        z_inv = pow(Z, -1, p)
+        z_inv2 = (z_inv * z_inv) % p
+        return ((X * z_inv2) % p, (Y * z_inv2 * z_inv) % p)
+    
+    def equals(self, a, b):
+        return self.affine(a) == self.affine(b)
+    
+    def double(self, point):
+        if point is None:
+            return None
+        p = self.p
+        X, Y, Z = point
+        if Y == 0:
+            return None
+        
+        YY = (Y * Y) % p
+        S = (4 * X * YY) % p
+        ZZ = (Z * Z) % p
+        M = (3 * X * X + self.a * ZZ * ZZ) % p
+        X3 = (M * M - 2 * S) % p
+        Y3 = (M * (S - X3) - 8 * YY * YY) % p
+        Z3 = (2 * Y * Z) % p
+        return (X3, Y3, Z3)
+    
+    def op(self, a, b):
+        """Point addition"""
+        if a is None:
+            return b
+        if b is None:
+            return a
+        
+        p = self.p
+        X1, Y1, Z1 = a
+        X2, Y2, Z2 = b
+        
+        Z1Z1 = (Z1 * Z1) % p
+        U2 = (X2 * Z1Z1) % p
+        S2 = (Y2 * Z1 * Z1Z1) % p
+        if Z2 == 1:
+            U1, S1 = X1, Y1
+        else:
+            Z2Z2 = (Z2 * Z2) % p
+            U1 = (X1 * Z2Z2) % p
+            S1 = (Y1 * Z2 * Z2Z2) % p
+        
+        if U1 == U2:
+            if S1 != S2:
+                return None
+            return self.double(a)
+        
+        H = (U2 - U1) % p
+        R = (S2 - S1) % p
+        HH = (H * H) % p
+        HHH = (H * HH) % p
+        V = (U1 * HH) % p
+        X3 = (R * R - HHH - 2 * V) % p
+        Y3 = (R * (V - X3) - S1 * HHH) % p
+        Z3 = (H * Z1 * Z2) % p
+        return (X3, Y3, Z3)
+    
+    def inverse(self, a):
+        if a is None:
+            return None
+        X, Y, Z = a
+        return (X, (-Y) % self.p, Z)
+    
+    def exp(self, point, scalar):
+        """Scalar multiplication by double-and-add"""
+        scalar %= self.order
+        result = None
+        for bit in bin(scalar)[2:]:
+            result = self.double(result)
+            if bit == '1':
+                result = self.op(result, point)
+        return result
+    
+    def _fixed_table(self, point):
+        key = self.affine(point)
+        with self._lock:
+            rows = self._tables.get(key)
+            if rows is not None:
+                self._tables.move_to_end(key)
+                return rows
+        
+        rows = []
+        current = point
+        for _ in range((self.order.bit_length() + self.window - 1) // self.window):
+            row = [None]
+            for _ in range((1 << self.window) - 1):
+                row.append(self.op(row[-1], current))
+            # Normalize to Z = 1 so table additions take the cheaper path
+            row = [None] + [self.affine(entry) + (1,) for entry in row[1:]]
+            rows.append(row)
+            current = self.op(row[-1], current)
+        
+        with self._lock:
+            self._tables[key] = rows
+            while len(self._tables) > self.max_tables:
+                self._tables.popitem(last=False)
+        return rows
+    
+    def fixed_exp(self, point, scalar):
+        """Scalar multiplication of a reused point using a windowed table"""
+        if self.max_tables <= 0:
+            return self.exp(point, scalar)
+        
+        scalar %= self.order
+        mask = (1 << self.window) - 1
+        result = None
+        for row in self._fixed_table(point):
+            if not scalar:
+                break
+            digit = scalar & mask
+            if digit:
+                result = self.op(result, row[digit])
+            scalar >>= self.window
+        return result
+    
+    def random_exponent(self):
+        return 1 + secrets.randbelow(self.order - 1)
+    
+    def message_element(self, message):
+        """Messages must already be points (see encrypt_exponential)"""
+        if isinstance(message, int):
+            raise ValueError("Elliptic curve ElGamal only encrypts points; use exponential ballots")
+        return self.decode(message)
+    
+    def contains(self, point):
+        """Decoded points are always in the group: decode() checks they are
+        on the curve, and the supported curves have cofactor 1"""
+        return True
+    
+    def element_message(self, element):
+        return element
+    
+    def encode(self, point):
+        """Compressed SEC1 encoding as a hex string ('00' is the point at infinity)"""
+        point = self.affine(point)
+        if point is None:
+            return '00'
+        x, y = point
+        return ('03' if y & 1 else '02') + format(x, '064x')
+    
+    def decode(self, value):
+        """Parse and validate a compressed point; points pass through unchanged"""
+        if isinstance(value, bytes):
+            value = value.hex()
+        if not isinstance(value, str):
+            return value
+        if value == '00':
+            return None
+        
+        prefix, x = value[:2], int(value[2:], 16)
+        if prefix not in ('02', '03') or len(value) != 66 or x >= self.p:
+            raise ValueError("Invalid compressed point")
+        
+        p = self.p
+        rhs = (x * x * x + self.a * x + self.b) % p
+        # p = 3 mod 4 for the supported curves, so this is a square root
+        y = pow(rhs, (p + 1) // 4, p)
+        if (y * y) % p != rhs:
+            raise ValueError("Point is not on the curve")
+        if (y & 1) != (prefix == '03'):
+            y = p - y
+        return (x, y, 1)
+    
+    def table_key(self, point):
+        point = self.affine(point)
+        if point is None:
+            return 0
+        return point[0] & TABLE_KEY_MASK
+
+class FixedBaseTable:
+    """Precomputed powers of a fixed base for fast windowed exponentiation
+
+    Row i holds base^(j * 2^(window*i)) mod p for every window digit j, so an
+    exponentiation is one modular multiplication per non-zero digit of the
+    exponent and no squarings at all.
+    """
+    def __init__(self, base, p, exponent_bits, window=4):
+        self.base = base
+        self.p = p
+        self.window = window
+        self.exponent_bits = exponent_bits
+        self.rows = []
+        
+        current = base % p
+        for _ in range((exponent_bits + window - 1) // window):
+            row = [1]
+            for _ in range((1 << window) - 1):
+                row.append((row[-1] * current) % p)
+            self.rows.append(row)
+            # Next row starts at base^(2^(window*(i+1)))
+            current = (row[-1] * current) % p
+    
+    def pow(self, exponent):
+        """Compute base^exponent mod p using the precomputed rows"""
+        if exponent < 0 or exponent.bit_length() > self.exponent_bits:
+            return pow(self.base, exponent, self.p)
+        
+        p = self.p
+        mask = (1 << self.window) - 1
+        result = 1
+        for row in self.rows:
+            if not exponent:
+                break
+            digit = exponent & mask
+            if digit:
+                result = (result * row[digit]) % p
+            exponent >>= self.window
+        return result
+
+class FixedBaseCache:
+    """Bounded LRU cache of FixedBaseTable objects keyed by (base, p, exponent bits)
+
+    Tables are built lazily the first time a base is used, so each election
+    pays the precomputation once and every later ballot reuses it.
+    """
+    def __init__(self, max_tables=16, window=4):
+        self.max_tables = max_tables
+        self.window = window
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, base, p, exponent_bits=None):
+        """Return the table for base modulo p, building it if needed"""
+        exponent_bits = exponent_bits or p.bit_length()
+        key = (base, p, exponent_bits)
+        with self._lock:
+            table = self._tables.get(key)
+            if table is not None:
+                self._tables.move_to_end(key)
+                return table
+        
+        # Build outside the lock so other elections are not blocked
+        table = FixedBaseTable(base, p, exponent_bits, self.window)
+        
+        with self._lock:
+            self._tables[key] = table
+            self._tables.move_to_end(key)
+            while len(self._tables) > self.max_tables:
+                self._tables.popitem(last=False)
+        return table
+    
+    def pow(self, base, exponent, p, exponent_bits=None):
+        """Compute base^exponent mod p, falling back to pow() when disabled
+        
+        exponent_bits sizes the table (short exponents need fewer rows);
+        larger exponents still work through pow().
+        """
+        if self.max_tables <= 0:
+            return pow(base, exponent, p)
+        return self.get(base, p, exponent_bits).pow(exponent)
+    
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
 
 class ElGamalCrypto:
-    def __init__(self, key_size=2048):
+    def __init__(self, key_size=2048, fixed_base_tables=16, fixed_base_window=4, dlog_solver=None,
+                 group=None, params_file=None, exponent_bits=256):
         self.key_size = key_size
+        # Length of private keys and nonces in prime-order subgroups
+        self.exponent_bits = exponent_bits
         self.p = None
+        self.q = None
         self.g = None
         self.private_key = None
         self.public_key = None
+        # Shared group parameters; None means a new prime for every key pair
+        self.group = None
+        if group:
+            self.load_group(group, params_file)
+        # Precomputed tables for g^k and y^k, shared by every encrypt() call
+        self.fixed_base = FixedBaseCache(fixed_base_tables, fixed_base_window)
+        self.fixed_base_tables = fixed_base_tables
+        self.fixed_base_window = fixed_base_window
+        self._curve_groups = {}
+        self._batch_groups = OrderedDict()
+        # Baby-step giant-step solver used to turn g^count back into count
+        self.dlog_solver = dlog_solver or DiscreteLogSolver()
     
     def generate_prime(self, bits):
         """Generate a prime number of specified bits"""
         return number.getPrime(bits)
     
+    def load_group(self, group, params_file=None):
+        """Use shared group parameters for every key pair
+        
+        group is one of STANDARD_GROUPS or 'local', which loads (or creates
+        once) the parameter set stored in params_file.
+        """
+        if group == 'local':
+            if not params_file:
+                raise ValueError("params_file is required for the local group")
+            p, g, q = load_local_group(params_file, self.key_size, self.exponent_bits)
+        else:
+            p, g = standard_group(group)
+            # Safe prime: 2 generates the subgroup of order q = (p - 1) / 2
+            q = (p - 1) // 2
+        
+        self.group = group
+        self.p = p
+        self.q = q
+        self.g = g
+        self.key_size = p.bit_length()
+    
     def generate_keys(self):
         """Generate ElGamal key pair"""
-        # Generate a large prime p
-        self.p = self.generate_prime(self.key_size)
-        
-        # Generate generator g
-        self.g = random.randrange(2, self.p - 1)
+        # With shared group parameters only the private key has to be drawn
+        if not self.group:
+            # Generate a Schnorr group: prime p with a subgroup of prime order q
+            self.p, self.q, self.g = generate_schnorr_group(self.key_size, self.exponent_bits)
         
-        # Generate private key (random number between 1 and p-2)
-        self.private_key = random.randrange(1, self.p - 1)
+        # Generate private key (short exponent in the order-q subgroup)
+        group = ModularGroup(self.p, self.g, q=self.q, exponent_bits=self.exponent_bits)
+        self.private_key = group.random_exponent()
         
         # Calculate public key: g^private_key mod p
         self.public_key = pow(self.g, self.private_key, self.p)
         
-        return {
+        keys = {
             'p': self.p,
             'g': self.g,
             'public_key': self.public_key,
             'private_key': self.private_key
         }
+        if self.q:
+            keys['q'] = self.q
+        if self.group:
+            keys['group'] = self.group
+        return keys
     
-    def encrypt(self, message, public_key_data):
-        """Encrypt a message using ElGamal encryption"""
-        p = public_key_data['p']
-        g = public_key_data['g']
-        public_key = public_key_data['public_key']
-        
-        # Convert message to integer
-        if isinstance(message, str):
-            message_int = int.from_bytes(message.encode('utf-8'), 'big')
-        else:
-            message_int = message
+    def generate_curve_keys(self, curve='P-256'):
+        """Generate an elliptic-curve ElGamal key pair on one of the CURVES"""
+        group = self.curve_group(curve)
+        private_key = group.random_exponent()
+        public_key = group.fixed_exp(group.generator, private_key)
+        return {
+            'curve': curve,
+            'public_key': group.encode(public_key),
+            'private_key': private_key
+        }
+    
+    def curve_group(self, name):
+        """Return the (cached) EllipticCurveGroup for a curve name"""
+        group = self._curve_groups.get(name)
+        if group is None:
+            group = EllipticCurveGroup(name, self.fixed_base_tables, self.fixed_base_window)
+            self._curve_groups[name] = group
+        return group
+    
+    def group_for(self, key_data):
+        """Return the group an election key (public or private) belongs to"""
+        if 'curve' in key_data:
+            return self.curve_group(key_data['curve'])
+        return ModularGroup(key_data['p'], key_data.get('g'), self.fixed_base,
+                            q=key_data.get('q'), exponent_bits=self.exponent_bits)
+    
+    def _as_group(self, group_or_p):
+        if isinstance(group_or_p, int):
+            return ModularGroup(group_or_p, fixed_base=self.fixed_base)
+        return group_or_p
+    
+    def encrypt(self, message, public_key_data, coupon=None):
+        """Encrypt a message using ElGamal encryption
         
-        # Ensure message is smaller than p
-        if message_int >= p:
-            raise ValueError("Message too large for key size")
+        coupon is an optional precomputed (k, g^k, y^k) from
+        precompute_coupons(); it must never be used for a second encryption.
+        """
+        group = self.group_for(public_key_data)
+        public_key = group.decode(public_key_data['public_key'])
+        return self._encrypt_element(group, public_key, group.message_element(message), coupon)
+    
+    def _encrypt_element(self, group, public_key, message_element, coupon=None):
+        if coupon is not None:
+            # Offline part already done: only message * y^k is left
+            _, c1, shared = coupon
+            return (c1, group.encode(group.op(message_element, shared)))
         
         # Generate random k
-        k = random.randrange(1, p - 1)
+        k = group.random_exponent()
+        
+        # Calculate c1 = g^k
+        c1 = group.fixed_exp(group.generator, k)
+        
+        # Calculate c2 = message * public_key^k
+        c2 = group.op(message_element, group.fixed_exp(public_key, k))
         
-        # Calculate c1 = g^k mod p
-        c1 = pow(g, k, p)
+        return (group.encode(c1), group.encode(c2))
+    
+    def _decrypt_element(self, group, ciphertext, private_key):
+        c1, c2 = (group.decode(c) for c in ciphertext)
         
-        # Calculate c2 = message * (public_key^k) mod p
-        c2 = (message_int * pow(public_key, k, p)) % p
+        # Calculate s = c1^private_key
+        s = group.exp(c1, private_key)
         
-        return (c1, c2)
+        # Calculate message = c2 * s^(-1)
+        return group.op(c2, group.inverse(s))
     
     def decrypt(self, ciphertext, private_key_data):
         """Decrypt a ciphertext using ElGamal decryption"""
-        c1, c2 = ciphertext
-        p = private_key_data['p']
-        private_key = private_key_data['private_key']
+        group = self.group_for(private_key_data)
+        message = self._decrypt_element(group, ciphertext, private_key_data['private_key'])
+        return group.encode(group.element_message(message))
+    
+    def _batch_group(self, public_key_data, window):
+        """Group with its own wide-window tables, reused across encrypt_many calls"""
+        key = (public_key_data.get('curve') or public_key_data['p'], str(public_key_data['public_key']), window)
+        group = self._batch_groups.get(key)
+        if group is None:
+            if 'curve' in public_key_data:
+                group = EllipticCurveGroup(public_key_data['curve'], fixed_base_tables=2, window=window)
+            else:
+                group = ModularGroup(public_key_data['p'], public_key_data['g'], FixedBaseCache(2, window),
+                                     q=public_key_data.get('q'), exponent_bits=self.exponent_bits)
+            self._batch_groups[key] = group
+            while len(self._batch_groups) > 2:
+                self._batch_groups.popitem(last=False)
+        return group
+    
+    def encrypt_many(self, plaintexts, public_key_data, exponential=False, processes=1,
+                     chunk_size=256, window=6):
+        """Encrypt many plaintexts for one public key, yielding ciphertexts in order
         
-        # Calculate s = c1^private_key mod p
-        s = pow(c1, private_key, p)
+        Plaintexts are anything encrypt_vote accepts, or small integers
+        encrypted as g^m when exponential is True. The key is parsed once
+        and encrypted with dedicated fixed-base tables of the given window
+        (wider than the per-vote ones, since their cost is amortized over the
+        batch). With processes > 1 chunks are encrypted in a process pool
+        whose workers keep their own tables; results are still streamed in
+        input order with a bounded number of chunks in flight.
+        """
+        if processes > 1:
+            yield from self._encrypt_many_parallel(
+                plaintexts, public_key_data, exponential, processes, chunk_size, window
+            )
+            return
         
-        # Calculate s_inv = s^(-1) mod p
-        s_inv = pow(s, p - 2, p)
+        group = self._batch_group(public_key_data, window)
+        public_key = group.decode(public_key_data['public_key'])
+        powers = {}
+        for plaintext in plaintexts:
+            if exponential:
+                # Ballot values repeat (0/1), so g^m is computed once per value
+                message_element = powers.get(plaintext)
+                if message_element is None:
+                    message_element = powers[plaintext] = group.fixed_exp(group.generator, plaintext)
+            else:
+                if isinstance(plaintext, dict):
+                    plaintext = json.dumps(plaintext)
+                message_element = group.message_element(plaintext)
+            yield self._encrypt_element(group, public_key, message_element)
+    
+    def _encrypt_many_parallel(self, plaintexts, public_key_data, exponential, processes, chunk_size, window):
+        from concurrent.futures import ProcessPoolExecutor
+        from collections import deque
+        from itertools import islice
         
-        # Calculate message = c2 * s_inv mod p
-        message = (c2 * s_inv) % p
+        iterator = iter(plaintexts)
+        in_flight = deque()
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            while True:
+                # Keep every worker busy plus one queued chunk each
+                while len(in_flight) < processes * 2:
+                    chunk = list(islice(iterator, chunk_size))
+                    if not chunk:
+                        break
+                    in_flight.append(executor.submit(
+                        _encrypt_chunk, chunk, public_key_data, exponential, window
+                    ))
+                if not in_flight:
+                    break
+                yield from in_flight.popleft().result()
+    
+    def precompute_coupons(self, public_key_data, count, window=6):
+        """Precompute the vote-independent part of count encryptions
         
-        return message
+        Returns a list of (k, g^k, y^k) coupons, g^k already encoded, for
+        encrypt(..., coupon=...). Each coupon must be used exactly once:
+        reusing k leaks the ratio of the two plaintexts.
+        """
+        group = self._batch_group(public_key_data, window)
+        public_key = group.decode(public_key_data['public_key'])
+        coupons = []
+        for _ in range(count):
+            k = group.random_exponent()
+            c1 = group.encode(group.fixed_exp(group.generator, k))
+            coupons.append((k, c1, group.fixed_exp(public_key, k)))
+        return coupons
     
-    def encrypt_vote(self, vote_option, public_key_data):
+    def encrypt_vote(self, vote_option, public_key_data, coupon=None):
         """Encrypt a vote option
         
         Can accept:
@@ -90,12 +802,11 @@ class ElGamalCrypto:
         """
         if isinstance(vote_option, dict):
             # Convert dict to string for encryption
-            import json
             vote_str = json.dumps(vote_option)
-            return self.encrypt(vote_str, public_key_data)
+            return self.encrypt(vote_str, public_key_data, coupon)
         else:
             # Direct encryption for integers and strings
-            return self.encrypt(vote_option, public_key_data)
+            return self.encrypt(vote_option, public_key_data, coupon)
     
     def decrypt_vote(self, encrypted_vote, private_key_data):
         """Decrypt a vote
@@ -113,7 +824,6 @@ class ElGamalCrypto:
             decoded_str = decrypted_bytes.decode('utf-8')
             
             # Check if it's valid JSON (dictionary)
-            import json
             try:
                 return json.loads(decoded_str)
             except json.JSONDecodeError:
@@ -123,19 +833,109 @@ class ElGamalCrypto:
             # If any error occurs, return the original integer
             return decrypted_result
     
+    def encrypt_exponential(self, value, public_key_data, coupon=None):
+        """Encrypt g^value (exponential ElGamal) so ciphertexts add homomorphically"""
+        group = self.group_for(public_key_data)
+        public_key = group.decode(public_key_data['public_key'])
+        # g^value is already in the subgroup: no message encoding
+        return self._encrypt_element(group, public_key, group.fixed_exp(group.generator, value), coupon)
+    
+    def decrypt_exponential(self, ciphertext, private_key_data, max_value=None):
+        """Decrypt an exponential ciphertext and recover value from g^value
+        
+        For modular groups private_key_data must include the generator 'g'.
+        The discrete log is solved with the baby-step giant-step solver;
+        max_value (e.g. the number of ballots) bounds the search and defaults
+        to the solver's.
+        """
+        group = self.group_for(private_key_data)
+        target = self._decrypt_element(group, ciphertext, private_key_data['private_key'])
+        return self.dlog_solver.solve(group, target, max_value)
+    
+    def encrypt_ballot(self, candidate_ids, selected_candidate_id, public_key_data, coupons=None):
+        """Encrypt a ballot as one exponential ciphertext per candidate
+        
+        The selected candidate gets an encryption of g^1, every other
+        candidate an encryption of g^0, so summing ballots per candidate
+        with homomorphic_add yields an encryption of g^count. Coupons from
+        precompute_coupons() are popped from the coupons list as they are
+        used; candidates left without one are encrypted online.
+        """
+        ballot = {}
+        for candidate_id in candidate_ids:
+            value = 1 if candidate_id == selected_candidate_id else 0
+            coupon = coupons.pop() if coupons else None
+            ballot[str(candidate_id)] = self.encrypt_exponential(value, public_key_data, coupon)
+        return ballot
+    
+    def aggregate_ballots(self, ballots, p, aggregates=None):
+        """Homomorphically add exponential ballots into per-candidate ciphertexts
+        
+        p is the modulus or the election's group (see group_for). Returns a
+        dict {candidate_id: ciphertext} with decoded group elements; pass a
+        previous result as aggregates to keep folding into it.
+        """
+        group = self._as_group(p)
+        if aggregates is None:
+            aggregates = {}
+        for ballot in ballots:
+            for candidate_id, ciphertext in ballot.items():
+                candidate_id = int(candidate_id)
+                c1, c2 = (group.decode(c) for c in ciphertext)
+                if candidate_id in aggregates:
+                    a1, a2 = aggregates[candidate_id]
+                    aggregates[candidate_id] = (group.op(a1, c1), group.op(a2, c2))
+                else:
+                    aggregates[candidate_id] = (c1, c2)
+        return aggregates
+    
+    def validate_ciphertext(self, ciphertext, group):
+        """Raise ValueError unless ciphertext is a pair of encoded elements of group
+        
+        Elements must belong to the subgroup of the election's generator: a
+        single element outside it (e.g. p - 1) would corrupt every
+        homomorphic sum it is added to. Curve points are checked to lie on
+        the curve.
+        """
+        if not isinstance(ciphertext, (list, tuple)) or len(ciphertext) != 2:
+            raise ValueError("Ciphertext must be a pair (c1, c2)")
+        for value in ciphertext:
+            if isinstance(group, ModularGroup):
+                if not group.contains(value):
+                    raise ValueError("Ciphertext element is not in the election's group")
+            elif not isinstance(value, str):
+                raise ValueError("Ciphertext element must be a compressed point")
+            else:
+                group.decode(value)
+    
     def homomorphic_add(self, ciphertext1, ciphertext2, p):
-        """Add two ciphertexts homomorphically"""
-        c1_1, c2_1 = ciphertext1
-        c1_2, c2_2 = ciphertext2
+        """Add two ciphertexts homomorphically
+        
+        p is the modulus, or the group of an elliptic-curve election.
+        """
+        group = self._as_group(p)
+        c1_1, c2_1 = (group.decode(c) for c in ciphertext1)
+        c1_2, c2_2 = (group.decode(c) for c in ciphertext2)
         
         # Homomorphic addition: (c1_1 * c1_2, c2_1 * c2_2)
-        new_c1 = (c1_1 * c1_2) % p
-        new_c2 = (c2_1 * c2_2) % p
+        new_c1 = group.op(c1_1, c1_2)
+        new_c2 = group.op(c2_1, c2_2)
         
-        return (new_c1, new_c2)
+        return (group.encode(new_c1), group.encode(new_c2))
     
     @staticmethod
     def hash_vote(vote_data):
         """Create a hash of vote data for integrity verification"""
         vote_str = str(vote_data)
         return hashlib.sha256(vote_str.encode()).hexdigest()
+
+# Per-process crypto instance for encrypt_many workers, so their tables
+# survive between chunks
+_worker_crypto = None
+
+def _encrypt_chunk(plaintexts, public_key_data, exponential, window):
+    """Process pool entry point for ElGamalCrypto.encrypt_many"""
+    global _worker_crypto
+    if _worker_crypto is None:
+        _worker_crypto = ElGamalCrypto()
+    return list(_worker_crypto.encrypt_many(plaintexts, public_key_data, exponential, window=window))
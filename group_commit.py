@@ -0,0 +1,188 @@
+"""
+Group commit for vote writes
+
+At election open every vote() waits for its own transaction to be flushed
+to disk. With group commit, requests hand their write to a committer thread
+instead; writes arriving within linger_ms of each other (up to max_batch)
+run in one transaction, each inside its own savepoint, so a write that
+violates a constraint (e.g. one vote per user) fails alone without
+aborting the rest of the batch. submit() returns a Future that completes
+only after the batch has committed, so a request is never acknowledged
+before its vote is durable.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Execution option set on the committer's connections. On SQLite app.py
+# turns it into BEGIN IMMEDIATE: pysqlite would otherwise only begin at the
+# first INSERT, after the batch's first SAVEPOINT, which would then commit
+# on release and could not be rolled back with the batch
+BEGIN_IMMEDIATE = 'begin_immediate'
+
+# Upper bounds (milliseconds) of the latency histogram buckets
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+class Histogram:
+    """Per-bucket (non-cumulative) counts plus count, mean and max"""
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def snapshot(self):
+        labels = [f"<={bound}" for bound in self.buckets] + [f">{self.buckets[-1]}"]
+        return {
+            'buckets': dict(zip(labels, self.counts)),
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0,
+            'max': self.max
+        }
+
+class GroupCommitter:
+    def __init__(self, app, db, max_batch=64, linger_ms=2):
+        self.app = app
+        self.db = db
+        self.max_batch = max_batch
+        self.linger = linger_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        # Histograms exposed through stats()
+        self.batch_sizes = Histogram((1, 2, 4, 8, 16, 32, 64, 128, 256))
+        self.commit_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.wait_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.failed_batches = 0
+
+    def start(self):
+        """Start the committer thread (safe to call repeatedly)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+                self._thread.start()
+
+    def submit(self, write):
+        """Queue write (a callable using db.session) for the next batch
+
+        Returns a Future resolved with write's result once the batch has
+        committed, or with the exception that made the write fail.
+        """
+        self.start()
+        future = Future()
+        self._queue.put((write, future, time.perf_counter()))
+        return future
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                batch = [item]
+                deadline = time.perf_counter() + self.linger
+                stopping = False
+                while len(batch) < self.max_batch:
+                    timeout = deadline - time.perf_counter()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+
+                try:
+                    self._commit(batch)
+                except Exception as e:
+                    # Never leave a request waiting on a batch that blew up
+                    for _, future, _ in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                if stopping:
+                    return
+
+    def _commit(self, batch):
+        session = self.db.session
+        started = time.perf_counter()
+        session.connection(execution_options={BEGIN_IMMEDIATE: True})
+        outcomes = []
+        for write, future, _ in batch:
+            try:
+                with session.begin_nested():
+                    outcomes.append((None, write()))
+            except Exception as e:
+                outcomes.append((e, None))
+
+        try:
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Group commit of {len(batch)} writes failed, retrying one by one: {e}")
+            with self._lock:
+                self.failed_batches += 1
+            outcomes = [self._commit_one(write) for write, _, _ in batch]
+        finally:
+            # Do not keep the batch's objects in the identity map
+            self.db.session.remove()
+
+        finished = time.perf_counter()
+        with self._lock:
+            self.batch_sizes.observe(len(batch))
+            self.commit_ms.observe((finished - started) * 1000)
+            for _, _, enqueued in batch:
+                self.wait_ms.observe((finished - enqueued) * 1000)
+
+        for (write, future, _), (error, result) in zip(batch, outcomes):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _commit_one(self, write):
+        session = self.db.session
+        try:
+            session.connection(execution_options={BEGIN_IMMEDIATE: True})
+            result = write()
+            session.commit()
+            return None, result
+        except Exception as e:
+            session.rollback()
+            return e, None
+
+    def stats(self):
+        """Batch size, commit latency and end-to-end wait histograms"""
+        with self._lock:
+            return {
+                'max_batch': self.max_batch,
+                'linger_ms': self.linger * 1000,
+                'queued': self._queue.qsize(),
+                'failed_batches': self.failed_batches,
+                'batch_size': self.batch_sizes.snapshot(),
+                'commit_ms': self.commit_ms.snapshot(),
+                'wait_ms': self.wait_ms.snapshot()
+            }
+
+    def shutdown(self):
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout=5)
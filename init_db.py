@@ -134,6 +134,11 @@ def init_app_tables():
             db.create_all()
             print("✅ Tablas de la aplicación creadas exitosamente")
             
+            # Aplicar las migraciones pendientes (índices, columnas nuevas)
+            from migrations import run_migrations
+            run_migrations(db.engine, db.metadata)
+            print("✅ Esquema migrado a la última versión")
+            
             # Verificar que las tablas se crearon
             from sqlalchemy import inspect
             inspector = inspect(db.engine)
@@ -0,0 +1,111 @@
+"""
+Background pool of pre-generated ElGamal key pairs for new elections
+
+Key pairs are generated by worker processes with ElGamalCrypto.generate_keys
+and handed out instantly by acquire(); every hand-out triggers an
+asynchronous refill. When the pool is empty a key pair is generated
+synchronously, so creating an election never fails because of the pool.
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from elgamal_crypto import ElGamalCrypto
+
+def _generate_key_pair(key_size, group, params_file):
+    """Worker process entry point"""
+    crypto = ElGamalCrypto(key_size=key_size, group=group, params_file=params_file, fixed_base_tables=0)
+    return crypto.generate_keys()
+
+class KeyPool:
+    def __init__(self, crypto, size=4, workers=1, params_file=None):
+        self.crypto = crypto
+        self.size = size
+        self.workers = workers
+        self.params_file = params_file
+        self._keys = deque()
+        self._pending = 0
+        self._executor = None
+        self._lock = threading.Lock()
+        # Counters exposed through stats()
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.errors = 0
+
+    def start(self):
+        """Fill the pool in the background (safe to call repeatedly)"""
+        self._refill()
+
+    def acquire(self):
+        """Return a ready key pair, generating one synchronously on a miss"""
+        with self._lock:
+            if self._keys:
+                keys = self._keys.popleft()
+                self.hits += 1
+            else:
+                keys = None
+                self.misses += 1
+
+        if keys is None:
+            keys = self.crypto.generate_keys()
+
+        self._refill()
+        return keys
+
+    def _refill(self):
+        if self.size <= 0:
+            return
+
+        with self._lock:
+            missing = self.size - len(self._keys) - self._pending
+            if missing <= 0:
+                return
+            self._pending += missing
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            executor = self._executor
+
+        for _ in range(missing):
+            try:
+                future = executor.submit(
+                    _generate_key_pair, self.crypto.key_size, self.crypto.group, self.params_file
+                )
+            except RuntimeError as e:
+                # Executor shut down (e.g. interpreter exiting)
+                print(f"Key pool refill failed: {e}")
+                with self._lock:
+                    self._pending -= 1
+                    self.errors += 1
+                continue
+            future.add_done_callback(self._on_generated)
+
+    def _on_generated(self, future):
+        with self._lock:
+            self._pending -= 1
+            try:
+                self._keys.append(future.result())
+                self.generated += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"Key pool worker failed: {e}")
+
+    def stats(self):
+        """Pool depth, refill concurrency and hit/miss counters"""
+        with self._lock:
+            return {
+                'size': self.size,
+                'available': len(self._keys),
+                'pending': self._pending,
+                'workers': self.workers,
+                'hits': self.hits,
+                'misses': self.misses,
+                'generated': self.generated,
+                'errors': self.errors
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
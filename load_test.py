@@ -0,0 +1,268 @@
+"""
+Prueba de carga de extremo a extremo: votación concurrente y conteo
+
+Crea una elección con N votantes sintéticos, lanza /login y después /vote
+desde varios hilos con el cliente de pruebas de Flask (dos fases medidas
+por separado: el inicio de sesión verifica un hash de contraseña costoso)
+y por último mide /results/<id>, en frío y repetido con la caché de
+conteo. Informa del rendimiento, las latencias p50/p95/p99 y las consultas
+SQL por petición, y puede guardar el informe en JSON para seguir
+regresiones entre versiones.
+
+Uso:
+    python load_test.py [--voters 200] [--concurrency 16] [--candidates 3]
+                        [--ballot-mode exponential|json] [--key-group default]
+                        [--results-repeats 5] [--database URL] [--group-commit]
+                        [--output informe.json]
+
+Con --group-commit las escrituras de los votos se hacen en el hilo del
+agrupador y no se cuentan en las consultas de /vote.
+
+Sin --database usa una base SQLite temporal; con una URL de PostgreSQL
+local crea sus propios usuarios y elección en esa base.
+¡No usar con la base de datos de producción!
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+PASSWORD = 'load-test'
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Prueba de carga de votación y conteo')
+    parser.add_argument('--voters', type=int, default=200, help='votantes sintéticos')
+    parser.add_argument('--concurrency', type=int, default=16, help='hilos que votan a la vez')
+    parser.add_argument('--candidates', type=int, default=3)
+    parser.add_argument('--ballot-mode', default='exponential', choices=('exponential', 'json'))
+    parser.add_argument('--key-group', default='default', help="'default' o una curva (P-256)")
+    parser.add_argument('--results-repeats', type=int, default=5, help='repeticiones de /results en caliente')
+    parser.add_argument('--database', help='URL de la base (por defecto SQLite temporal)')
+    parser.add_argument('--group-commit', action='store_true', help='activar GROUP_COMMIT_ENABLED')
+    parser.add_argument('--output', help='fichero donde guardar el informe JSON')
+    return parser.parse_args()
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano de una lista ordenada"""
+    if not sorted_values:
+        return 0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+class Recorder:
+    """Latencias, errores y consultas SQL por tipo de petición"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def on_query(self, *args):
+        # Las peticiones del cliente de pruebas se ejecutan en el hilo que las lanza
+        self._local.queries = getattr(self._local, 'queries', 0) + 1
+
+    def request(self, name, send, expected_status):
+        self._local.queries = 0
+        started = time.perf_counter()
+        response = send()
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.latencies[name].append(elapsed)
+            self.queries[name].append(self._local.queries)
+            if response.status_code != expected_status:
+                self.errors[name] += 1
+        return response
+
+    def summary(self, name, seconds=None):
+        latencies = sorted(self.latencies[name])
+        queries = self.queries[name]
+        result = {
+            'requests': len(latencies),
+            'errors': self.errors[name],
+            'latency_ms': {
+                'mean': round(sum(latencies) / len(latencies), 3) if latencies else 0,
+                'p50': round(percentile(latencies, 0.50), 3),
+                'p95': round(percentile(latencies, 0.95), 3),
+                'p99': round(percentile(latencies, 0.99), 3),
+                'max': round(latencies[-1], 3) if latencies else 0
+            },
+            'queries_per_request': {
+                'mean': round(sum(queries) / len(queries), 2) if queries else 0,
+                'max': max(queries, default=0)
+            }
+        }
+        if seconds:
+            result['requests_per_second'] = round(len(latencies) / seconds, 1)
+        return result
+
+def main():
+    args = parse_args()
+
+    # La configuración de la aplicación se lee al importarla
+    if args.database:
+        os.environ['DATABASE_URL'] = args.database
+    else:
+        db_file = os.path.join(tempfile.mkdtemp(), 'load_test.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{db_file}'
+    os.environ['GROUP_COMMIT_ENABLED'] = 'true' if args.group_commit else 'false'
+
+    import app as voting_app
+    from app import app, db, User, Election, Vote, VotingRecord
+    from migrations import run_migrations
+    from sqlalchemy import event
+    from tally import peak_rss_bytes
+    from werkzeug.security import generate_password_hash
+
+    run_id = uuid.uuid4().hex[:8]
+    recorder = Recorder()
+
+    print(f"🚀 Prueba de carga {run_id}: {args.voters} votantes, {args.concurrency} hilos, "
+          f"votos {args.ballot_mode}, grupo {args.key_group}")
+    print("=" * 60)
+
+    with app.app_context():
+        db.create_all()
+        run_migrations(db.engine, db.metadata)
+        event.listen(db.engine, 'before_cursor_execute', recorder.on_query)
+        dialect = db.engine.dialect.name
+
+        # Un solo hash para todos: el registro no es lo que se mide, el
+        # inicio de sesión sí verifica la contraseña completa
+        password_hash = generate_password_hash(PASSWORD)
+        admin_name = f'lt-admin-{run_id}'
+        db.session.add(User(username=admin_name, email=f'{admin_name}@load.test',
+                            password_hash=password_hash, is_admin=True))
+        voter_names = [f'lt-{run_id}-{i}' for i in range(args.voters)]
+        db.session.add_all(
+            User(username=name, email=f'{name}@load.test', password_hash=password_hash)
+            for name in voter_names
+        )
+        db.session.commit()
+
+    admin = app.test_client()
+    admin.post('/login', data={'username': admin_name, 'password': PASSWORD})
+    now = datetime.now()
+    form_format = '%Y-%m-%dT%H:%M'
+    title = f'Prueba de carga {run_id}'
+    admin.post('/create_election', data={
+        'title': title,
+        'description': 'load_test.py',
+        'start_date': (now - timedelta(hours=1)).strftime(form_format),
+        'end_date': (now + timedelta(hours=2)).strftime(form_format),
+        'ballot_mode': args.ballot_mode,
+        'key_group': args.key_group
+    })
+    with app.app_context():
+        election = Election.query.filter_by(title=title).first()
+        if election is None:
+            print("❌ No se pudo crear la elección")
+            sys.exit(1)
+        election_id = election.id
+    for i in range(args.candidates):
+        admin.post(f'/add_candidate/{election_id}', data={'name': f'Candidato {i + 1}', 'description': ''})
+    with app.app_context():
+        candidate_ids = [c.id for c in voting_app.Candidate.query.filter_by(election_id=election_id)
+                         .order_by(voting_app.Candidate.id)]
+
+    clients = [app.test_client() for _ in range(args.voters)]
+
+    def login(index):
+        recorder.request('login', lambda: clients[index].post('/login', data={
+            'username': voter_names[index], 'password': PASSWORD
+        }), 302)
+
+    def cast(index):
+        recorder.request('vote', lambda: clients[index].post('/vote', data={
+            'election_id': str(election_id),
+            'candidate_id': str(candidate_ids[index % len(candidate_ids)])
+        }), 302)
+
+    def run_phase(function):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(function, range(args.voters)))
+        return time.perf_counter() - started
+
+    print("🔑 Iniciando sesión...")
+    login_seconds = run_phase(login)
+    print("🗳️  Votando...")
+    voting_seconds = run_phase(cast)
+
+    with app.app_context():
+        stored_votes = Vote.query.filter_by(election_id=election_id).count()
+        stored_records = VotingRecord.query.filter_by(election_id=election_id).count()
+
+    print("📊 Contando...")
+    recorder.request('results_cold', lambda: admin.get(f'/results/{election_id}'), 200)
+    for _ in range(args.results_repeats):
+        recorder.request('results_cached', lambda: admin.get(f'/results/{election_id}'), 200)
+
+    report = {
+        'run_id': run_id,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'config': {
+            'voters': args.voters,
+            'concurrency': args.concurrency,
+            'candidates': args.candidates,
+            'ballot_mode': args.ballot_mode,
+            'key_group': args.key_group,
+            'results_repeats': args.results_repeats,
+            'group_commit': args.group_commit,
+            'database': dialect
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()
+        },
+        'voting': {
+            'seconds': round(voting_seconds, 3),
+            'votes_per_second': round(args.voters / voting_seconds, 1),
+            'stored_votes': stored_votes,
+            'stored_voting_records': stored_records
+        },
+        'requests': {
+            'login': recorder.summary('login', login_seconds),
+            'vote': recorder.summary('vote', voting_seconds),
+            'results_cold': recorder.summary('results_cold'),
+            'results_cached': recorder.summary('results_cached')
+        },
+        'tally': voting_app.tally_engine.last_tally,
+        'peak_rss_bytes': peak_rss_bytes()
+    }
+
+    for name, summary in report['requests'].items():
+        latency = summary['latency_ms']
+        print(f"   {name:15} n={summary['requests']:<5} errores={summary['errors']:<3} "
+              f"p50={latency['p50']:8.2f}ms p95={latency['p95']:8.2f}ms p99={latency['p99']:8.2f}ms "
+              f"consultas={summary['queries_per_request']['mean']}")
+    print(f"   {report['voting']['votes_per_second']} votos/s, "
+          f"{stored_votes}/{args.voters} votos guardados")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Informe guardado en {args.output}")
+
+    for shutdown in (voting_app.key_pool.shutdown, voting_app.coupon_pool.shutdown,
+                     voting_app.tally_engine.shutdown, voting_app.election_scheduler.shutdown):
+        shutdown()
+    if voting_app.group_committer is not None:
+        voting_app.group_committer.shutdown()
+
+    ok = stored_votes == args.voters and not any(recorder.errors.values())
+    print("✅ Prueba completada" if ok else "❌ Hubo errores o votos perdidos")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Script para migrar los votos al formato binario compacto (ballot_codec)
+Convierte vote.encrypted_vote (JSON) en vote.encrypted_ballot (BYTEA) por lotes
+"""
+
+import psycopg2
+import json
+import sys
+import os
+from ballot_codec import encode_ballot
+
+# Cargar variables de entorno
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+DB_CONNECTION_STRING = os.environ.get('DATABASE_URL')
+
+# Votos convertidos por transacción
+BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', 1000))
+
+def prepare_schema(cursor):
+    """Añadir la columna binaria y permitir votos sin JSON"""
+    cursor.execute("ALTER TABLE vote ADD COLUMN IF NOT EXISTS encrypted_ballot BYTEA")
+    cursor.execute("ALTER TABLE vote ALTER COLUMN encrypted_vote DROP NOT NULL")
+
+def migrate_batch(cursor, last_id):
+    """Convertir el siguiente lote de votos; devuelve (último id, convertidos, fallidos)"""
+    cursor.execute("""
+        SELECT id, encrypted_vote FROM vote
+        WHERE id > %s AND encrypted_ballot IS NULL AND encrypted_vote IS NOT NULL
+        ORDER BY id
+        LIMIT %s
+    """, (last_id, BATCH_SIZE))
+    rows = cursor.fetchall()
+    if not rows:
+        return None, 0, 0
+
+    updates = []
+    failed = 0
+    for vote_id, encrypted_vote in rows:
+        try:
+            updates.append((psycopg2.Binary(encode_ballot(json.loads(encrypted_vote))), vote_id))
+        except (ValueError, TypeError, AttributeError) as e:
+            # Se deja el voto en JSON; el conteo lo sigue leyendo
+            failed += 1
+            print(f"⚠️  Voto {vote_id} no convertido: {e}")
+
+    cursor.executemany(
+        "UPDATE vote SET encrypted_ballot = %s, encrypted_vote = NULL WHERE id = %s",
+        updates
+    )
+    return rows[-1][0], len(updates), failed
+
+def migrate_database():
+    """Migrar los votos existentes al formato binario"""
+    try:
+        conn = psycopg2.connect(DB_CONNECTION_STRING)
+        cursor = conn.cursor()
+
+        print("🔄 Iniciando migración a votos binarios...")
+        prepare_schema(cursor)
+        conn.commit()
+
+        cursor.execute("SELECT COUNT(*) FROM vote WHERE encrypted_ballot IS NULL AND encrypted_vote IS NOT NULL")
+        pending = cursor.fetchone()[0]
+        print(f"📦 {pending} votos por convertir (lotes de {BATCH_SIZE})")
+
+        last_id = 0
+        converted = 0
+        failed = 0
+        while True:
+            # Cada lote en su propia transacción: la migración puede
+            # interrumpirse y reanudarse mientras la aplicación sigue votando
+            last_id, batch_converted, batch_failed = migrate_batch(cursor, last_id)
+            if last_id is None:
+                break
+            conn.commit()
+            converted += batch_converted
+            failed += batch_failed
+            print(f"   {converted}/{pending} votos convertidos")
+
+        cursor.close()
+        conn.close()
+
+        print(f"✅ Migración completada: {converted} convertidos, {failed} sin convertir")
+        print("💡 Ejecuta VACUUM FULL vote para recuperar el espacio del formato anterior")
+        return True
+
+    except Exception as e:
+        print(f"❌ Error durante la migración: {e}")
+        return False
+
+def main():
+    if not DB_CONNECTION_STRING:
+        print("❌ Error: DATABASE_URL no configurada en .env")
+        sys.exit(1)
+
+    print("🚀 Migración de votos a formato binario")
+    print("=" * 50)
+    print("Los votos cifrados pasan de JSON decimal a binario de ancho fijo")
+
+    confirm = input("\n¿Continuar con la migración? (s/N): ")
+    if confirm.lower() != 's':
+        print("Migración cancelada")
+        sys.exit(0)
+
+    if migrate_database():
+        print("\n🎉 ¡Migración exitosa!")
+    else:
+        print("\n❌ Migración falló")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
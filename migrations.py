@@ -0,0 +1,251 @@
+"""
+Migraciones versionadas del esquema de la base de datos
+
+Cada migración tiene un número de versión y se aplica una sola vez; las
+versiones aplicadas se guardan en la tabla schema_version. Se ejecutan
+después de db.create_all() (que crea las tablas nuevas pero no modifica las
+existentes) y todas son idempotentes, así que sobre una base recién creada
+sólo registran su versión.
+
+Uso:
+    python migrations.py            # aplicar las migraciones pendientes
+    python migrations.py --status   # ver versiones aplicadas y pendientes
+    python migrations.py --check    # comprobar con EXPLAIN que las consultas frecuentes usan sus índices
+"""
+
+import sys
+from datetime import datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+
+# Clave del bloqueo consultivo de PostgreSQL: un solo proceso migra a la vez
+MIGRATION_LOCK_ID = 4172301
+
+# Índices de las consultas frecuentes, declarados en los modelos de app.py
+HOT_PATH_INDEXES = (
+    'ix_vote_election_id',
+    'ix_voting_record_election_id',
+    'ix_candidate_election_id',
+    'ix_election_active_end_date'
+)
+
+def _columns(conn, table):
+    return {column['name'] for column in inspect(conn).get_columns(table)}
+
+def anonymous_votes(conn, metadata):
+    """Separar quién votó (voting_record) de los votos cifrados
+
+    Sustituye a migrate_security.py: copia los registros de votación de los
+    votos antiguos y elimina user_id y candidate_id de la tabla vote.
+    """
+    if 'user_id' not in _columns(conn, 'vote'):
+        return
+    conn.execute(text("""
+        INSERT INTO voting_record (user_id, election_id, voted_at)
+        SELECT user_id, election_id, MIN(timestamp) FROM vote v
+        WHERE NOT EXISTS (
+            SELECT 1 FROM voting_record r
+            WHERE r.user_id = v.user_id AND r.election_id = v.election_id
+        )
+        GROUP BY user_id, election_id
+    """))
+    for column in ('user_id', 'candidate_id'):
+        if column in _columns(conn, 'vote'):
+            conn.execute(text(f"ALTER TABLE vote DROP COLUMN {column}"))
+
+def binary_ballots(conn, metadata):
+    """Columna vote.encrypted_ballot para los votos binarios (ballot_codec)
+
+    Los votos existentes se convierten después con migrate_binary_ballots.py.
+    """
+    if 'encrypted_ballot' not in _columns(conn, 'vote'):
+        column_type = metadata.tables['vote'].c.encrypted_ballot.type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE vote ADD COLUMN encrypted_ballot {column_type}"))
+    if conn.dialect.name == 'postgresql':
+        # SQLite no puede quitar NOT NULL, pero sus bases ya se crean sin él
+        conn.execute(text("ALTER TABLE vote ALTER COLUMN encrypted_vote DROP NOT NULL"))
+
+def create_index(conn, index):
+    """CREATE INDEX IF NOT EXISTS; CONCURRENTLY (sin bloquear escrituras) en PostgreSQL"""
+    preparer = conn.dialect.identifier_preparer
+    name = preparer.quote(index.name)
+    table = preparer.format_table(index.table)
+    columns = ', '.join(preparer.quote(column.name) for column in index.columns)
+    if conn.dialect.name == 'postgresql':
+        # Una creación CONCURRENTLY interrumpida deja el índice marcado como inválido
+        invalid = conn.execute(
+            text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+            {'name': index.name}
+        ).scalar()
+        if invalid:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY {name}"))
+        conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})"))
+    else:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+
+def hot_path_indexes(conn, metadata):
+    """Índices secundarios de las consultas frecuentes (conteo, cierre, borrado)"""
+    indexes = {index.name: index for table in metadata.tables.values() for index in table.indexes}
+    missing = [name for name in HOT_PATH_INDEXES if name not in indexes]
+    if missing:
+        raise RuntimeError(f"Índices no declarados en los modelos: {', '.join(missing)}")
+    for name in HOT_PATH_INDEXES:
+        print(f"   📇 {name}")
+        create_index(conn, indexes[name])
+
+# (versión, nombre, función, transaccional). Las migraciones no
+# transaccionales (CREATE INDEX CONCURRENTLY) se ejecutan en modo autocommit
+MIGRATIONS = (
+    (1, 'anonymous_votes', anonymous_votes, True),
+    (2, 'binary_ballots', binary_ballots, True),
+    (3, 'hot_path_indexes', hot_path_indexes, False)
+)
+
+def ensure_version_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR(100) NOT NULL,
+                applied_at TIMESTAMP NOT NULL
+            )
+        """))
+
+def applied_versions(engine):
+    with engine.connect() as conn:
+        return set(conn.execute(text("SELECT version FROM schema_version")).scalars())
+
+def _record(conn, version, name):
+    conn.execute(
+        text("INSERT INTO schema_version (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+        {'version': version, 'name': name, 'applied_at': datetime.now()}
+    )
+
+def run_migrations(engine, metadata):
+    """Aplicar en orden las migraciones pendientes; devuelve sus versiones"""
+    ensure_version_table(engine)
+    # En autocommit: una transacción abierta en esta conexión haría que
+    # CREATE INDEX CONCURRENTLY la esperase indefinidamente
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as lock_conn:
+        if engine.dialect.name == 'postgresql':
+            lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {'id': MIGRATION_LOCK_ID})
+        try:
+            done = applied_versions(engine)
+            applied = []
+            for version, name, migration, transactional in MIGRATIONS:
+                if version in done:
+                    continue
+                print(f"🔄 Migración {version}: {name}")
+                if transactional:
+                    with engine.begin() as conn:
+                        migration(conn, metadata)
+                        _record(conn, version, name)
+                else:
+                    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                        migration(conn, metadata)
+                    with engine.begin() as conn:
+                        _record(conn, version, name)
+                applied.append(version)
+            return applied
+        finally:
+            if engine.dialect.name == 'postgresql':
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {'id': MIGRATION_LOCK_ID})
+
+# (descripción, consulta, parámetros, índice esperado en el plan)
+HOT_QUERIES = (
+    ('Conteo: votos de una elección por lotes',
+     "SELECT id, encrypted_ballot, encrypted_vote FROM vote "
+     "WHERE election_id = :election_id AND id > :after ORDER BY id",
+     {'election_id': 1, 'after': 0}, 'ix_vote_election_id'),
+    ('Borrado: votos de una elección',
+     "SELECT COUNT(*) FROM vote WHERE election_id = :election_id",
+     {'election_id': 1}, 'ix_vote_election_id'),
+    ('Borrado: registros de votación de una elección',
+     "SELECT COUNT(*) FROM voting_record WHERE election_id = :election_id",
+     {'election_id': 1}, 'ix_voting_record_election_id'),
+    ('Candidatos de una elección',
+     "SELECT id FROM candidate WHERE election_id = :election_id ORDER BY id",
+     {'election_id': 1}, 'ix_candidate_election_id'),
+    ('Cierre programado: elecciones vencidas',
+     "SELECT id FROM election WHERE is_active = :active AND end_date < :now",
+     {'active': True, 'now': datetime(2000, 1, 1)}, 'ix_election_active_end_date'),
+    ('Cierre programado: próxima fecha de fin',
+     "SELECT MIN(end_date) FROM election WHERE is_active = :active",
+     {'active': True}, 'ix_election_active_end_date')
+)
+
+def explain(conn, sql, params):
+    """Plan de ejecución de una consulta como lista de líneas
+
+    None si no se sabe leer el plan en la base de datos de conn.
+    """
+    if conn.dialect.name == 'postgresql':
+        return [row[0] for row in conn.execute(text(f"EXPLAIN {sql}"), params)]
+    if conn.dialect.name == 'sqlite':
+        return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params)]
+    return None
+
+def check_indexes(engine):
+    """Comprobar que cada consulta frecuente usa su índice
+
+    Devuelve [(descripción, índice, usado, plan)], vacía (con un aviso) si
+    EXPLAIN no está soportado para la base de datos. En PostgreSQL se
+    desactivan los recorridos secuenciales durante la comprobación: con
+    tablas pequeñas el planificador los prefiere aunque exista el índice.
+    """
+    results = []
+    with engine.connect() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+        for description, sql, params, index in HOT_QUERIES:
+            try:
+                with conn.begin_nested():
+                    plan = explain(conn, sql, params)
+            except SQLAlchemyError as e:
+                # p. ej. una columna que falta porque el esquema no está migrado
+                results.append((description, index, False, [str(e.orig or e)]))
+                continue
+            if plan is None:
+                print(f"⚠️  EXPLAIN no soportado para {conn.dialect.name}: no se comprueban los índices")
+                break
+            results.append((description, index, any(index in line for line in plan), plan))
+        conn.rollback()
+    return results
+
+def main():
+    # La aplicación lee la configuración (DATABASE_URL) del entorno
+    from app import app, db
+
+    with app.app_context():
+        engine = db.engine
+        if '--status' in sys.argv:
+            ensure_version_table(engine)
+            done = applied_versions(engine)
+            for version, name, _, _ in MIGRATIONS:
+                print(f"{'✅' if version in done else '⏳'} {version}: {name}")
+            return
+
+        if '--check' in sys.argv:
+            failed = 0
+            for description, index, used, plan in check_indexes(engine):
+                print(f"{'✅' if used else '❌'} {description} ({index})")
+                if not used:
+                    failed += 1
+                    for line in plan:
+                        print(f"      {line}")
+            if failed:
+                print(f"\n❌ {failed} consultas no usan su índice: ejecuta python migrations.py")
+                sys.exit(1)
+            return
+
+        print("🚀 Migraciones del esquema")
+        print("=" * 50)
+        db.create_all()
+        applied = run_migrations(engine, db.metadata)
+        if applied:
+            print(f"✅ Migraciones aplicadas: {', '.join(map(str, applied))}")
+        else:
+            print("✅ El esquema ya está al día")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+Parallel tally engine for election results
+
+Votes are partitioned into chunks and decrypted in a process pool (big-int
+pow() holds the GIL, so threads would not help). Each worker returns the
+per-candidate counts of its legacy JSON ballots and the homomorphic
+aggregate of its exponential ballots; the parent merges them and decrypts
+one aggregate per candidate.
+
+view_results, update_vote_counts and the command line
+
+    python tally.py <election_id> [--restart]
+
+all count through app.count_votes, which feeds tally_batches() and stores a
+checkpoint (TallyCache) after every batch, so an interrupted tally resumes
+where it stopped.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from elgamal_crypto import ElGamalCrypto
+from ballot_codec import decode_ballot
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then not reported
+    resource = None
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None if unknown"""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+# Per-process crypto instance for pool workers
+_worker_crypto = None
+
+def _get_worker_crypto():
+    global _worker_crypto
+    if _worker_crypto is None:
+        _worker_crypto = ElGamalCrypto()
+    return _worker_crypto
+
+def tally_chunk(crypto, encrypted_votes, private_key_data):
+    """Count a chunk of encrypted votes (binary ballots or JSON strings)
+
+    Returns (counts, aggregates, exponential_ballots, errors) where counts
+    holds the decrypted legacy ballots and aggregates the homomorphic sum of
+    the exponential ones, per candidate.
+
+    Exponential ballots are not validated one by one (a subgroup check
+    costs more than adding the ballot); only the chunk's sums are. If one
+    of them left the group, the chunk is summed again without the ballots
+    that fail validate_ciphertext, so a malformed ballot costs one error
+    instead of the whole sum.
+    """
+    group = crypto.group_for(private_key_data)
+    counts = {}
+    aggregates = {}
+    exponential = []
+    errors = 0
+
+    for encrypted_vote in encrypted_votes:
+        try:
+            if isinstance(encrypted_vote, (bytes, memoryview)):
+                encrypted_vote = decode_ballot(encrypted_vote)
+            else:
+                encrypted_vote = json.loads(encrypted_vote)
+
+            if isinstance(encrypted_vote, dict):
+                # Exponential ballot: {candidate_id: [c1, c2]}
+                crypto.aggregate_ballots([encrypted_vote], group, aggregates)
+                exponential.append(encrypted_vote)
+                continue
+
+            decrypted_data = crypto.decrypt_vote(encrypted_vote, private_key_data)
+
+            # Extract candidate_id from decrypted data
+            if isinstance(decrypted_data, dict):
+                candidate_id = decrypted_data.get('candidate_id')
+                vote_value = decrypted_data.get('value', 1)
+            else:
+                # Backward compatibility
+                candidate_id = decrypted_data
+                vote_value = 1
+
+            counts[candidate_id] = counts.get(candidate_id, 0) + vote_value
+
+        except Exception as e:
+            errors += 1
+            print(f"Error decrypting vote: {e}")
+
+    if not all(group.contains(element) for pair in aggregates.values() for element in pair):
+        valid = []
+        for ballot in exponential:
+            try:
+                for ciphertext in ballot.values():
+                    crypto.validate_ciphertext(ciphertext, group)
+                valid.append(ballot)
+            except ValueError as e:
+                errors += 1
+                print(f"Invalid exponential ballot: {e}")
+        exponential = valid
+        aggregates = crypto.aggregate_ballots(exponential, group)
+
+    return counts, aggregates, len(exponential), errors
+
+def _tally_chunk_worker(encrypted_votes, private_key_data):
+    """Process pool entry point"""
+    return tally_chunk(_get_worker_crypto(), encrypted_votes, private_key_data)
+
+class TallyEngine:
+    def __init__(self, crypto, workers=None, chunk_size=1000, batch_size=20000):
+        self.crypto = crypto
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        # Votes per checkpoint batch in tally_batches()
+        self.batch_size = batch_size
+        self._executor = None
+        self._lock = threading.Lock()
+        # Votes, errors, throughput, batch timings and peak RSS of the last tally
+        self.last_tally = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _map_chunks(self, chunks, private_key_data):
+        """Yield tally_chunk results, in a process pool when it pays off"""
+        chunks = iter(chunks)
+        head = list(islice(chunks, 2))
+
+        if self.workers <= 1 or len(head) < 2:
+            # A single chunk is cheaper to count in-process
+            for chunk in chain(head, chunks):
+                yield tally_chunk(self.crypto, chunk, private_key_data)
+            return
+
+        executor = self._get_executor()
+        pending = deque(executor.submit(_tally_chunk_worker, chunk, private_key_data) for chunk in head)
+        for chunk in chunks:
+            # Bound the chunks in flight so memory stays proportional to workers
+            while len(pending) >= self.workers * 2:
+                yield pending.popleft().result()
+            pending.append(executor.submit(_tally_chunk_worker, chunk, private_key_data))
+        while pending:
+            yield pending.popleft().result()
+
+    @staticmethod
+    def _private_key(public_key_data, private_key_data):
+        """Private key data with the generator that decryption needs"""
+        private_key_data = dict(private_key_data)
+        if 'curve' not in private_key_data:
+            private_key_data.setdefault('g', public_key_data['g'])
+        return private_key_data
+
+    def tally_batches(self, rows, public_key_data, private_key_data, candidate_ids, batch_size=None):
+        """Count (vote_id, encrypted_vote) rows in batches, yielding one result per batch
+
+        Votes are binary ballots (see ballot_codec) or legacy JSON strings,
+        and rows must come in increasing id order. Each batch of batch_size
+        votes (default self.batch_size; 0 means a single batch) is fully
+        counted, its exponential aggregates included, before it is yielded
+        as a dict with first_id, last_id, votes, counts, errors and seconds,
+        so callers can checkpoint after every batch and resume after the
+        last one. rows may be a streaming query result: it is consumed chunk
+        by chunk, so memory is bounded by the chunks in flight.
+        """
+        if batch_size is None:
+            batch_size = self.batch_size
+        private_key_data = self._private_key(public_key_data, private_key_data)
+        group = self.crypto.group_for(private_key_data)
+        rows = iter(rows)
+        started = time.perf_counter()
+        summary = {'votes': 0, 'errors': 0, 'batch_seconds': []}
+
+        while True:
+            batch_started = time.perf_counter()
+            ids = []
+
+            def chunks():
+                remaining = batch_size or float('inf')
+                while remaining > 0:
+                    chunk = list(islice(rows, min(self.chunk_size, remaining)))
+                    if not chunk:
+                        return
+                    remaining -= len(chunk)
+                    ids.append((chunk[0][0], chunk[-1][0], len(chunk)))
+                    yield [encrypted_vote for _, encrypted_vote in chunk]
+
+            results = {candidate_id: 0 for candidate_id in candidate_ids}
+            aggregates = {}
+            exponential_ballots = 0
+            errors = 0
+
+            for counts, chunk_aggregates, chunk_ballots, chunk_errors in self._map_chunks(
+                    chunks(), private_key_data):
+                for candidate_id, count in counts.items():
+                    if candidate_id in results:
+                        results[candidate_id] += count
+                for candidate_id, (c1, c2) in chunk_aggregates.items():
+                    if candidate_id in aggregates:
+                        a1, a2 = aggregates[candidate_id]
+                        aggregates[candidate_id] = (group.op(a1, c1), group.op(a2, c2))
+                    else:
+                        aggregates[candidate_id] = (c1, c2)
+                exponential_ballots += chunk_ballots
+                errors += chunk_errors
+
+            if not ids:
+                break
+
+            errors += self.decrypt_aggregates(aggregates, exponential_ballots, private_key_data, results)
+            batch = {
+                'first_id': ids[0][0],
+                'last_id': ids[-1][1],
+                'votes': sum(size for _, _, size in ids),
+                'counts': results,
+                'errors': errors,
+                'seconds': time.perf_counter() - batch_started
+            }
+            summary['votes'] += batch['votes']
+            summary['errors'] += errors
+            summary['batch_seconds'].append(batch['seconds'])
+            print(f"Tally batch {batch['first_id']}-{batch['last_id']}: {batch['votes']} votes "
+                  f"in {batch['seconds']:.2f}s ({batch['votes'] / max(batch['seconds'], 1e-9):.0f} votes/s)")
+            yield batch
+
+        seconds = time.perf_counter() - started
+        summary['seconds'] = seconds
+        summary['votes_per_second'] = summary['votes'] / max(seconds, 1e-9)
+        summary['peak_rss_bytes'] = peak_rss_bytes()
+        self.last_tally = summary
+        print(f"Tally of {summary['votes']} votes took {seconds:.2f}s "
+              f"({summary['votes_per_second']:.0f} votes/s, {summary['errors']} errors), "
+              f"peak RSS {(summary['peak_rss_bytes'] or 0) / 2**20:.0f} MB")
+
+    def tally(self, encrypted_votes, public_key_data, private_key_data, candidate_ids):
+        """Decrypt and count encrypted votes per candidate, in a single batch"""
+        results = {candidate_id: 0 for candidate_id in candidate_ids}
+        for batch in self.tally_batches(enumerate(encrypted_votes), public_key_data,
+                                        private_key_data, candidate_ids, batch_size=0):
+            for candidate_id, count in batch['counts'].items():
+                results[candidate_id] += count
+        return results
+
+    def tally_running(self, shard_aggregates, ballots, public_key_data, private_key_data, candidate_ids):
+        """Count votes from running aggregates instead of individual ballots
+
+        shard_aggregates are dicts {candidate_id: ciphertext} that together
+        hold the homomorphic sum of ballots exponential ballots (see
+        TallyShard in app). Costs one decryption per candidate however many
+        votes were cast. Returns (results, errors), errors being the number
+        of candidates whose aggregate could not be decrypted (their count is
+        then missing from results).
+        """
+        private_key_data = self._private_key(public_key_data, private_key_data)
+        group = self.crypto.group_for(private_key_data)
+        aggregates = self.crypto.aggregate_ballots(shard_aggregates, group)
+        results = {candidate_id: 0 for candidate_id in candidate_ids}
+        errors = self.decrypt_aggregates(aggregates, ballots, private_key_data, results)
+        return results, errors
+
+    def decrypt_aggregates(self, aggregates, ballots, private_key_data, results):
+        """Add decrypted per-candidate aggregates into results
+
+        aggregates maps candidate ids to homomorphic sums (decoded group
+        elements) of ballots exponential ballots; one decryption per
+        candidate. Candidates missing from results are ignored. Returns the
+        number of aggregates that could not be decrypted.
+        """
+        errors = 0
+        for candidate_id, ciphertext in aggregates.items():
+            if candidate_id not in results:
+                continue
+            try:
+                results[candidate_id] += self.crypto.decrypt_exponential(
+                    ciphertext, private_key_data, ballots
+                )
+            except Exception as e:
+                errors += 1
+                print(f"Error decrypting tally for candidate {candidate_id}: {e}")
+        return errors
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Contar los votos de una elección')
+    parser.add_argument('election_id', type=int)
+    parser.add_argument('--restart', action='store_true',
+                        help='descartar el punto de control y contar desde cero')
+    args = parser.parse_args(argv)
+
+    from app import app, db, Election, Candidate, TallyCache, count_votes, tally_engine
+    with app.app_context():
+        election = db.session.get(Election, args.election_id)
+        if election is None:
+            print(f"❌ La elección {args.election_id} no existe")
+            return 1
+        if args.restart:
+            TallyCache.query.filter_by(election_id=election.id).delete()
+            db.session.commit()
+
+        candidates = Candidate.query.filter_by(election_id=election.id).all()
+        try:
+            results, errors = count_votes(election, candidates)
+        finally:
+            tally_engine.shutdown()
+
+        print(f"📊 Resultados de '{election.title}':")
+        for candidate in candidates:
+            print(f"   {candidate.name}: {results[candidate.id]}")
+        if errors:
+            print(f"⚠️  {errors} votos no se pudieron descifrar")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
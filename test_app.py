@@ -0,0 +1,745 @@
+"""
+Script de prueba de la aplicación sobre una base SQLite temporal
+
+Cada prueba crea sus propios usuarios y elecciones directamente en la base
+(como lo harían las rutas) y las escribe con las mismas funciones que usa
+la aplicación.
+"""
+
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# La configuración se lee al importar la aplicación
+_directory = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_directory, 'test_app.db')}"
+os.environ.update({
+    'ELGAMAL_GROUP': 'modp1024',
+    'KEY_POOL_SIZE': '0',
+    'COUPON_POOL_DEPTH': '0',
+    'TALLY_WORKERS': '1',
+    'GROUP_COMMIT_ENABLED': 'false',
+    'DLOG_MAX_VALUE': '10000',
+    'DLOG_CACHE_DIR': os.path.join(_directory, 'dlog_cache')
+})
+
+import app as voting_app
+from app import app, db, User, Election, Candidate, Vote, VotingRecord, TallyCache, TallyShard
+from group_commit import GroupCommitter
+from migrations import run_migrations
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+with app.app_context():
+    db.create_all()
+    run_migrations(db.engine, db.metadata)
+
+crypto = voting_app.crypto
+_ids = itertools.count(1)
+
+def make_user(is_admin=False):
+    """Crear un usuario; devuelve su id"""
+    name = f'usuario{next(_ids)}'
+    user = User(username=name, email=f'{name}@test.local', password_hash='-', is_admin=is_admin)
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+def make_election(ballot_mode=voting_app.BALLOT_MODE_EXPONENTIAL, candidates=3):
+    """Crear una elección abierta con sus candidatos; devuelve (id, ids de candidatos)"""
+    keys = crypto.generate_keys()
+    public_key = {
+        'p': keys['p'],
+        'g': keys['g'],
+        'q': keys['q'],
+        'public_key': keys['public_key'],
+        'ballot_mode': ballot_mode
+    }
+    private_key = {'p': keys['p'], 'g': keys['g'], 'q': keys['q'], 'private_key': keys['private_key']}
+    now = datetime.now()
+    election = Election(
+        title=f'Elección {next(_ids)}',
+        start_date=now - timedelta(hours=1),
+        end_date=now + timedelta(hours=1),
+        public_key=json.dumps(public_key),
+        private_key=json.dumps(private_key)
+    )
+    db.session.add(election)
+    db.session.flush()
+    candidate_list = [
+        Candidate(name=f'Candidato {i + 1}', election_id=election.id, encrypted_votes='[]')
+        for i in range(candidates)
+    ]
+    db.session.add_all(candidate_list)
+    db.session.commit()
+    return election.id, [candidate.id for candidate in candidate_list]
+
+def encrypt_choice(election_id, candidate_id):
+    """Cifrar un voto como lo hace vote()"""
+    context = voting_app.load_election_context(election_id)
+    public_key_data = context.public_key_data
+    if public_key_data['ballot_mode'] == voting_app.BALLOT_MODE_EXPONENTIAL:
+        return crypto.encrypt_ballot(context.candidate_ids, candidate_id, public_key_data)
+    return crypto.encrypt_vote({'candidate_id': candidate_id, 'value': 1, 'election_id': election_id},
+                               public_key_data)
+
+def vote_write(election_id, user_id, candidate_id, vote_hash=None):
+    """La escritura que vote() confirma o entrega al group committer"""
+    encrypted_vote = encrypt_choice(election_id, candidate_id)
+    public_key_data = voting_app.load_election_context(election_id).public_key_data
+    if vote_hash is None:
+        vote_hash = crypto.hash_vote({'encrypted_vote': encrypted_vote, 'election_id': election_id})
+    return partial(
+        voting_app.record_vote, election_id, user_id, candidate_id,
+        encrypted_vote, vote_hash, public_key_data
+    )
+
+def cast(election_id, user_id, candidate_id):
+    """Cifrar y guardar un voto como vote(); devuelve si se registró"""
+    recorded = vote_write(election_id, user_id, candidate_id)()
+    db.session.commit()
+    return recorded
+
+def count(election_id):
+    election = db.session.get(Election, election_id)
+    candidates = Candidate.query.filter_by(election_id=election_id).order_by(Candidate.id).all()
+    return voting_app.count_votes(election, candidates)
+
+def client_for(user_id):
+    """Cliente de pruebas con la sesión de un usuario ya iniciada"""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+def vote_state(election_id, candidate_ids):
+    """Todo lo que escribe un voto: votos, registros, contadores y conteo acumulado"""
+    keys = [voting_app.candidate_counter_key(c) for c in candidate_ids]
+    keys += [voting_app.stats_key('total_votes'), voting_app.stats_key('total_voting_records')]
+    shards = TallyShard.query.filter_by(election_id=election_id).order_by(TallyShard.shard).all()
+    return {
+        'votes': Vote.query.filter_by(election_id=election_id).count(),
+        'records': VotingRecord.query.filter_by(election_id=election_id).count(),
+        'counters': voting_app.counter_values(keys),
+        'shards': [(shard.shard, shard.ballots, shard.aggregates) for shard in shards]
+    }
+
+def flashes(client):
+    with client.session_transaction() as session:
+        return [message for _, message in session.pop('_flashes', [])]
+
+class Interrupted(Exception):
+    pass
+
+def test_count_votes_resumes_after_interruption():
+    print("=== Prueba de Conteo por Lotes Reanudable ===")
+    
+    engine = voting_app.tally_engine
+    settings = (engine.batch_size, engine.chunk_size, app.config['TALLY_CHUNK_SIZE'])
+    store_checkpoint = voting_app.store_tally_checkpoint
+    with app.app_context():
+        # Votos JSON: sin conteo acumulado, se cuentan voto a voto
+        election_id, candidate_ids = make_election(voting_app.BALLOT_MODE_JSON)
+        choices = [0, 1, 1, 2, 1, 0, 2]
+        for choice in choices:
+            assert cast(election_id, make_user(), candidate_ids[choice])
+        expected = {candidate_id: choices.count(i) for i, candidate_id in enumerate(candidate_ids)}
+        
+        # Lotes de 3 votos leídos en páginas de 2: varias páginas y lotes
+        engine.batch_size, engine.chunk_size = 3, 2
+        app.config['TALLY_CHUNK_SIZE'] = 2
+        
+        def interrupt_after_first_batch(*args):
+            store_checkpoint(*args)
+            raise Interrupted()
+        
+        voting_app.store_tally_checkpoint = interrupt_after_first_batch
+        try:
+            count(election_id)
+            assert False, "El conteo debía interrumpirse"
+        except Interrupted:
+            pass
+        finally:
+            voting_app.store_tally_checkpoint = store_checkpoint
+        db.session.rollback()
+        assert db.session.get(TallyCache, election_id).votes == 3
+        
+        try:
+            results, errors = count(election_id)
+        finally:
+            engine.batch_size, engine.chunk_size, app.config['TALLY_CHUNK_SIZE'] = settings
+        assert (results, errors) == (expected, 0)
+        # Solo se descifraron los votos posteriores al punto de control
+        assert engine.last_tally['votes'] == 4
+        checkpoint = db.session.get(TallyCache, election_id)
+        assert (checkpoint.votes, checkpoint.last_vote_id) == (7, db.session.scalar(
+            db.select(db.func.max(Vote.id)).where(Vote.election_id == election_id)))
+    print(f"   Reanudado tras el primer lote: {results}")
+    print("✅ ÉXITO: El conteo por lotes se reanuda correctamente!")
+
+def test_count_votes_watermark():
+    print("\n=== Prueba de la Marca de Agua del Conteo ===")
+    
+    engine = voting_app.tally_engine
+    with app.app_context():
+        election_id, candidate_ids = make_election(voting_app.BALLOT_MODE_JSON)
+        first, second = [0, 1, 2, 1], [2, 2, 0]
+        for choice in first:
+            assert cast(election_id, make_user(), candidate_ids[choice])
+        results, _ = count(election_id)
+        assert engine.last_tally['votes'] == 4
+        
+        # Sin votos nuevos se responde desde el punto de control
+        engine.last_tally = None
+        assert count(election_id) == (results, 0)
+        assert engine.last_tally is None
+        
+        for choice in second:
+            assert cast(election_id, make_user(), candidate_ids[choice])
+        results, errors = count(election_id)
+        # Solo se descifran los votos posteriores a la marca de agua
+        assert engine.last_tally['votes'] == 3
+        checkpoint = db.session.get(TallyCache, election_id)
+        assert (checkpoint.votes, checkpoint.last_vote_id) == (7, db.session.scalar(
+            db.select(db.func.max(Vote.id)).where(Vote.election_id == election_id)))
+        
+        # Igual que un recuento completo desde cero
+        db.session.delete(checkpoint)
+        db.session.commit()
+        assert count(election_id) == (results, errors)
+        assert engine.last_tally['votes'] == 7
+        choices = first + second
+        assert results == {candidate_id: choices.count(i) for i, candidate_id in enumerate(candidate_ids)}
+    print(f"   Conteo incremental: {results}")
+    print("✅ ÉXITO: El conteo incremental coincide con el recuento completo!")
+
+def test_running_tally_reports_errors():
+    print("\n=== Prueba de Errores del Conteo Acumulado ===")
+    
+    with app.app_context():
+        election_id, candidate_ids = make_election()
+        for choice in (0, 0, 1):
+            assert cast(election_id, make_user(), candidate_ids[choice])
+        assert count(election_id) == ({candidate_ids[0]: 2, candidate_ids[1]: 1, candidate_ids[2]: 0}, 0)
+        
+        # Un cifrado corrupto en un fragmento impide descifrar su candidato
+        shard = TallyShard.query.filter_by(election_id=election_id).first()
+        aggregates = json.loads(shard.aggregates)
+        public_key_data = voting_app.load_election_context(election_id).public_key_data
+        aggregates[str(candidate_ids[0])] = crypto.encrypt_exponential(5000, public_key_data)
+        shard.aggregates = json.dumps(aggregates)
+        db.session.commit()
+        
+        results, errors = count(election_id)
+        assert errors == 1 and results[candidate_ids[1]] == 1
+    print("✅ ÉXITO: Los agregados que no se descifran se informan como errores!")
+
+def test_upload_rejects_ciphertexts_outside_the_group():
+    print("\n=== Prueba de Carga de Lotes con Cifrados Maliciosos ===")
+    
+    with app.app_context():
+        admin = make_user(is_admin=True)
+        election_id, candidate_ids = make_election()
+        voters = [make_user() for _ in range(3)]
+        ballots = [encrypt_choice(election_id, candidate_ids[choice]) for choice in (0, 1, 1)]
+        p = voting_app.load_election_context(election_id).public_key_data['p']
+    
+    malicious = dict(ballots[1])
+    malicious[str(candidate_ids[0])] = [p - 1, malicious[str(candidate_ids[0])][1]]
+    client = client_for(admin)
+    url = f'/api/elections/{election_id}/ballots/batch'
+    response = client.post(url, json={'ballots': [ballots[0], malicious, ballots[2]], 'voters': voters})
+    assert response.status_code == 400 and response.get_json()['invalid'] == [1]
+    with app.app_context():
+        assert Vote.query.filter_by(election_id=election_id).count() == 0
+        assert TallyShard.query.filter_by(election_id=election_id).count() == 0
+    
+    response = client.post(url, json={'ballots': ballots, 'voters': voters})
+    assert response.status_code == 201
+    with app.app_context():
+        assert count(election_id) == ({candidate_ids[0]: 1, candidate_ids[1]: 2, candidate_ids[2]: 0}, 0)
+    print("✅ ÉXITO: Los lotes con cifrados fuera del grupo se rechazan!")
+
+def test_upload_rejects_replayed_ballots():
+    print("\n=== Prueba de Carga de Lotes con Votos Repetidos ===")
+    
+    with app.app_context():
+        admin = make_user(is_admin=True)
+        election_id, candidate_ids = make_election()
+        voters = [make_user() for _ in range(3)]
+        ballots = [encrypt_choice(election_id, candidate_ids[choice]) for choice in (0, 1)]
+    
+    # El mismo cifrado con las claves de los candidatos en otro orden
+    replayed = dict(reversed(list(ballots[0].items())))
+    assert list(replayed) != list(ballots[0])
+    client = client_for(admin)
+    url = f'/api/elections/{election_id}/ballots/batch'
+    # json= ordenaría las claves: se envía el JSON tal cual
+    payload = json.dumps({'ballots': ballots + [replayed], 'voters': voters})
+    response = client.post(url, data=payload, content_type='application/json')
+    assert response.status_code == 400 and response.get_json()['invalid'] == [2]
+    with app.app_context():
+        assert Vote.query.filter_by(election_id=election_id).count() == 0
+    print("✅ ÉXITO: Un voto repetido se rechaza aunque cambie el orden de sus claves!")
+
+def test_sharded_counters():
+    print("\n=== Prueba de Contadores Fragmentados ===")
+    
+    shards = app.config['COUNTER_SHARDS']
+    key, other = f'prueba:{next(_ids)}', f'prueba:{next(_ids)}'
+    with app.app_context():
+        for i in range(3 * shards):
+            voting_app.increment_counters([key, other], amount=i % 3)
+        voting_app.increment_counter(key, 5)
+        db.session.commit()
+        expected = sum(i % 3 for i in range(3 * shards))
+        assert voting_app.counter_values([key, other, 'prueba:vacío']) == {
+            key: expected + 5, other: expected, 'prueba:vacío': 0
+        }
+        assert voting_app.CounterShard.query.filter_by(key=key).count() <= shards
+        
+        assert voting_app.drain_counters([key, 'prueba:vacío']) == {key: expected + 5, 'prueba:vacío': 0}
+        db.session.commit()
+        # Quedan todos los fragmentos, a cero
+        assert voting_app.counter_values([key, other]) == {key: 0, other: expected}
+        assert voting_app.CounterShard.query.filter_by(key=key).count() == shards
+        voting_app.increment_counter(key)
+        voting_app.set_counter(other, 7)
+        db.session.commit()
+        assert voting_app.counter_values([key, other]) == {key: 1, other: 7}
+    print("✅ ÉXITO: Los contadores fragmentados suman, se vacían y se fijan correctamente!")
+
+def test_update_vote_counts_keeps_concurrent_votes():
+    print("\n=== Prueba de Recuento con Votos Concurrentes ===")
+    
+    with app.app_context():
+        admin = make_user(is_admin=True)
+        election_id, candidate_ids = make_election()
+        for choice in (0, 1, 1):
+            assert cast(election_id, make_user(), candidate_ids[choice])
+        late_write = vote_write(election_id, make_user(), candidate_ids[2])
+    
+    count_votes = voting_app.count_votes
+    late = {}
+    
+    def late_vote():
+        with app.app_context():
+            late['recorded'] = late_write()
+            db.session.commit()
+            late['committed'] = time.monotonic()
+    
+    def count_then_vote(*args, **kwargs):
+        # Un voto llega entre el recuento y la actualización de los contadores
+        results = count_votes(*args, **kwargs)
+        late['thread'] = threading.Thread(target=late_vote)
+        late['thread'].start()
+        late['thread'].join(timeout=0.3)
+        late['counted'] = time.monotonic()
+        return results
+    
+    voting_app.count_votes = count_then_vote
+    try:
+        response = client_for(admin).post(f'/admin/update_vote_counts/{election_id}')
+    finally:
+        voting_app.count_votes = count_votes
+    late['thread'].join(timeout=10)
+    assert response.status_code == 302 and late['recorded']
+    # El voto esperó a que terminara la transacción del recuento
+    assert late['committed'] > late['counted']
+    
+    with app.app_context():
+        candidates = Candidate.query.filter_by(election_id=election_id).order_by(Candidate.id).all()
+        assert [candidate.vote_count for candidate in candidates] == [1, 2, 0]
+        # El voto tardío sigue en su contador: no se pierde ni se cuenta dos veces
+        assert voting_app.candidate_vote_counts(candidates) == dict(zip(candidate_ids, [1, 2, 1]))
+        assert count(election_id)[0] == voting_app.candidate_vote_counts(candidates)
+    print("✅ ÉXITO: Los votos emitidos durante el recuento no se pierden!")
+
+def table_counts():
+    """Las estadísticas del panel con COUNT(*) sobre las tablas"""
+    return {
+        'total_elections': Election.query.count(),
+        'active_elections': Election.query.filter_by(is_active=True).count(),
+        'total_candidates': Candidate.query.count(),
+        'total_votes': Vote.query.count(),
+        'total_voting_records': VotingRecord.query.count(),
+        'total_users': User.query.filter_by(is_admin=False).count(),
+        'admin_users': User.query.filter_by(is_admin=True).count()
+    }
+
+def test_dashboard_stats_match_table_counts():
+    print("\n=== Prueba de Estadísticas del Panel ===")
+    
+    ttl = app.config['DASHBOARD_STATS_TTL']
+    # Los votos no invalidan la caché del panel: se lee siempre de los contadores
+    app.config['DASHBOARD_STATS_TTL'] = 0
+    try:
+        with app.app_context():
+            # Las demás pruebas escriben directamente en las tablas
+            voting_app.rebuild_dashboard_stats()
+            voting_app.invalidate_dashboard_stats()
+            assert voting_app.dashboard_stats() == table_counts()
+            admin = make_user(is_admin=True)
+            voting_app.count_stat('admin_users')
+            db.session.commit()
+        
+        def check(step):
+            with app.app_context():
+                stats, expected = voting_app.dashboard_stats(), table_counts()
+            assert stats == expected, f"{step}: {stats} != {expected}"
+        
+        anonymous = app.test_client()
+        voters = []
+        for i in range(2):
+            name = f'votante{next(_ids)}'
+            anonymous.post('/register', data={'username': name, 'email': f'{name}@test.local', 'password': 'x'})
+            with app.app_context():
+                voters.append(User.query.filter_by(username=name).one().id)
+        check('registro')
+        
+        client = client_for(admin)
+        now = datetime.now()
+        elections = []
+        for i in range(3):
+            client.post('/create_election', data={
+                'title': f'Panel {next(_ids)}',
+                'description': '',
+                'start_date': (now - timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M'),
+                'end_date': (now + timedelta(hours=2)).strftime('%Y-%m-%dT%H:%M')
+            })
+            with app.app_context():
+                elections.append(db.session.scalar(db.select(db.func.max(Election.id))))
+            for j in range(2):
+                client.post(f'/add_candidate/{elections[-1]}', data={'name': f'Candidato {j}', 'description': ''})
+        assert len(set(elections)) == 3
+        check('elecciones y candidatos')
+        
+        with app.app_context():
+            candidate_ids = [c.id for c in Candidate.query.filter_by(election_id=elections[0]).order_by(Candidate.id)]
+        for voter, candidate_id in zip(voters, candidate_ids):
+            client_for(voter).post('/vote', data={'election_id': elections[0], 'candidate_id': candidate_id})
+        client_for(voters[0]).post('/vote', data={'election_id': elections[0], 'candidate_id': candidate_ids[1]})
+        check('votos')
+        
+        client.post(f'/admin/close_election/{elections[1]}')
+        client.post(f'/admin/close_election/{elections[1]}')
+        check('cierre')
+        client.post(f'/admin/reopen_election/{elections[1]}')
+        check('reapertura')
+        client.post(f'/admin/delete_election/{elections[1]}')
+        check('eliminación')
+        
+        # Cierre programado de una elección que ya terminó
+        with app.app_context():
+            db.session.get(Election, elections[2]).end_date = now - timedelta(minutes=1)
+            db.session.commit()
+            assert voting_app.election_scheduler.run() == 1
+        check('cierre programado')
+        with app.app_context():
+            assert Vote.query.filter_by(election_id=elections[0]).count() == 2
+            assert db.session.get(Election, elections[1]) is None
+    finally:
+        app.config['DASHBOARD_STATS_TTL'] = ttl
+    print("✅ ÉXITO: Las estadísticas del panel coinciden con COUNT(*) sobre las tablas!")
+
+def test_rebuild_dashboard_stats_keeps_concurrent_votes():
+    print("\n=== Prueba de Reconstrucción de Estadísticas con Votos Concurrentes ===")
+    
+    with app.app_context():
+        election_id, candidate_ids = make_election()
+        voter = make_user()
+    voters = []
+    
+    def vote_concurrently():
+        with app.app_context():
+            cast(election_id, voter, candidate_ids[0])
+    
+    def after_counting_votes(state):
+        # Un voto que llega justo después de que la reconstrucción cuente los votos
+        # (Query.count() envuelve la consulta: el modelo solo se ve en el SQL)
+        counts_votes = 'FROM vote)' in str(state.statement)
+        if not state.is_select or not counts_votes or voters:
+            return None
+        result = state.invoke_statement()
+        voters.append(threading.Thread(target=vote_concurrently))
+        voters[0].start()
+        time.sleep(0.3)
+        return result
+    
+    event.listen(db.session, 'do_orm_execute', after_counting_votes)
+    try:
+        with app.app_context():
+            voting_app.rebuild_dashboard_stats()
+    finally:
+        event.remove(db.session, 'do_orm_execute', after_counting_votes)
+    voters[0].join()
+    
+    with app.app_context():
+        counters = voting_app.counter_values(voting_app.stats_key(name) for name in voting_app.DASHBOARD_STATS)
+        stats = {name: counters[voting_app.stats_key(name)] for name in voting_app.DASHBOARD_STATS}
+        assert stats == table_counts(), f"{stats} != {table_counts()}"
+        assert vote_state(election_id, candidate_ids)['votes'] == 1
+    print("✅ ÉXITO: La reconstrucción de las estadísticas no pierde votos concurrentes!")
+
+def test_second_vote_is_rejected():
+    print("\n=== Prueba de Voto Duplicado ===")
+    
+    with app.app_context():
+        election_id, candidate_ids = make_election()
+        voter = make_user()
+        assert cast(election_id, voter, candidate_ids[0])
+        before = vote_state(election_id, candidate_ids)
+        assert before['votes'] == before['records'] == 1
+        assert before['counters'][voting_app.candidate_counter_key(candidate_ids[0])] == 1
+        
+        # Directamente: record_vote no escribe nada
+        assert not cast(election_id, voter, candidate_ids[1])
+        assert vote_state(election_id, candidate_ids) == before
+    
+    # Por la ruta /vote: el segundo voto se rechaza sin error de integridad
+    client = client_for(voter)
+    response = client.post('/vote', data={'election_id': election_id, 'candidate_id': candidate_ids[2]})
+    assert response.status_code == 302
+    assert flashes(client) == ['Ya has votado en esta elección']
+    with app.app_context():
+        assert vote_state(election_id, candidate_ids) == before
+    print("✅ ÉXITO: El segundo voto no modifica votos, contadores ni conteo acumulado!")
+
+def test_vote_in_election_closed_by_another_worker():
+    print("\n=== Prueba de Voto en Elección Cerrada por Otro Proceso ===")
+    
+    with app.app_context():
+        election_id, candidate_ids = make_election()
+        voters = [make_user() for _ in range(2)]
+    client = client_for(voters[0])
+    response = client.post('/vote', data={'election_id': election_id, 'candidate_id': candidate_ids[0]})
+    assert flashes(client) == ['Voto registrado exitosamente']
+    
+    # Otro proceso cierra la elección: la caché de este la sigue viendo activa
+    with app.app_context():
+        assert voting_app.election_contexts.get(election_id).is_active
+        db.session.execute(db.update(Election).where(Election.id == election_id).values(is_active=False))
+        db.session.commit()
+        assert voting_app.election_contexts.get(election_id).is_active
+        before = vote_state(election_id, candidate_ids)
+        assert not cast(election_id, voters[1], candidate_ids[1])
+        assert vote_state(election_id, candidate_ids) == before
+    
+    client = client_for(voters[1])
+    response = client.post('/vote', data={'election_id': election_id, 'candidate_id': candidate_ids[1]})
+    assert response.status_code == 302
+    assert flashes(client) == ['La elección está cerrada']
+    with app.app_context():
+        assert vote_state(election_id, candidate_ids) == before
+        # El rechazo descarta el contexto en caché
+        assert not voting_app.election_contexts.get(election_id).is_active
+    print("✅ ÉXITO: No se registran votos en una elección cerrada aunque la caché no lo sepa!")
+
+def test_record_vote_statement_postgresql():
+    print("\n=== Prueba de la Sentencia de Voto en PostgreSQL ===")
+    
+    statement = voting_app.record_vote_statement(
+        1, 2, b'ballot', 'hash', datetime.now(), ['candidate:1:votes', 'stats:total_votes'], 3
+    )
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    # El registro de votación decide si se escribe todo lo demás
+    assert 'ON CONFLICT (user_id, election_id) DO NOTHING RETURNING voting_record.id' in sql
+    ctes = {part.split(' AS')[0].strip(): part for part in sql.split('), \n')}
+    assert 'election.is_active = true' in ctes['WITH record']
+    assert 'INSERT INTO vote' in ctes['ballot'] and 'FROM record' in ctes['ballot']
+    assert 'UPDATE "user"' in ctes['voter'] and 'EXISTS (SELECT record.id' in ctes['voter']
+    assert 'UPDATE counter_shard' in ctes['counters'] and 'EXISTS (SELECT record.id' in ctes['counters']
+    print("✅ ÉXITO: El voto, los contadores y el votante dependen del registro insertado!")
+
+def submit_batch(committer, writes):
+    """Entregar todas las escrituras antes de que expire la espera del lote"""
+    with app.app_context():
+        futures = [committer.submit(write) for write in writes]
+    outcomes = []
+    for future in futures:
+        try:
+            outcomes.append(future.result(timeout=10))
+        except Exception as e:
+            outcomes.append(e)
+    return outcomes
+
+def test_concurrent_votes():
+    print("\n=== Prueba de Votos Concurrentes ===")
+    
+    with app.app_context():
+        election_id, candidate_ids = make_election()
+        voters = [make_user() for _ in range(16)]
+    clients = [client_for(voter) for voter in voters]
+    barrier = threading.Barrier(4)
+    
+    def vote(i):
+        if i < 4:
+            barrier.wait()
+        response = clients[i].post('/vote', data={
+            'election_id': election_id,
+            'candidate_id': candidate_ids[i % len(candidate_ids)]
+        })
+        return response.status_code, flashes(clients[i])
+    
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        outcomes = list(executor.map(vote, range(len(voters))))
+    # Ningún voto falla por el bloqueo de la base de datos
+    assert outcomes == [(302, ['Voto registrado exitosamente'])] * len(voters), outcomes
+    with app.app_context():
+        state = vote_state(election_id, candidate_ids)
+        assert state['votes'] == state['records'] == len(voters)
+        expected = {c: sum(1 for i in range(len(voters)) if i % 3 == j) for j, c in enumerate(candidate_ids)}
+        assert count(election_id) == (expected, 0)
+    print("✅ ÉXITO: Los votos concurrentes se guardan todos!")
+
+class Deadlock(Exception):
+    """Error del driver de PostgreSQL ante un interbloqueo"""
+    pgcode = '40P01'
+
+def failing_record_vote(failures):
+    """record_vote que falla por interbloqueo las primeras failures veces"""
+    record_vote = voting_app.record_vote
+    calls = []
+    
+    def write(*args):
+        calls.append(args)
+        if len(calls) <= failures:
+            # Como la base de datos: la escritura fallida no deja nada
+            raise OperationalError('UPDATE counter_shard', None, Deadlock('deadlock detected'))
+        return record_vote(*args)
+    
+    return write, calls
+
+def test_deadlocked_votes_are_retried():
+    print("\n=== Prueba de Reintento de Votos Interbloqueados ===")
+    
+    record_vote = voting_app.record_vote
+    committer = GroupCommitter(app, db, max_batch=16, linger_ms=1)
+    try:
+        for group_committer in (None, committer):
+            with app.app_context():
+                election_id, candidate_ids = make_election()
+                voters = [make_user() for _ in range(2)]
+            voting_app.group_committer = group_committer
+            
+            # Falla dos veces y se guarda al tercer intento
+            voting_app.record_vote, calls = failing_record_vote(2)
+            client = client_for(voters[0])
+            response = client.post('/vote', data={'election_id': election_id, 'candidate_id': candidate_ids[0]})
+            assert response.status_code == 302 and len(calls) == 3
+            assert flashes(client) == ['Voto registrado exitosamente']
+            
+            # Si falla en todos los intentos, error para el votante y nada escrito
+            voting_app.record_vote, calls = failing_record_vote(app.config['VOTE_WRITE_ATTEMPTS'])
+            client = client_for(voters[1])
+            response = client.post('/vote', data={'election_id': election_id, 'candidate_id': candidate_ids[1]})
+            assert response.status_code == 302 and len(calls) == app.config['VOTE_WRITE_ATTEMPTS']
+            assert flashes(client) == ['No se pudo registrar el voto, inténtalo de nuevo']
+            voting_app.record_vote = record_vote
+            
+            with app.app_context():
+                state = vote_state(election_id, candidate_ids)
+                assert state['votes'] == state['records'] == 1
+                assert count(election_id) == ({candidate_ids[0]: 1, candidate_ids[1]: 0, candidate_ids[2]: 0}, 0)
+    finally:
+        voting_app.record_vote = record_vote
+        voting_app.group_committer = None
+        committer.shutdown()
+    print("✅ ÉXITO: Los votos interbloqueados se reintentan sin duplicarse!")
+
+def test_group_commit_isolates_failed_votes():
+    print("\n=== Prueba de Group Commit con Votos Fallidos ===")
+    
+    committer = GroupCommitter(app, db, max_batch=16, linger_ms=500)
+    try:
+        with app.app_context():
+            election_id, candidate_ids = make_election()
+            voters = [make_user() for _ in range(4)]
+            assert cast(election_id, voters[0], candidate_ids[0])
+            repeated_hash = db.session.scalar(db.select(Vote.vote_hash).where(Vote.election_id == election_id))
+            writes = [
+                vote_write(election_id, voters[1], candidate_ids[1]),
+                vote_write(election_id, voters[0], candidate_ids[2]),  # ya votó
+                vote_write(election_id, voters[2], candidate_ids[1], vote_hash=repeated_hash),
+                vote_write(election_id, voters[3], candidate_ids[2])
+            ]
+        
+        outcomes = submit_batch(committer, writes)
+        # Un solo lote, y cada escritura recibe su propio resultado
+        assert committer.stats()['batch_size']['count'] == 1
+        assert outcomes[0] is True and outcomes[1] is False and outcomes[3] is True
+        assert isinstance(outcomes[2], IntegrityError)
+        
+        with app.app_context():
+            state = vote_state(election_id, candidate_ids)
+            assert state['votes'] == state['records'] == 3
+            counters = state['counters']
+            assert [counters[voting_app.candidate_counter_key(c)] for c in candidate_ids] == [1, 1, 1]
+            assert not db.session.scalar(db.select(VotingRecord.id).where(
+                VotingRecord.election_id == election_id, VotingRecord.user_id == voters[2]))
+            assert count(election_id) == ({candidate_id: 1 for candidate_id in candidate_ids}, 0)
+    finally:
+        committer.shutdown()
+    print("✅ ÉXITO: Un voto fallido no arrastra ni duplica a los demás del lote!")
+
+def test_group_commit_retries_one_by_one():
+    print("\n=== Prueba de Group Commit con Confirmación Fallida ===")
+    
+    committer = GroupCommitter(app, db, max_batch=16, linger_ms=500)
+    session_commit = type(db.session).commit
+    failures = []
+    
+    def fail_first_commit(self):
+        # La confirmación del lote falla; las individuales no
+        if not failures:
+            failures.append(True)
+            raise OperationalError('COMMIT', None, Exception('disk I/O error'))
+        return session_commit(self)
+    
+    try:
+        with app.app_context():
+            election_id, candidate_ids = make_election()
+            voters = [make_user() for _ in range(3)]
+            writes = [vote_write(election_id, voter, candidate_ids[i]) for i, voter in enumerate(voters)]
+            writes.append(vote_write(election_id, voters[0], candidate_ids[1]))  # repetido
+        type(db.session).commit = fail_first_commit
+        try:
+            outcomes = submit_batch(committer, writes)
+        finally:
+            type(db.session).commit = session_commit
+        assert failures and committer.stats()['failed_batches'] == 1
+        assert outcomes == [True, True, True, False]
+        
+        with app.app_context():
+            state = vote_state(election_id, candidate_ids)
+            assert state['votes'] == state['records'] == 3
+            assert count(election_id) == ({candidate_id: 1 for candidate_id in candidate_ids}, 0)
+    finally:
+        committer.shutdown()
+    print("✅ ÉXITO: Al repetir voto a voto no se pierde ni se duplica ninguno!")
+
+if __name__ == "__main__":
+    test_count_votes_resumes_after_interruption()
+    test_count_votes_watermark()
+    test_running_tally_reports_errors()
+    test_upload_rejects_ciphertexts_outside_the_group()
+    test_upload_rejects_replayed_ballots()
+    test_sharded_counters()
+    test_update_vote_counts_keeps_concurrent_votes()
+    test_dashboard_stats_match_table_counts()
+    test_rebuild_dashboard_stats_keeps_concurrent_votes()
+    test_second_vote_is_rejected()
+    test_vote_in_election_closed_by_another_worker()
+    test_record_vote_statement_postgresql()
+    test_concurrent_votes()
+    test_deadlocked_votes_are_retried()
+    test_group_commit_isolates_failed_votes()
+    test_group_commit_retries_one_by_one()
@@ -0,0 +1,57 @@
+"""
+Script de prueba del formato binario de las boletas cifradas
+"""
+
+import json
+from elgamal_crypto import ElGamalCrypto
+from ballot_codec import encode_ballot, decode_ballot
+
+def sample_ballots():
+    """Un voto JSON, una boleta modular y una boleta sobre P-256"""
+    crypto = ElGamalCrypto(group='modp1024')
+    keys = crypto.generate_keys()
+    public_key = {'p': keys['p'], 'g': keys['g'], 'q': keys['q'], 'public_key': keys['public_key']}
+    curve_keys = crypto.generate_curve_keys('P-256')
+    curve_key = {'curve': 'P-256', 'public_key': curve_keys['public_key']}
+    return [
+        crypto.encrypt_vote({'candidate_id': 2, 'value': 1, 'election_id': 1}, public_key),
+        crypto.encrypt_ballot([1, 2, 3], 2, public_key),
+        crypto.encrypt_ballot([1, 2, 3], 3, curve_key)
+    ]
+
+def test_round_trip():
+    print("=== Prueba de Ida y Vuelta del Formato Binario ===")
+    
+    for ballot in sample_ballots():
+        data = encode_ballot(ballot)
+        # Lo mismo que devolvía json.loads con el formato de texto
+        assert decode_ballot(data) == json.loads(json.dumps(ballot))
+        assert len(data) < len(json.dumps(ballot))
+        if isinstance(ballot, dict):
+            # El orden de los candidatos no cambia la codificación
+            assert encode_ballot(dict(reversed(list(ballot.items())))) == data
+    assert decode_ballot(encode_ballot({})) == {}
+    print("✅ ÉXITO: Las boletas se recuperan tal cual!")
+
+def test_truncated_input():
+    print("\n=== Prueba de Boletas Truncadas ===")
+    
+    for ballot in sample_ballots():
+        data = encode_ballot(ballot)
+        # Cualquier prefijo (incluido el que corta el número de candidatos) es ValueError
+        for length in range(len(data)):
+            try:
+                decode_ballot(data[:length])
+                assert False, f"Se aceptó una boleta de {length} de {len(data)} bytes"
+            except ValueError:
+                pass
+        try:
+            decode_ballot(data + b'\0')
+            assert False, "Se aceptó una boleta con bytes de más"
+        except ValueError:
+            pass
+    print("✅ ÉXITO: Las boletas truncadas se rechazan con ValueError!")
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_truncated_input()
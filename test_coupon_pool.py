@@ -0,0 +1,138 @@
+"""
+Script de prueba del pool de cupones de cifrado precalculados por elección
+"""
+
+import threading
+import time
+from elgamal_crypto import ElGamalCrypto
+from coupon_pool import CouponPool
+
+VOTE = {'candidate_id': 2, 'value': 1, 'election_id': 1}
+
+def make_election(crypto):
+    keys = crypto.generate_keys()
+    public_key = {'p': keys['p'], 'g': keys['g'], 'q': keys['q'], 'public_key': keys['public_key']}
+    private_key = {'p': keys['p'], 'g': keys['g'], 'q': keys['q'], 'private_key': keys['private_key']}
+    return public_key, private_key
+
+def wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def election_stats(pool, election_id):
+    return pool.stats()['elections'][election_id]
+
+def test_disabled_pool():
+    print("=== Prueba del Pool de Cupones Desactivado ===")
+    
+    crypto = ElGamalCrypto(group='modp1024')
+    public_key, _ = make_election(crypto)
+    pool = CouponPool(crypto, depth=0)
+    pool.fill(1, public_key)
+    assert pool.take(1, public_key, count=3) == []
+    assert pool._executor is None and pool.stats()['elections'] == {}
+    print("✅ ÉXITO: Con depth=0 no se precalcula nada!")
+
+def test_refill_and_exhaustion():
+    print("\n=== Prueba de Recarga y Agotamiento del Pool de Cupones ===")
+    
+    crypto = ElGamalCrypto(group='modp1024')
+    public_key, private_key = make_election(crypto)
+    pool = CouponPool(crypto, depth=8, batch_size=4, workers=1)
+    try:
+        pool.fill(1, public_key)
+        assert wait_for(lambda: election_stats(pool, 1)['available'] == 8)
+        
+        # Los cupones sirven para cifrar y descifrar votos
+        coupons = pool.take(1, public_key, count=3)
+        assert len(coupons) == 3 and len({k for k, _, _ in coupons}) == 3
+        for coupon in coupons:
+            encrypted = crypto.encrypt_vote(VOTE, public_key, coupon)
+            assert crypto.decrypt_vote(encrypted, private_key) == VOTE
+        # Faltan menos de un lote: no se recarga todavía
+        assert election_stats(pool, 1)['pending'] == 0
+        
+        # Pedir más de los que quedan: el resto se cifra en línea
+        assert len(pool.take(1, public_key, count=10)) == 5
+        stats = election_stats(pool, 1)
+        assert (stats['consumed'], stats['fallbacks']) == (8, 5)
+        
+        # Vacío: se recarga en lotes enteros hasta depth
+        assert wait_for(lambda: election_stats(pool, 1)['available'] == 8)
+        stats = election_stats(pool, 1)
+        assert stats['pending'] == 0 and stats['generated'] == 16 and pool.stats()['errors'] == 0
+    finally:
+        pool.shutdown()
+    print("✅ ÉXITO: El pool de cupones se recarga al agotarse!")
+
+def test_concurrent_take():
+    print("\n=== Prueba de Entregas Concurrentes del Pool de Cupones ===")
+    
+    crypto = ElGamalCrypto(group='modp1024')
+    public_key, _ = make_election(crypto)
+    pool = CouponPool(crypto, depth=16, batch_size=8, workers=2)
+    try:
+        pool.fill(1, public_key)
+        assert wait_for(lambda: election_stats(pool, 1)['available'] == 16)
+        
+        taken = []
+        barrier = threading.Barrier(8)
+        
+        def take():
+            barrier.wait()
+            for _ in range(3):
+                taken.extend(pool.take(1, public_key))
+        
+        threads = [threading.Thread(target=take) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        # Ningún cupón (nonce k) se entrega dos veces
+        nonces = [k for k, _, _ in taken]
+        assert len(nonces) == len(set(nonces)) >= 16
+        stats = election_stats(pool, 1)
+        assert stats['consumed'] == len(taken)
+        assert stats['consumed'] + stats['fallbacks'] == 24
+    finally:
+        pool.shutdown()
+    print("✅ ÉXITO: Cada cupón se entrega una sola vez!")
+
+def test_discard_and_new_key():
+    print("\n=== Prueba de Descarte de Cupones ===")
+    
+    crypto = ElGamalCrypto(group='modp1024')
+    public_key, _ = make_election(crypto)
+    pool = CouponPool(crypto, depth=4, batch_size=4, workers=1)
+    try:
+        pool.fill(1, public_key)
+        state = pool._elections[1]
+        pool.discard(1)
+        # Los cupones que llegan tras el descarte se pierden con su estado
+        assert wait_for(lambda: state.pending == 0)
+        assert state.generated == 4 and 1 not in pool.stats()['elections']
+        
+        pool.fill(1, public_key)
+        assert wait_for(lambda: election_stats(pool, 1)['available'] == 4)
+        # El mismo id con otra clave es otra elección: sus cupones no valen
+        other_key, _ = make_election(crypto)
+        assert pool.take(1, other_key) == []
+        assert election_stats(pool, 1)['fallbacks'] == 1
+        assert wait_for(lambda: election_stats(pool, 1)['available'] == 4)
+        coupon, = pool.take(1, other_key)
+        k, g_k, y_k = coupon
+        assert y_k == pow(other_key['public_key'], k, other_key['p'])
+    finally:
+        pool.shutdown()
+    print("✅ ÉXITO: Los cupones de una elección descartada o con otra clave no se usan!")
+
+if __name__ == "__main__":
+    test_disabled_pool()
+    test_refill_and_exhaustion()
+    test_concurrent_take()
+    test_discard_and_new_key()
@@ -2,8 +2,13 @@
 Script de prueba para verificar el funcionamiento del cifrado ElGamal
 """
 
-from elgamal_crypto import ElGamalCrypto
+from elgamal_crypto import ElGamalCrypto, ModularGroup, STANDARD_GROUPS, standard_group
+from Crypto.Util import number
+import os
+from discrete_log import DiscreteLogSolver
+from ballot_codec import encode_ballot, decode_ballot
 import json
+import tempfile
 
 def test_elgamal_encryption():
     print("=== Prueba de Cifrado ElGamal ===")
@@ -148,12 +153,339 @@ def test_multiple_votes():
         print("❌ ERROR: Error en el procesamiento de múltiples votos!")
         return False
 
+def test_fixed_base_tables():
+    print("\n=== Prueba de Tablas de Base Fija ===")
+    
+    crypto = ElGamalCrypto(key_size=1024, fixed_base_tables=2)
+    keys = crypto.generate_keys()
+    p = keys['p']
+    
+    # La tabla debe coincidir con pow() para exponentes arbitrarios
+    table = crypto.fixed_base.get(keys['g'], p)
+    for exponent in [0, 1, 2, 15, 16, p - 2, keys['private_key']]:
+        assert table.pow(exponent) == pow(keys['g'], exponent, p)
+    print("   Tabla de base fija coincide con pow()")
+    
+    # La caché está acotada y descarta la tabla menos usada
+    crypto.fixed_base.get(keys['public_key'], p)
+    crypto.fixed_base.get(3, p)
+    bits = p.bit_length()
+    assert list(crypto.fixed_base._tables) == [(keys['public_key'], p, bits), (3, p, bits)]
+    assert crypto.fixed_base.get(keys['g'], p) is not table
+    print("   Caché LRU acotada a 2 tablas")
+    
+    public_key = {'p': p, 'g': keys['g'], 'public_key': keys['public_key']}
+    private_key = {'p': p, 'private_key': keys['private_key']}
+    encrypted_vote = crypto.encrypt(12345, public_key)
+    assert crypto.decrypt(encrypted_vote, private_key) == 12345
+    print("✅ ÉXITO: El cifrado con tablas precalculadas funciona!")
+
+def test_exponential_ballots():
+    print("\n=== Prueba de Boletas Exponenciales ===")
+    
+    crypto = ElGamalCrypto(key_size=1024)
+    keys = crypto.generate_keys()
+    
+    public_key = {'p': keys['p'], 'g': keys['g'], 'public_key': keys['public_key']}
+    private_key = {'p': keys['p'], 'g': keys['g'], 'private_key': keys['private_key']}
+    
+    # Cada boleta contiene un cifrado por candidato
+    candidate_ids = [10, 20, 30]
+    choices = [10, 20, 20, 30, 20, 10, 20]
+    ballots = [crypto.encrypt_ballot(candidate_ids, choice, public_key) for choice in choices]
+    assert all(set(ballot) == {'10', '20', '30'} for ballot in ballots)
+    
+    # Suma homomórfica: un solo descifrado por candidato
+    aggregates = crypto.aggregate_ballots(ballots, keys['p'])
+    counts = {
+        candidate_id: crypto.decrypt_exponential(ciphertext, private_key, len(ballots))
+        for candidate_id, ciphertext in aggregates.items()
+    }
+    print(f"   Conteo homomórfico: {counts}")
+    assert counts == {10: 2, 20: 4, 30: 1}
+    print("✅ ÉXITO: El conteo homomórfico coincide con los votos emitidos!")
+
+def test_discrete_log_solver():
+    print("\n=== Prueba de Logaritmo Discreto (Baby-step Giant-step) ===")
+    
+    crypto = ElGamalCrypto(key_size=1024)
+    keys = crypto.generate_keys()
+    p, g = keys['p'], keys['g']
+    group = ModularGroup(p, g)
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        solver = DiscreteLogSolver(max_value=1_000_000, cache_dir=cache_dir)
+        for value in [0, 1, solver.baby_steps, 123_456, 1_000_000]:
+            assert solver.solve(group, pow(g, value, p)) == value
+        print(f"   Tabla de {solver.baby_steps} pasos de bebé")
+        
+        # Un valor fuera del rango no debe devolver un conteo incorrecto
+        try:
+            solver.solve(group, pow(g, 1_000_001, p))
+            assert False, "Se esperaba ValueError"
+        except ValueError:
+            pass
+        
+        # Un segundo solver reutiliza la tabla guardada en disco
+        reloaded = DiscreteLogSolver(max_value=1_000_000, cache_dir=cache_dir)
+        assert reloaded.solve(group, pow(g, 654_321, p)) == 654_321
+    print("✅ ÉXITO: Los conteos se recuperan correctamente desde g^n!")
+
+def test_standard_groups():
+    print("\n=== Prueba de Grupos Estándar (RFC 3526 / RFC 7919) ===")
+    
+    # Todos los grupos deben ser primos seguros p = 2q + 1
+    for name in STANDARD_GROUPS:
+        p, g = standard_group(name)
+        assert number.isPrime(p) and number.isPrime((p - 1) // 2), name
+        print(f"   {name}: primo seguro de {p.bit_length()} bits")
+    
+    # Las claves comparten p y g, solo cambia la clave privada
+    crypto = ElGamalCrypto(group='ffdhe2048')
+    keys1 = crypto.generate_keys()
+    keys2 = crypto.generate_keys()
+    assert keys1['p'] == keys2['p'] and keys1['g'] == keys2['g'] == 2
+    assert keys1['private_key'] != keys2['private_key']
+    assert keys1['group'] == 'ffdhe2048'
+    
+    public_key = {'p': keys1['p'], 'g': keys1['g'], 'public_key': keys1['public_key']}
+    private_key = {'p': keys1['p'], 'private_key': keys1['private_key']}
+    assert crypto.decrypt(crypto.encrypt(42, public_key), private_key) == 42
+    
+    # Conjunto de parámetros local: se genera una vez y se reutiliza
+    with tempfile.TemporaryDirectory() as directory:
+        params_file = os.path.join(directory, 'params.json')
+        first = ElGamalCrypto(key_size=512, group='local', params_file=params_file)
+        second = ElGamalCrypto(key_size=512, group='local', params_file=params_file)
+        assert os.path.exists(params_file)
+        assert (first.p, first.g) == (second.p, second.g)
+    print("✅ ÉXITO: Los parámetros compartidos funcionan correctamente!")
+
+def test_elliptic_curve_backend():
+    print("\n=== Prueba de ElGamal sobre Curva Elíptica (P-256) ===")
+    from Crypto.PublicKey import ECC
+    
+    crypto = ElGamalCrypto()
+    keys = crypto.generate_curve_keys('P-256')
+    group = crypto.curve_group('P-256')
+    
+    # La aritmética de puntos coincide con la de PyCryptodome
+    reference = ECC.EccPoint(*group.affine(group.generator), curve='P-256') * keys['private_key']
+    public_point = group.affine(group.decode(keys['public_key']))
+    assert public_point == (int(reference.x), int(reference.y))
+    assert group.exp(group.generator, group.order) is None
+    print(f"   Clave pública comprimida: {len(keys['public_key']) // 2} bytes")
+    
+    public_key = {'curve': 'P-256', 'public_key': keys['public_key']}
+    private_key = {'curve': 'P-256', 'private_key': keys['private_key']}
+    
+    # Misma API de boletas y suma homomórfica que el grupo modular
+    candidate_ids = [1, 2, 3]
+    choices = [1, 3, 3, 2, 3]
+    ballots = [crypto.encrypt_ballot(candidate_ids, choice, public_key) for choice in choices]
+    assert all(len(c) == 66 for ballot in ballots for ciphertext in ballot.values() for c in ciphertext)
+    
+    aggregates = crypto.aggregate_ballots(ballots, group)
+    counts = {
+        candidate_id: crypto.decrypt_exponential(ciphertext, private_key, len(ballots))
+        for candidate_id, ciphertext in aggregates.items()
+    }
+    print(f"   Conteo homomórfico: {counts}")
+    assert counts == {1: 1, 2: 1, 3: 3}
+    
+    total = crypto.homomorphic_add(ballots[0]['3'], ballots[1]['3'], group)
+    assert crypto.decrypt_exponential(total, private_key, 2) == 1
+    print("✅ ÉXITO: El backend de curva elíptica funciona correctamente!")
+
+def test_encrypt_many():
+    print("\n=== Prueba de Cifrado por Lotes ===")
+    
+    crypto = ElGamalCrypto(group='modp1024')
+    keys = crypto.generate_keys()
+    public_key = {'p': keys['p'], 'g': keys['g'], 'public_key': keys['public_key']}
+    private_key = {'p': keys['p'], 'g': keys['g'], 'private_key': keys['private_key']}
+    
+    # Boletas JSON: mismo formato que encrypt_vote
+    votes = [{'candidate_id': i % 3, 'value': 1} for i in range(20)]
+    encrypted = list(crypto.encrypt_many(votes, public_key))
+    assert [crypto.decrypt_vote(c, private_key) for c in encrypted] == votes
+    
+    # Valores exponenciales en un pool de procesos, en el orden de entrada
+    values = [i % 2 for i in range(20)]
+    encrypted = list(crypto.encrypt_many(values, public_key, exponential=True, processes=2, chunk_size=3))
+    assert [crypto.decrypt_exponential(c, private_key, 1) for c in encrypted] == values
+    print(f"   {len(votes) + len(values)} cifrados generados por lotes")
+    print("✅ ÉXITO: El cifrado por lotes funciona correctamente!")
+
+def test_short_exponents():
+    print("\n=== Prueba de Exponentes Cortos ===")
+    
+    # Grupo propio: subgrupo de orden primo q de 256 bits
+    crypto = ElGamalCrypto(key_size=1024)
+    keys = crypto.generate_keys()
+    p, g, q = keys['p'], keys['g'], keys['q']
+    assert q.bit_length() == 256 and number.isPrime(q) and (p - 1) % q == 0
+    assert pow(g, q, p) == 1 and keys['private_key'] < q
+    
+    public_key = {'p': p, 'g': g, 'q': q, 'public_key': keys['public_key']}
+    private_key = {'p': p, 'g': g, 'q': q, 'private_key': keys['private_key']}
+    # Los mensajes arbitrarios no caben en el subgrupo: solo boletas exponenciales
+    try:
+        crypto.encrypt(42, public_key)
+        assert False, "Se esperaba ValueError"
+    except ValueError:
+        pass
+    assert crypto.decrypt_exponential(crypto.encrypt_exponential(1, public_key), private_key, 1) == 1
+    
+    # Grupos estándar: q = (p - 1) / 2, exponentes de 256 bits
+    crypto = ElGamalCrypto(group='ffdhe2048')
+    keys = crypto.generate_keys()
+    assert keys['q'] == (keys['p'] - 1) // 2
+    assert keys['private_key'].bit_length() <= 256
+    
+    # Claves antiguas sin q (exponentes completos) siguen descifrando
+    legacy_private = number.getRandomRange(2, keys['p'] - 1)
+    legacy_public = {'p': keys['p'], 'g': keys['g'], 'public_key': pow(keys['g'], legacy_private, keys['p'])}
+    ciphertext = crypto.encrypt(7, legacy_public)
+    assert crypto.decrypt(ciphertext, {'p': keys['p'], 'private_key': legacy_private}) == 7
+    print("✅ ÉXITO: Los exponentes cortos funcionan correctamente!")
+
+def test_json_votes_in_subgroup():
+    print("\n=== Prueba de Votos JSON en el Subgrupo ===")
+    
+    crypto = ElGamalCrypto(group='modp1024')
+    keys = crypto.generate_keys()
+    p, q = keys['p'], keys['q']
+    public_key = {'p': p, 'g': keys['g'], 'q': q, 'public_key': keys['public_key']}
+    private_key = {'p': p, 'g': keys['g'], 'q': q, 'private_key': keys['private_key']}
+    
+    # c2^q no debe distinguir las opciones: todo cifrado queda en el subgrupo
+    options = [{'candidate_id': candidate_id, 'value': 1} for candidate_id in (1, 2, 3, 4, 5, 6)]
+    for option in options:
+        c1, c2 = crypto.encrypt_vote(option, public_key)
+        assert pow(c1, q, p) == 1 and pow(c2, q, p) == 1
+        assert crypto.decrypt_vote((c1, c2), private_key) == option
+    
+    # Mensajes que no son residuos cuadráticos se guardan como p - m
+    for message in (2, 3, 5, 7, q):
+        ciphertext = crypto.encrypt(message, public_key)
+        assert pow(ciphertext[1], q, p) == 1
+        assert crypto.decrypt(ciphertext, private_key) == message
+    print("✅ ÉXITO: Los votos JSON no revelan la opción elegida!")
+
+def test_ciphertext_validation():
+    print("\n=== Prueba de Validación de Cifrados ===")
+    
+    crypto = ElGamalCrypto(group='modp1024')
+    keys = crypto.generate_keys()
+    p = keys['p']
+    public_key = {'p': p, 'g': keys['g'], 'q': keys['q'], 'public_key': keys['public_key']}
+    group = crypto.group_for(public_key)
+    valid = crypto.encrypt_exponential(1, public_key)
+    crypto.validate_ciphertext(valid, group)
+    
+    # Elementos fuera del subgrupo (p - 1 tiene orden 2) o del rango
+    for malicious in ([p - 1, valid[1]], [valid[0], p - valid[1]], [0, valid[1]], [valid[0], p], [valid[0]]):
+        try:
+            crypto.validate_ciphertext(malicious, group)
+            assert False, f"Cifrado aceptado: {malicious}"
+        except ValueError:
+            pass
+    
+    # Subgrupo de Schnorr (orden q de 256 bits)
+    schnorr = ElGamalCrypto(key_size=512)
+    keys = schnorr.generate_keys()
+    schnorr_key = {'p': keys['p'], 'g': keys['g'], 'q': keys['q'], 'public_key': keys['public_key']}
+    group = schnorr.group_for(schnorr_key)
+    ciphertext = schnorr.encrypt_exponential(0, schnorr_key)
+    schnorr.validate_ciphertext(ciphertext, group)
+    non_member = next(h for h in range(2, 100) if pow(h, keys['q'], keys['p']) != 1)
+    try:
+        schnorr.validate_ciphertext([ciphertext[0], non_member], group)
+        assert False, "Se esperaba ValueError"
+    except ValueError:
+        pass
+    
+    # Puntos que no están en la curva
+    curve_keys = crypto.generate_curve_keys('P-256')
+    curve = crypto.curve_group('P-256')
+    ciphertext = crypto.encrypt_exponential(1, {'curve': 'P-256', 'public_key': curve_keys['public_key']})
+    crypto.validate_ciphertext(ciphertext, curve)
+    off_curve = next(f'02{x:064x}' for x in range(1, 100)
+                     if not _on_curve(curve, x))
+    try:
+        crypto.validate_ciphertext([ciphertext[0], off_curve], curve)
+        assert False, "Se esperaba ValueError"
+    except ValueError:
+        pass
+    print("✅ ÉXITO: Los cifrados fuera del grupo se rechazan!")
+
+def _on_curve(curve, x):
+    try:
+        curve.decode(f'02{x:064x}')
+        return True
+    except ValueError:
+        return False
+
+def test_encryption_coupons():
+    print("\n=== Prueba de Cupones de Cifrado Precalculados ===")
+    
+    crypto = ElGamalCrypto(group='modp1024')
+    keys = crypto.generate_keys()
+    public_key = {'p': keys['p'], 'g': keys['g'], 'q': keys['q'], 'public_key': keys['public_key']}
+    private_key = {'p': keys['p'], 'g': keys['g'], 'q': keys['q'], 'private_key': keys['private_key']}
+    
+    coupons = crypto.precompute_coupons(public_key, 4)
+    assert len({k for k, _, _ in coupons}) == 4
+    
+    # El cupón aporta g^k: solo queda multiplicar el mensaje por y^k
+    k, c1, _ = coupons[0]
+    ciphertext = crypto.encrypt(42, public_key, coupons[0])
+    assert ciphertext[0] == c1 == pow(keys['g'], k, keys['p'])
+    assert crypto.decrypt(ciphertext, private_key) == 42
+    
+    # Una boleta consume un cupón por candidato; sin cupones se cifra en línea
+    remaining = coupons[1:]
+    ballot = crypto.encrypt_ballot([1, 2, 3, 4], 2, public_key, remaining)
+    assert remaining == []
+    assert [crypto.decrypt_exponential(ballot[str(c)], private_key, 1) for c in (1, 2, 3, 4)] == [0, 1, 0, 0]
+    print("✅ ÉXITO: Los cupones de cifrado funcionan correctamente!")
+
+def test_binary_ballots():
+    print("\n=== Prueba de Formato Binario de Votos ===")
+    
+    crypto = ElGamalCrypto(group='ffdhe2048')
+    keys = crypto.generate_keys()
+    public_key = {'p': keys['p'], 'g': keys['g'], 'q': keys['q'], 'public_key': keys['public_key']}
+    
+    # Mismo resultado que json.loads del formato de texto
+    single = crypto.encrypt_vote({'candidate_id': 1, 'value': 1}, public_key)
+    ballot = crypto.encrypt_ballot([1, 2, 3], 2, public_key)
+    for encrypted in (single, ballot):
+        text = json.dumps(encrypted)
+        assert decode_ballot(encode_ballot(encrypted)) == json.loads(text)
+        assert len(encode_ballot(encrypted)) * 2 < len(text)
+    print(f"   Boleta de 3 candidatos: {len(json.dumps(ballot))} -> {len(encode_ballot(ballot))} bytes")
+    
+    # Puntos comprimidos de curva elíptica, incluido el punto en el infinito
+    curve_keys = crypto.generate_curve_keys('P-256')
+    curve_ballot = crypto.encrypt_ballot([1, 2], 1, {'curve': 'P-256', 'public_key': curve_keys['public_key']})
+    curve_ballot['3'] = ['00', curve_ballot['1'][1]]
+    assert decode_ballot(encode_ballot(curve_ballot)) == json.loads(json.dumps(curve_ballot))
+    
+    try:
+        decode_ballot(encode_ballot(single)[:-1])
+        assert False, "Un voto truncado debe rechazarse"
+    except ValueError:
+        pass
+    print("✅ ÉXITO: El formato binario funciona correctamente!")
+
 if __name__ == "__main__":
     print("Iniciando pruebas del sistema de votación ElGamal...")
     print("=" * 50)
     
     success_count = 0
-    total_tests = 3
+    total_tests = 14
     
     # Ejecutar pruebas
     if test_elgamal_encryption():
@@ -165,6 +497,39 @@ if __name__ == "__main__":
     if test_multiple_votes():
         success_count += 1
     
+    test_fixed_base_tables()
+    success_count += 1
+    
+    test_exponential_ballots()
+    success_count += 1
+    
+    test_discrete_log_solver()
+    success_count += 1
+    
+    test_standard_groups()
+    success_count += 1
+    
+    test_elliptic_curve_backend()
+    success_count += 1
+    
+    test_encrypt_many()
+    success_count += 1
+    
+    test_short_exponents()
+    success_count += 1
+    
+    test_json_votes_in_subgroup()
+    success_count += 1
+    
+    test_ciphertext_validation()
+    success_count += 1
+    
+    test_encryption_coupons()
+    success_count += 1
+    
+    test_binary_ballots()
+    success_count += 1
+    
     # Resumen
     print("\n" + "=" * 50)
     print(f"RESUMEN DE PRUEBAS: {success_count}/{total_tests} pruebas exitosas")
@@ -0,0 +1,135 @@
+"""
+Script de prueba de la caché de contexto de elecciones
+
+El cargador y el reloj son simulados: la caducidad se prueba avanzando el
+reloj, sin esperas.
+"""
+
+from datetime import datetime, timedelta
+from election_cache import ElectionContext, ElectionContextCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+class FakeLoader:
+    """Contextos de elecciones simuladas; cuenta las cargas por elección"""
+    def __init__(self, *election_ids):
+        self.elections = {election_id: (1, 2, 3) for election_id in election_ids}
+        self.loads = []
+        self.during_load = None
+    
+    def __call__(self, election_id):
+        self.loads.append(election_id)
+        if self.during_load is not None:
+            self.during_load()
+        candidate_ids = self.elections.get(election_id)
+        if candidate_ids is None:
+            return None
+        now = datetime.now()
+        return ElectionContext(
+            election_id=election_id,
+            start_date=now - timedelta(hours=1),
+            end_date=now + timedelta(hours=1),
+            is_active=True,
+            public_key_data={'p': 23, 'g': 2, 'public_key': 4},
+            candidate_ids=candidate_ids,
+            candidate_id_set=frozenset(candidate_ids)
+        )
+
+def test_hits_and_lru_eviction():
+    print("=== Prueba de Aciertos y Desalojo LRU ===")
+    
+    loader = FakeLoader(1, 2, 3)
+    cache = ElectionContextCache(loader, max_entries=2, ttl=30, clock=FakeClock())
+    assert cache.get(1).election_id == 1
+    assert cache.get(1) is cache.get(1)
+    assert loader.loads == [1]
+    
+    cache.get(2)
+    # Usar la 1 la convierte en la más reciente: al llegar la 3 sale la 2
+    cache.get(1)
+    cache.get(3)
+    assert cache.stats()['entries'] == 2
+    loader.loads.clear()
+    cache.get(1)
+    cache.get(3)
+    assert loader.loads == []
+    cache.get(2)
+    assert loader.loads == [2]
+    
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (5, 4)
+    print("✅ ÉXITO: La caché desaloja la elección usada hace más tiempo!")
+
+def test_ttl_expiry():
+    print("\n=== Prueba de Caducidad ===")
+    
+    clock = FakeClock()
+    loader = FakeLoader(1)
+    cache = ElectionContextCache(loader, max_entries=8, ttl=30, clock=clock)
+    first = cache.get(1)
+    clock.now += 29.9
+    assert cache.get(1) is first
+    # Un cambio hecho por otro proceso se ve como mucho ttl segundos después
+    loader.elections[1] = (4, 5)
+    clock.now += 0.1
+    context = cache.get(1)
+    assert context is not first and context.candidate_ids == (4, 5)
+    assert loader.loads == [1, 1]
+    clock.now += 10
+    assert cache.get(1) is context
+    print("✅ ÉXITO: Las entradas caducan a los ttl segundos!")
+
+def test_invalidation():
+    print("\n=== Prueba de Invalidación ===")
+    
+    loader = FakeLoader(1, 2)
+    cache = ElectionContextCache(loader, max_entries=8, ttl=30, clock=FakeClock())
+    cache.get(1)
+    cache.get(2)
+    loader.elections[1] = (7,)
+    cache.invalidate(1)
+    assert cache.get(1).candidate_ids == (7,)
+    assert loader.loads == [1, 2, 1]
+    cache.invalidate(99)
+    assert cache.stats()['invalidations'] == 1
+    
+    cache.clear()
+    assert cache.stats()['entries'] == 0
+    cache.get(2)
+    assert loader.loads[-1] == 2
+    
+    # Una carga que coincide con una invalidación no se guarda
+    loader.during_load = lambda: cache.invalidate(1)
+    loader.elections[1] = (8,)
+    assert cache.get(1).candidate_ids == (8,)
+    loader.during_load = None
+    cache.get(1)
+    assert loader.loads[-2:] == [1, 1]
+    print("✅ ÉXITO: Las invalidaciones descartan el contexto guardado!")
+
+def test_misses_and_disabled_cache():
+    print("\n=== Prueba de Elecciones Inexistentes y Caché Desactivada ===")
+    
+    loader = FakeLoader(1)
+    cache = ElectionContextCache(loader, max_entries=8, ttl=30, clock=FakeClock())
+    # Las elecciones inexistentes no se guardan
+    assert cache.get(5) is None and cache.get(5) is None
+    assert loader.loads == [5, 5]
+    
+    loader = FakeLoader(1)
+    cache = ElectionContextCache(loader, max_entries=0, ttl=30, clock=FakeClock())
+    cache.get(1)
+    cache.get(1)
+    assert loader.loads == [1, 1] and cache.stats()['entries'] == 0
+    print("✅ ÉXITO: Sin entradas para elecciones inexistentes ni con max_entries=0!")
+
+if __name__ == "__main__":
+    test_hits_and_lru_eviction()
+    test_ttl_expiry()
+    test_invalidation()
+    test_misses_and_disabled_cache()
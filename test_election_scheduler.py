@@ -0,0 +1,151 @@
+"""
+Script de prueba del cierre programado de elecciones
+
+El programador se prueba con una aplicación y unas elecciones simuladas en
+memoria y con plazos de unas décimas de segundo.
+"""
+
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+import election_scheduler
+from election_scheduler import ElectionScheduler
+
+class FakeApp:
+    def app_context(self):
+        return nullcontext()
+
+class FakeElections:
+    """Fechas de fin de las elecciones activas, cerradas por close_expired()"""
+    def __init__(self, *end_dates):
+        self.active = list(end_dates)
+        self.queries = 0
+        self.failures = 0
+        self.closed = threading.Event()
+    
+    def next_deadline(self):
+        self.queries += 1
+        return min(self.active, default=None)
+    
+    def close_expired(self):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError('base de datos no disponible')
+        now = datetime.now()
+        expired = [end_date for end_date in self.active if end_date < now]
+        self.active = [end_date for end_date in self.active if end_date >= now]
+        if expired:
+            self.closed.set()
+        return len(expired)
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def test_check_without_database_queries():
+    print("=== Prueba de check() sin Consultas ===")
+    
+    elections = FakeElections(datetime.now() + timedelta(hours=1), datetime.now() + timedelta(hours=2))
+    scheduler = ElectionScheduler(FakeApp(), elections.next_deadline, elections.close_expired)
+    try:
+        # Solo la primera llamada lee el próximo plazo
+        for _ in range(100):
+            assert scheduler.check() == 0
+        assert elections.queries == 1
+        assert len(elections.active) == 2
+        assert scheduler.stats()['timer_armed']
+    finally:
+        scheduler.shutdown()
+    assert not scheduler.stats()['timer_armed']
+    print("✅ ÉXITO: check() no consulta la base antes del plazo!")
+
+def test_timer_closes_and_rearms():
+    print("\n=== Prueba del Temporizador de Cierre ===")
+    
+    first = datetime.now() + timedelta(seconds=0.2)
+    later = datetime.now() + timedelta(hours=1)
+    elections = FakeElections(later, first)
+    scheduler = ElectionScheduler(FakeApp(), elections.next_deadline, elections.close_expired)
+    try:
+        scheduler.refresh()
+        assert elections.closed.wait(timeout=5), "El temporizador no cerró la elección"
+        # Cerrada solo la vencida, y rearmado para la siguiente
+        next_deadline = later.strftime('%Y-%m-%d %H:%M:%S')
+        assert wait_for(lambda: scheduler.stats()['next_deadline'] == next_deadline)
+        assert elections.active == [later]
+        stats = scheduler.stats()
+        assert stats['runs'] == stats['closed'] == 1 and stats['timer_armed']
+    finally:
+        scheduler.shutdown()
+    print("✅ ÉXITO: El temporizador cierra la elección y se rearma!")
+
+def test_schedule_earlier_deadline():
+    print("\n=== Prueba de schedule() con un Plazo Anterior ===")
+    
+    elections = FakeElections(datetime.now() + timedelta(hours=1))
+    scheduler = ElectionScheduler(FakeApp(), elections.next_deadline, elections.close_expired)
+    try:
+        # Sin cargar, el plazo se leerá de la base en el primer check()
+        scheduler.schedule(datetime.now() + timedelta(minutes=1))
+        assert not scheduler.stats()['loaded'] and not scheduler.stats()['timer_armed']
+        
+        scheduler.check()
+        soon = datetime.now() + timedelta(seconds=0.2)
+        elections.active.append(soon)
+        scheduler.schedule(soon)
+        # Un plazo posterior no cambia el temporizador
+        scheduler.schedule(datetime.now() + timedelta(hours=3))
+        assert scheduler.stats()['next_deadline'] == soon.strftime('%Y-%m-%d %H:%M:%S')
+        assert elections.closed.wait(timeout=5)
+        assert wait_for(lambda: scheduler.stats()['runs'] == 1)
+        assert len(elections.active) == 1
+    finally:
+        scheduler.shutdown()
+    print("✅ ÉXITO: Una elección que termina antes adelanta el temporizador!")
+
+def test_check_after_missed_deadline():
+    print("\n=== Prueba de check() con el Plazo Vencido ===")
+    
+    elections = FakeElections(datetime.now() - timedelta(seconds=1))
+    scheduler = ElectionScheduler(FakeApp(), elections.next_deadline, elections.close_expired)
+    try:
+        # El temporizador de este proceso aún no se ha ejecutado: check() cierra
+        scheduler._start_timer = lambda delay: None
+        assert scheduler.check() == 1
+        assert scheduler.check() == 0
+        assert elections.active == [] and scheduler.stats()['next_deadline'] is None
+    finally:
+        del scheduler._start_timer
+        scheduler.shutdown()
+    print("✅ ÉXITO: check() cierra las elecciones vencidas una sola vez!")
+
+def test_failed_run_is_retried():
+    print("\n=== Prueba de Reintento tras un Fallo ===")
+    
+    retry_seconds = election_scheduler.RETRY_SECONDS
+    election_scheduler.RETRY_SECONDS = 0.1
+    elections = FakeElections(datetime.now() + timedelta(seconds=0.1))
+    elections.failures = 1
+    scheduler = ElectionScheduler(FakeApp(), elections.next_deadline, elections.close_expired)
+    try:
+        scheduler.refresh()
+        assert elections.closed.wait(timeout=5), "El reintento no cerró la elección"
+        assert wait_for(lambda: scheduler.stats()['runs'] == 1)
+        stats = scheduler.stats()
+        assert stats['errors'] == 1 and stats['closed'] == 1
+    finally:
+        election_scheduler.RETRY_SECONDS = retry_seconds
+        scheduler.shutdown()
+    print("✅ ÉXITO: Un cierre fallido se reintenta!")
+
+if __name__ == "__main__":
+    test_check_without_database_queries()
+    test_timer_closes_and_rearms()
+    test_schedule_earlier_deadline()
+    test_check_after_missed_deadline()
+    test_failed_run_is_retried()
@@ -0,0 +1,96 @@
+"""
+Script de prueba del pool de claves pregeneradas para nuevas elecciones
+"""
+
+import threading
+import time
+from elgamal_crypto import ElGamalCrypto
+from key_pool import KeyPool
+
+def wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def test_empty_pool_generates_synchronously():
+    print("=== Prueba del Pool de Claves Vacío ===")
+    
+    crypto = ElGamalCrypto(group='modp1024', fixed_base_tables=0)
+    pool = KeyPool(crypto, size=0)
+    keys = [pool.acquire() for _ in range(3)]
+    # Sin pool no se crean procesos, pero cada elección recibe su clave
+    assert pool._executor is None
+    assert len({k['private_key'] for k in keys}) == 3
+    for k in keys:
+        assert pow(k['g'], k['private_key'], k['p']) == k['public_key']
+    stats = pool.stats()
+    assert (stats['hits'], stats['misses'], stats['available']) == (0, 3, 0)
+    print("✅ ÉXITO: Sin claves en el pool se generan al momento!")
+
+def test_refill_and_exhaustion():
+    print("\n=== Prueba de Recarga y Agotamiento del Pool de Claves ===")
+    
+    crypto = ElGamalCrypto(group='modp1024', fixed_base_tables=0)
+    pool = KeyPool(crypto, size=2, workers=1)
+    try:
+        pool.start()
+        pool.start()
+        assert pool.stats()['pending'] + pool.stats()['available'] == 2
+        assert wait_for(lambda: pool.stats()['available'] == 2)
+        
+        # Vaciar el pool más deprisa de lo que se recarga
+        keys = [pool.acquire() for _ in range(5)]
+        stats = pool.stats()
+        assert stats['hits'] >= 2 and stats['hits'] + stats['misses'] == 5
+        assert len({k['private_key'] for k in keys}) == 5
+        for k in keys:
+            assert pow(k['g'], k['private_key'], k['p']) == k['public_key']
+        
+        # Cada entrega encarga una recarga, hasta volver a size claves
+        assert wait_for(lambda: pool.stats()['pending'] == 0)
+        stats = pool.stats()
+        assert stats['available'] == 2 and stats['errors'] == 0
+        assert stats['generated'] == 2 + stats['hits']
+    finally:
+        pool.shutdown()
+    print("✅ ÉXITO: El pool de claves se recarga hasta su tamaño!")
+
+def test_concurrent_acquire():
+    print("\n=== Prueba de Entregas Concurrentes del Pool de Claves ===")
+    
+    crypto = ElGamalCrypto(group='modp1024', fixed_base_tables=0)
+    pool = KeyPool(crypto, size=4, workers=2)
+    try:
+        pool.start()
+        assert wait_for(lambda: pool.stats()['available'] == 4)
+        
+        keys = []
+        barrier = threading.Barrier(8)
+        
+        def acquire():
+            barrier.wait()
+            keys.append(pool.acquire())
+        
+        threads = [threading.Thread(target=acquire) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        # Ninguna clave se entrega dos veces
+        assert len({k['private_key'] for k in keys}) == 8
+        stats = pool.stats()
+        assert stats['hits'] + stats['misses'] == 8 and stats['hits'] >= 4
+        assert wait_for(lambda: pool.stats()['pending'] == 0)
+        assert pool.stats()['available'] == 4
+    finally:
+        pool.shutdown()
+    print("✅ ÉXITO: Cada clave del pool se entrega una sola vez!")
+
+if __name__ == "__main__":
+    test_empty_pool_generates_synchronously()
+    test_refill_and_exhaustion()
+    test_concurrent_acquire()
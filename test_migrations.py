@@ -0,0 +1,66 @@
+"""
+Script de prueba de las migraciones del esquema sobre bases SQLite nuevas
+"""
+
+import os
+import tempfile
+from sqlalchemy import create_engine, inspect, text
+
+_directory = tempfile.mkdtemp()
+# La aplicación (sus modelos) necesita una base configurada al importarse
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_directory, 'app.db')}")
+
+from app import db
+import migrations
+
+def fresh_engine(name):
+    engine = create_engine(f"sqlite:///{os.path.join(_directory, name)}")
+    db.metadata.create_all(engine)
+    return engine
+
+def test_migrations_run_once():
+    print("=== Prueba de Migraciones Idempotentes ===")
+    
+    engine = fresh_engine('fresh.db')
+    versions = [version for version, _, _, _ in migrations.MIGRATIONS]
+    assert migrations.run_migrations(engine, db.metadata) == versions
+    with engine.connect() as conn:
+        schema = conn.execute(text("SELECT sql FROM sqlite_master ORDER BY name")).scalars().all()
+    
+    # La segunda ejecución no aplica nada ni cambia el esquema
+    assert migrations.run_migrations(engine, db.metadata) == []
+    assert migrations.applied_versions(engine) == set(versions)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT sql FROM sqlite_master ORDER BY name")).scalars().all() == schema
+        assert conn.execute(text("SELECT COUNT(*) FROM schema_version")).scalar() == len(versions)
+    
+    indexes = {index['name'] for table in ('vote', 'voting_record', 'candidate', 'election')
+               for index in inspect(engine).get_indexes(table)}
+    assert set(migrations.HOT_PATH_INDEXES) <= indexes
+    
+    # Cada migración es idempotente: reaplicarlas sobre el esquema ya migrado no falla
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM schema_version"))
+    assert migrations.run_migrations(engine, db.metadata) == versions
+    print("✅ ÉXITO: La segunda ejecución de las migraciones no hace nada!")
+
+def test_check_indexes():
+    print("\n=== Prueba de la Comprobación de Índices ===")
+    
+    engine = fresh_engine('check.db')
+    migrations.run_migrations(engine, db.metadata)
+    results = migrations.check_indexes(engine)
+    assert len(results) == len(migrations.HOT_QUERIES)
+    for description, index, used, plan in results:
+        assert used, f"{description}: {plan}"
+    
+    # Sin EXPLAIN para la base de datos: aviso en lugar de excepción
+    engine.dialect.name = 'desconocida'
+    with engine.connect() as conn:
+        assert migrations.explain(conn, "SELECT 1", {}) is None
+    assert migrations.check_indexes(engine) == []
+    print("✅ ÉXITO: Las consultas frecuentes usan sus índices!")
+
+if __name__ == "__main__":
+    test_migrations_run_once()
+    test_check_indexes()
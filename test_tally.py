@@ -0,0 +1,126 @@
+"""
+Script de prueba para el motor de conteo de resultados
+"""
+
+from elgamal_crypto import ElGamalCrypto
+from tally import TallyEngine
+from ballot_codec import encode_ballot
+import json
+
+def make_election(crypto):
+    keys = crypto.generate_keys()
+    public_key = {'p': keys['p'], 'g': keys['g'], 'public_key': keys['public_key']}
+    private_key = {'p': keys['p'], 'private_key': keys['private_key']}
+    return public_key, private_key
+
+def test_tally_mixed_ballots():
+    print("=== Prueba de Conteo con Boletas Mixtas ===")
+    
+    crypto = ElGamalCrypto(group='modp1024')
+    public_key, private_key = make_election(crypto)
+    candidate_ids = [1, 2, 3]
+    
+    # Boletas homomórficas y boletas JSON clásicas en la misma elección
+    choices = [1, 2, 2, 3, 2, 1, 3, 2, 2, 1, 3]
+    votes = []
+    for i, choice in enumerate(choices):
+        if i % 3 == 0:
+            encrypted = crypto.encrypt_vote({'candidate_id': choice, 'value': 1}, public_key)
+        else:
+            encrypted = crypto.encrypt_ballot(candidate_ids, choice, public_key)
+        # Votos en binario y votos en JSON aún sin migrar
+        votes.append(encode_ballot(encrypted) if i % 2 else json.dumps(encrypted))
+    votes.append('not json')  # Un voto corrupto no debe detener el conteo
+    
+    expected = {c: choices.count(c) for c in candidate_ids}
+    
+    serial = TallyEngine(crypto, workers=1, chunk_size=4)
+    assert serial.tally(votes, public_key, private_key, candidate_ids) == expected
+    print(f"   Conteo en un proceso: {expected}")
+    
+    parallel = TallyEngine(crypto, workers=2, chunk_size=3)
+    try:
+        assert parallel.tally(votes, public_key, private_key, candidate_ids) == expected
+    finally:
+        parallel.shutdown()
+    print("   Conteo en pool de procesos coincide")
+    print("✅ ÉXITO: El motor de conteo funciona correctamente!")
+
+def test_tally_running_aggregates():
+    print("\n=== Prueba de Conteo desde Agregados Acumulados ===")
+    
+    crypto = ElGamalCrypto(group='modp1024')
+    public_key, private_key = make_election(crypto)
+    candidate_ids = [1, 2, 3]
+    
+    # Cada voto se suma a uno de dos fragmentos, como hace vote()
+    choices = [1, 2, 2, 3, 2, 1, 3]
+    shards = [{}, {}]
+    for i, choice in enumerate(choices):
+        shard = shards[i % 2]
+        for candidate_id, ciphertext in crypto.encrypt_ballot(candidate_ids, choice, public_key).items():
+            if candidate_id in shard:
+                ciphertext = crypto.homomorphic_add(shard[candidate_id], ciphertext, public_key['p'])
+            shard[candidate_id] = ciphertext
+    
+    engine = TallyEngine(crypto, workers=1)
+    results, errors = engine.tally_running(shards, len(choices), public_key, private_key, candidate_ids)
+    assert results == {c: choices.count(c) for c in candidate_ids} and errors == 0
+    print(f"   Conteo desde {len(shards)} fragmentos: {results}")
+    
+    # Un agregado que no se puede descifrar se informa como error
+    shards.append({'1': crypto.encrypt_exponential(5000, public_key)})
+    results, errors = engine.tally_running(shards, len(choices), public_key, private_key, candidate_ids)
+    assert errors == 1 and results[2] == choices.count(2)
+    print("✅ ÉXITO: El conteo acumulado funciona correctamente!")
+
+def test_tally_batches():
+    print("\n=== Prueba de Conteo por Lotes con Puntos de Control ===")
+    
+    crypto = ElGamalCrypto(group='modp1024')
+    public_key, private_key = make_election(crypto)
+    candidate_ids = [1, 2, 3]
+    
+    choices = [1, 2, 2, 3, 2, 1, 3, 2]
+    rows = [(10 + i, json.dumps(crypto.encrypt_ballot(candidate_ids, choice, public_key)))
+            for i, choice in enumerate(choices)]
+    
+    engine = TallyEngine(crypto, workers=1, chunk_size=2, batch_size=3)
+    batches = list(engine.tally_batches(rows, public_key, private_key, candidate_ids))
+    assert [(b['first_id'], b['last_id'], b['votes']) for b in batches] == [(10, 12, 3), (13, 15, 3), (16, 17, 2)]
+    
+    # Cada lote trae sus propios conteos: reanudar tras el segundo lote
+    resumed = list(engine.tally_batches(rows[6:], public_key, private_key, candidate_ids))
+    assert resumed[0]['counts'] == batches[2]['counts']
+    totals = {c: sum(b['counts'][c] for b in batches) for c in candidate_ids}
+    assert totals == {c: choices.count(c) for c in candidate_ids}
+    assert engine.last_tally['votes'] == 2 and engine.last_tally['errors'] == 0
+    print(f"   {len(batches)} lotes: {totals}")
+    print("✅ ÉXITO: El conteo por lotes funciona correctamente!")
+
+def test_tally_invalid_exponential_ballot():
+    print("\n=== Prueba de Boleta Fuera del Grupo ===")
+    
+    crypto = ElGamalCrypto(group='modp1024')
+    keys = crypto.generate_keys()
+    public_key = {'p': keys['p'], 'g': keys['g'], 'q': keys['q'], 'public_key': keys['public_key']}
+    private_key = {'p': keys['p'], 'q': keys['q'], 'private_key': keys['private_key']}
+    candidate_ids = [1, 2]
+    
+    choices = [1, 1, 2, 1]
+    votes = [encode_ballot(crypto.encrypt_ballot(candidate_ids, choice, public_key)) for choice in choices]
+    # c1 = p - 1 no pertenece al subgrupo: sin validación arruinaría la suma del lote
+    malicious = crypto.encrypt_ballot(candidate_ids, 2, public_key)
+    malicious['1'] = [keys['p'] - 1, malicious['1'][1]]
+    votes.insert(2, encode_ballot(malicious))
+    
+    engine = TallyEngine(crypto, workers=1, chunk_size=10)
+    assert engine.tally(votes, public_key, private_key, candidate_ids) == {1: 3, 2: 1}
+    assert engine.last_tally['errors'] == 1
+    print("✅ ÉXITO: Una boleta maliciosa solo cuenta como un error!")
+
+if __name__ == "__main__":
+    test_tally_mixed_ballots()
+    test_tally_running_aggregates()
+    test_tally_batches()
+    test_tally_invalid_exponential_ballot()